@@ -0,0 +1,177 @@
+"""
+Throughput benchmark of the download_* functions against the local mock server (benchmarks/mock_server.py).
+
+For every downloader and n_jobs setting, reports the requests/sec, the p50/p95/p99 request latency
+and the peak Python memory of the run. The mock server runs in its own process, so its work doesn't
+compete with the downloaders for the GIL.
+
+    python benchmarks/bench_downloaders.py --n-jobs 1,4,8,16 --latency 0.08 --jitter 0.04
+    python benchmarks/bench_downloaders.py --only match_events --json results.json
+    python benchmarks/bench_downloaders.py --baseline results.json --tolerance 0.15
+
+With --baseline, exits with status 1 if the requests/sec of a run drops by more than --tolerance
+compared to the same downloader and n_jobs in the baseline.
+"""
+import argparse
+import json
+import os
+import os.path as osp
+import subprocess
+import sys
+import time
+import tracemalloc
+import urllib.request
+
+os.environ.setdefault('TQDM_DISABLE', '1')
+
+ROOT = osp.dirname(osp.dirname(osp.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import wyscout  # noqa: E402
+
+SEASON_ID = 1
+COMPETITION_ID = 524
+
+
+def _matches(args):
+    return [SEASON_ID * 1000 + i for i in range(args.matches)]
+
+
+# name -> callable(n_jobs, args) running the downloader
+DOWNLOADERS = {
+    'match_details': lambda n_jobs, args: wyscout.download_match_details(SEASON_ID, _matches(args), n_jobs=n_jobs),
+    'match_formations': lambda n_jobs, args: wyscout.download_match_formations(SEASON_ID, _matches(args), n_jobs=n_jobs),
+    'match_advance_stats': lambda n_jobs, args: wyscout.download_match_advance_stats(SEASON_ID, _matches(args), n_jobs=n_jobs),
+    'all_players_match_advance_stats': lambda n_jobs, args: wyscout.download_all_players_match_advance_stats(SEASON_ID, _matches(args), n_jobs=n_jobs),
+    'all_players_match_physical_data': lambda n_jobs, args: wyscout.download_all_players_match_physical_data(SEASON_ID, _matches(args), n_jobs=n_jobs),
+    'match_events': lambda n_jobs, args: wyscout.download_match_events(SEASON_ID, _matches(args), n_jobs=n_jobs),
+    'team_details': lambda n_jobs, args: wyscout.download_team_details(SEASON_ID, n_jobs=n_jobs),
+    # The empty player list goes through the paginated season players endpoint
+    'advanced_stats': lambda n_jobs, args: wyscout.download_advanced_stats(COMPETITION_ID, SEASON_ID, n_jobs=n_jobs),
+    'players_match_advance_stats': lambda n_jobs, args: wyscout.download_players_match_advance_stats(
+        [{'wyId': playerId} for playerId in range(100, 130)], SEASON_ID * 1000, n_jobs=n_jobs),
+}
+
+
+def start_server(args):
+    command = [sys.executable, osp.join(ROOT, 'benchmarks', 'mock_server.py'), '--port', str(args.port),
+               '--latency', str(args.latency), '--jitter', str(args.jitter), '--error-rate', str(args.error_rate),
+               '--throttle-rate', str(args.throttle_rate), '--retry-after', str(args.retry_after),
+               '--matches', str(args.matches), '--events-per-match', str(args.events_per_match)]
+    if args.fixtures:
+        command += ['--fixtures', args.fixtures]
+    server = subprocess.Popen(command, stdout=subprocess.DEVNULL)
+
+    url = f'http://127.0.0.1:{args.port}'
+    for _ in range(100):
+        try:
+            urllib.request.urlopen(f'{url}/v3/seasons/{SEASON_ID}', timeout=1).read()
+            return server, url
+        except OSError:
+            time.sleep(0.1)
+    server.kill()
+    raise RuntimeError(f'The mock server did not start on {url}')
+
+
+def run(name, n_jobs, args):
+    # Fresh state, so every run downloads everything through the network
+    wyscout.clear_memo()
+    wyscout.set_client(None)
+    wyscout.configure_io_executor(max_workers=max(n_jobs, 1))
+    wyscout.set_rate_limiter(wyscout.RateLimiter(rate=args.rate) if args.rate else None)
+
+    latencies = []
+    sink = wyscout.add_metrics_sink(lambda record: latencies.append(record) if record['cache'] == 'miss' else None)
+    if args.memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        DOWNLOADERS[name](n_jobs, args)
+    finally:
+        elapsed = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1] if args.memory else None
+        if args.memory:
+            tracemalloc.stop()
+        wyscout.remove_metrics_sink(sink)
+
+    seconds = sorted(record['seconds'] for record in latencies)
+    percentile = lambda q: wyscout._percentile(seconds, q)
+    return {'downloader': name, 'n_jobs': n_jobs, 'requests': len(latencies), 'seconds': elapsed,
+            'requests_per_second': len(latencies) / elapsed if elapsed else 0.0,
+            'p50': percentile(50), 'p95': percentile(95), 'p99': percentile(99), 'retries': sum(record['retries'] for record in latencies),
+            'errors': sum(record['error'] is not None or (record['status'] or 0) >= 400 for record in latencies),
+            'peak_memory_mb': peak / 2 ** 20 if peak is not None else None}
+
+
+def print_results(results):
+    header = f'{"downloader":<34}{"n_jobs":>7}{"requests":>9}{"req/s":>9}{"p50 ms":>9}{"p95 ms":>9}{"p99 ms":>9}{"retries":>8}{"errors":>7}{"peak MB":>9}'
+    print(header)
+    print('-' * len(header))
+    for r in results:
+        ms = lambda value: f'{value * 1000:9.1f}' if value is not None else f'{"-":>9}'
+        memory = f'{r["peak_memory_mb"]:9.1f}' if r['peak_memory_mb'] is not None else f'{"-":>9}'
+        print(f'{r["downloader"]:<34}{r["n_jobs"]:>7}{r["requests"]:>9}{r["requests_per_second"]:9.1f}'
+              f'{ms(r["p50"])}{ms(r["p95"])}{ms(r["p99"])}{r["retries"]:>8}{r["errors"]:>7}{memory}')
+
+
+def compare(results, baseline, tolerance):
+    reference = {(r['downloader'], r['n_jobs']): r for r in baseline}
+    regressions = []
+    for r in results:
+        before = reference.get((r['downloader'], r['n_jobs']))
+        if before and r['requests_per_second'] < before['requests_per_second'] * (1 - tolerance):
+            regressions.append(f'{r["downloader"]} n_jobs={r["n_jobs"]}: {before["requests_per_second"]:.1f} -> '
+                               f'{r["requests_per_second"]:.1f} req/s')
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--only', default=None, help=f'Comma separated downloaders (default is all: {",".join(DOWNLOADERS)})')
+    parser.add_argument('--n-jobs', default='1,4,8,16', help='Comma separated n_jobs settings (default is 1,4,8,16)')
+    parser.add_argument('--matches', type=int, default=60, help='Matches per per-match downloader (default is 60)')
+    parser.add_argument('--events-per-match', type=int, default=1700)
+    parser.add_argument('--latency', type=float, default=0.05, help='Mean response delay of the mock server in seconds')
+    parser.add_argument('--jitter', type=float, default=0.02)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--throttle-rate', type=float, default=0.0)
+    parser.add_argument('--retry-after', type=float, default=0.1)
+    parser.add_argument('--fixtures', default=None, help='Directory of recorded payloads served by the mock server')
+    parser.add_argument('--rate', type=float, default=None, help='Requests/sec of the RateLimiter (default is no limiter)')
+    parser.add_argument('--no-memory', dest='memory', action='store_false', help='Skip the tracemalloc peak memory (it slows the runs)')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--json', default=None, help='Write the results to this file')
+    parser.add_argument('--baseline', default=None, help='Results file of a previous run to compare with')
+    parser.add_argument('--tolerance', type=float, default=0.15, help='Allowed req/s drop vs the baseline (default is 0.15)')
+    args = parser.parse_args()
+
+    names = args.only.split(',') if args.only else list(DOWNLOADERS)
+    unknown = [name for name in names if name not in DOWNLOADERS]
+    if unknown:
+        parser.error(f'Unknown downloaders {unknown}')
+
+    server, url = start_server(args)
+    wyscout.set_base_url(url)
+    wyscout.disable_disk_cache()
+    wyscout.set_retry_policy(wyscout.RetryPolicy(backoff_base=0.05, backoff_max=1))
+    try:
+        results = [run(name, int(n_jobs), args) for name in names for n_jobs in args.n_jobs.split(',')]
+    finally:
+        server.terminate()
+        server.wait()
+
+    print_results(results)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f'Regression: {regression}')
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == '__main__':
+    main()
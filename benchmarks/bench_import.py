@@ -0,0 +1,70 @@
+"""
+Import-time benchmark of wyscout.py.
+
+Imports wyscout in fresh interpreters and reports the median import time and the heavy
+dependencies that got loaded. Exits with status 1 if one of the HEAVY_MODULES is imported
+eagerly, if resolving the credentials (as the first call_api does) imports streamlit outside
+of an app, or if the median goes over --max-ms, so it can guard against regressions:
+
+    python benchmarks/bench_import.py --runs 20 --max-ms 150
+"""
+import argparse
+import json
+import os.path as osp
+import statistics
+import subprocess
+import sys
+
+ROOT = osp.dirname(osp.dirname(osp.abspath(__file__)))
+
+# Modules that must only be imported by the functions that use them
+HEAVY_MODULES = ('pandas', 'numpy', 'streamlit', 'tqdm', 'dotenv', 'multiprocessing.pool',
+                 'data_download.wyscout_ids', 'aiohttp', 'pyarrow', 'asyncio')
+
+PROBE = '''
+import json, sys, time
+sys.path.insert(0, {root!r})
+start = time.perf_counter()
+import wyscout
+elapsed = time.perf_counter() - start
+loaded = [m for m in {heavy!r} if m in sys.modules]
+wyscout._credentials()
+print(json.dumps({{'ms': elapsed * 1000, 'loaded': loaded, 'streamlit_on_first_call': 'streamlit' in sys.modules}}))
+'''
+
+
+def measure(runs):
+    probe = PROBE.format(root=ROOT, heavy=HEAVY_MODULES)
+    timings, loaded, streamlit_on_first_call = [], set(), False
+    for _ in range(runs):
+        output = subprocess.run([sys.executable, '-c', probe], check=True, capture_output=True, text=True).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        timings.append(result['ms'])
+        loaded.update(result['loaded'])
+        streamlit_on_first_call |= result['streamlit_on_first_call']
+    return timings, sorted(loaded), streamlit_on_first_call
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=10, help='Fresh interpreters to run (default is 10)')
+    parser.add_argument('--max-ms', type=float, default=None, help='Fail if the median import time is above this')
+    args = parser.parse_args()
+
+    timings, loaded, streamlit_on_first_call = measure(args.runs)
+    median = statistics.median(timings)
+    print(f'import wyscout: median {median:.1f} ms, min {min(timings):.1f} ms, max {max(timings):.1f} ms over {args.runs} runs')
+    print(f'heavy modules loaded at import: {loaded or "none"}')
+
+    failed = bool(loaded)
+    if streamlit_on_first_call:
+        print('resolving the credentials imported streamlit outside of a Streamlit app')
+        failed = True
+    if args.max_ms is not None and median > args.max_ms:
+        print(f'median import time {median:.1f} ms is above the {args.max_ms:.1f} ms budget')
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
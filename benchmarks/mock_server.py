@@ -0,0 +1,295 @@
+"""
+Local stand-in for the Wyscout API, to benchmark the downloaders without spending API quota.
+
+Serves synthetic (or recorded) payloads for the endpoints wyscout.py uses, with configurable
+latency, jitter, error rate and 429 throttling. Point wyscout at it with set_base_url or the
+WYSCOUT_BASE_URL environment variable:
+
+    python benchmarks/mock_server.py --port 8000 --latency 0.08 --jitter 0.04 --throttle-rate 0.02
+    WYSCOUT_BASE_URL=http://127.0.0.1:8000 python my_script.py
+
+Recorded payloads: with --fixtures DIR, a request for /v3/matches/123/events is answered with
+DIR/v3/matches/123/events.json if the file exists, with a synthetic payload otherwise.
+"""
+import argparse
+import json
+import os.path as osp
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+EVENT_TYPES = ('pass', 'duel', 'interception', 'touch', 'shot', 'clearance', 'free_kick', 'throw_in', 'infraction')
+PERIODS = ('1H', '2H')
+
+
+class MockWyscoutServer:
+    """
+    Mock Wyscout API served from a background thread.
+
+        with MockWyscoutServer(latency=0.05, jitter=0.02) as server:
+            wyscout.set_base_url(server.url)
+            ...
+
+    Parameters:
+    - port (int, optional): The port (default is 0, any free port).
+    - latency (float, optional): Mean response delay in seconds (default is 0.05).
+    - jitter (float, optional): The delay is latency +/- a uniform jitter in seconds (default is 0.02).
+    - error_rate (float, optional): Share of the requests answered with a 500 (default is 0).
+    - throttle_rate (float, optional): Share of the requests answered with a 429 (default is 0).
+    - retry_after (float, optional): Retry-After of the 429 responses in seconds (default is 1).
+    - fixtures (str, optional): Directory of recorded payloads.
+    - matches (int, optional): Matches per season (default is 380).
+    - teams (int, optional): Teams per season (default is 20).
+    - season_players (int, optional): Players per season, served 100 per page (default is 600).
+    - players_per_match (int, optional): Players in the match-level stats and physical data (default is 30).
+    - events_per_match (int, optional): Events per match (default is 1700).
+    - seed (int, optional): Seed of the latency and errors (default is None).
+    """
+
+    def __init__(self, port=0, latency=0.05, jitter=0.02, error_rate=0.0, throttle_rate=0.0, retry_after=1.0, fixtures=None,
+                 matches=380, teams=20, season_players=600, players_per_match=30, events_per_match=1700, seed=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self.fixtures = fixtures
+        self.matches = matches
+        self.teams = teams
+        self.season_players = season_players
+        self.players_per_match = players_per_match
+        self.events_per_match = events_per_match
+
+        self.requests = 0
+        self.statuses = {}
+        # (path, query) -> body, so the server is not the bottleneck of the benchmarks
+        self._bodies = {}
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', port), self._handler())
+        self.server.daemon_threads = True
+        self.port = self.server.server_address[1]
+        self.url = f'http://127.0.0.1:{self.port}'
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, name='mock-wyscout', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _handler(self):
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            # Keep-alive responses are written in several small sends, without TCP_NODELAY the
+            # client's delayed ACK stalls each of them by ~40 ms
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                status, body, headers = mock.respond(self.path)
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def respond(self, path):
+        """
+        Returns (status, body, headers) for a request path, after the simulated latency.
+        """
+        with self._lock:
+            self.requests += 1
+            delay = max(0.0, self.latency + self._random.uniform(-self.jitter, self.jitter))
+            draw = self._random.random()
+        time.sleep(delay)
+
+        if draw < self.throttle_rate:
+            status, body, headers = 429, b'{"error":{"code":429,"message":"Too Many Requests"}}', {'Retry-After': f'{self.retry_after:g}'}
+        elif draw < self.throttle_rate + self.error_rate:
+            status, body, headers = 500, b'{"error":{"code":500,"message":"Internal Server Error"}}', {}
+        else:
+            url = urlsplit(path)
+            body = self._body(url.path, url.query)
+            status, headers = (200, {}) if body is not None else (404, {})
+            body = body if body is not None else b'{"error":{"code":404,"message":"Not Found"}}'
+
+        with self._lock:
+            self.statuses[status] = self.statuses.get(status, 0) + 1
+        return status, body, headers
+
+    def _body(self, path, query):
+        # Payloads are built once per url and kept by the server, a concurrent miss builds it twice
+        try:
+            return self._bodies[path, query]
+        except KeyError:
+            pass
+        body = None
+        if self.fixtures:
+            file = osp.join(self.fixtures, path.strip('/') + '.json')
+            if osp.exists(file):
+                with open(file, 'rb') as f:
+                    body = f.read()
+        if body is None:
+            payload = self.payload(path, parse_qs(query))
+            body = None if payload is None else json.dumps(payload, separators=(',', ':')).encode()
+        self._bodies[path, query] = body
+        return body
+
+    def payload(self, path, query):
+        """
+        Returns the synthetic payload of an endpoint, or None if the endpoint is not mocked.
+        """
+        for pattern, build in self._routes():
+            match = re.fullmatch(pattern, path)
+            if match:
+                return build(*[int(group) for group in match.groups()], query=query)
+        return None
+
+    def _routes(self):
+        return ((r'/v\d/seasons/(\d+)/matches', self.season_matches),
+                (r'/v\d/seasons/(\d+)/teams', self.season_teams),
+                (r'/v\d/seasons/(\d+)/players', self.season_players_page),
+                (r'/v\d/seasons/(\d+)', lambda seasonId, query: {'wyId': seasonId, 'competitionId': 524, 'name': '2024/2025'}),
+                (r'/v\d/matches/(\d+)', self.match_details),
+                (r'/v\d/matches/(\d+)/events', self.match_events),
+                (r'/v\d/matches/(\d+)/advancedstats', self.match_advanced_stats),
+                (r'/v\d/matches/(\d+)/advancedstats/players', self.match_players_advanced_stats),
+                (r'/v\d/matches/(\d+)/formations', self.match_formations),
+                (r'/v\d/matches/(\d+)/physicaldata', self.match_physical_data),
+                (r'/v\d/teams/(\d+)', lambda teamId, query: {'wyId': teamId, 'name': f'Team {teamId}', 'city': 'City', 'category': 'default'}),
+                (r'/v\d/players/(\d+)/advancedstats', self.player_season_stats),
+                (r'/v\d/players/(\d+)/matches/(\d+)/advancedstats', self.player_match_stats))
+
+    def _match_teams(self, matchId):
+        home = matchId % self.teams + 1
+        return home, (home + matchId // self.teams) % self.teams + 1 if self.teams > 1 else home
+
+    def _stats(self, rnd):
+        return {'positions': [{'position': {'name': 'Centre Midfielder', 'code': rnd.choice(('cmf', 'dmf', 'amf'))}, 'percent': 100}],
+                'total': {'goals': rnd.randint(0, 2), 'assists': rnd.randint(0, 1), 'passes': rnd.randint(10, 80),
+                          'successfulPasses': rnd.randint(5, 70), 'duels': rnd.randint(3, 20), 'minutesOnField': rnd.randint(1, 90)},
+                'average': {'passes': round(rnd.uniform(10, 80), 2), 'duels': round(rnd.uniform(3, 20), 2)},
+                'percent': {'successfulPasses': round(rnd.uniform(50, 95), 2), 'duelsWon': round(rnd.uniform(20, 80), 2)}}
+
+    def season_matches(self, seasonId, query):
+        return {'matches': [{'matchId': seasonId * 1000 + i, 'competitionId': 524, 'seasonId': seasonId, 'roundId': i // 10 + 1,
+                             'status': 'Played', 'dateutc': f'2024-{i // 28 % 12 + 1:02d}-{i % 28 + 1:02d} 15:00:00',
+                             'label': f'Match {i}'} for i in range(self.matches)]}
+
+    def season_teams(self, seasonId, query):
+        return {'teams': [{'wyId': teamId, 'name': f'Team {teamId}'} for teamId in range(1, self.teams + 1)]}
+
+    def season_players_page(self, seasonId, query):
+        limit = int(query.get('limit', ['100'])[0])
+        page = int(query.get('page', ['1'])[0])
+        page_count = max(1, -(-self.season_players // limit))
+        first = (page - 1) * limit
+        return {'meta': {'page_current': page, 'page_size': limit, 'page_count': page_count, 'total_items': self.season_players},
+                'players': [{'wyId': 1000 + i, 'shortName': f'Player {i}'} for i in range(first, min(first + limit, self.season_players))]}
+
+    def match_details(self, matchId, query):
+        home, away = self._match_teams(matchId)
+        rnd = random.Random(matchId)
+        return {'wyId': matchId, 'label': f'Team {home} - Team {away}', 'status': 'Played', 'dateutc': '2024-01-01 15:00:00',
+                'winner': home, 'roundId': 1, 'gameweek': 1, 'seasonId': matchId // 1000, 'competitionId': 524,
+                'teamsData': {str(team): {'teamId': team, 'side': side, 'score': rnd.randint(0, 3), 'coachId': team * 10}
+                              for team, side in ((home, 'home'), (away, 'away'))}}
+
+    def match_events(self, matchId, query):
+        home, away = self._match_teams(matchId)
+        rnd = random.Random(matchId)
+        events = []
+        for i in range(self.events_per_match):
+            team = home if rnd.random() < 0.5 else away
+            minute = i * 95 // max(1, self.events_per_match)
+            events.append({'id': matchId * 10000 + i, 'matchId': matchId, 'matchPeriod': PERIODS[minute >= 45],
+                           'minute': minute, 'second': rnd.randint(0, 59),
+                           'type': {'primary': rnd.choice(EVENT_TYPES), 'secondary': []},
+                           'location': {'x': rnd.randint(0, 100), 'y': rnd.randint(0, 100)},
+                           'team': {'id': team, 'name': f'Team {team}'},
+                           'player': {'id': team * 100 + rnd.randint(1, 15), 'name': 'Player', 'position': 'CMF'}})
+        return {'events': events}
+
+    def match_advanced_stats(self, matchId, query):
+        rnd = random.Random(matchId)
+        return {'matchId': matchId, 'general': {str(team): self._stats(rnd)['total'] for team in self._match_teams(matchId)}}
+
+    def _match_players(self, matchId):
+        home, away = self._match_teams(matchId)
+        half = self.players_per_match // 2
+        return [team * 100 + i for team, count in ((home, half), (away, self.players_per_match - half)) for i in range(1, count + 1)]
+
+    def match_players_advanced_stats(self, matchId, query):
+        rnd = random.Random(matchId)
+        return {'players': [dict(self._stats(rnd), playerId=playerId, matchId=matchId, competitionId=524)
+                            for playerId in self._match_players(matchId)]}
+
+    def match_formations(self, matchId, query):
+        return {str(team): {'1H': {'0': {'scheme': '4-3-3', 'startSec': 0, 'endSec': 2700}}} for team in self._match_teams(matchId)}
+
+    def match_physical_data(self, matchId, query):
+        rnd = random.Random(matchId)
+        return [{'playerId': playerId, 'matchId': matchId, 'period': period, 'distance': round(rnd.uniform(3000, 6000), 1),
+                 'sprints': rnd.randint(5, 40), 'topSpeed': round(rnd.uniform(25, 35), 2)}
+                for playerId in self._match_players(matchId) for period in PERIODS]
+
+    def player_season_stats(self, playerId, query):
+        rnd = random.Random(playerId)
+        return dict(self._stats(rnd), playerId=playerId, competitionId=int(query.get('compId', ['0'])[0]),
+                    seasonId=int(query.get('seasonId', ['0'])[0]), player={'wyId': playerId, 'shortName': f'Player {playerId}'})
+
+    def player_match_stats(self, playerId, matchId, query):
+        rnd = random.Random(playerId * 100003 + matchId)
+        return dict(self._stats(rnd), playerId=playerId, matchId=matchId, competitionId=524)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--latency', type=float, default=0.05, help='Mean response delay in seconds')
+    parser.add_argument('--jitter', type=float, default=0.02, help='Uniform jitter of the delay in seconds')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Share of 500 responses')
+    parser.add_argument('--throttle-rate', type=float, default=0.0, help='Share of 429 responses')
+    parser.add_argument('--retry-after', type=float, default=1.0, help='Retry-After of the 429 responses')
+    parser.add_argument('--fixtures', default=None, help='Directory of recorded payloads')
+    parser.add_argument('--matches', type=int, default=380)
+    parser.add_argument('--events-per-match', type=int, default=1700)
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args()
+
+    server = MockWyscoutServer(port=args.port, latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+                               throttle_rate=args.throttle_rate, retry_after=args.retry_after, fixtures=args.fixtures,
+                               matches=args.matches, events_per_match=args.events_per_match, seed=args.seed)
+    print(f'Mock Wyscout API on {server.url}', flush=True)
+    try:
+        server.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,1016 @@
+"""
+Tests of the downloaders against the local mock server (benchmarks/mock_server.py), no API quota needed.
+
+    python -m pytest -q tests
+"""
+import asyncio
+import gc
+import gzip
+import json
+import os
+import os.path as osp
+import re
+import sys
+import threading
+import time
+import types
+import urllib.error
+import urllib.request
+import warnings
+import weakref
+from urllib.parse import urlsplit
+
+import pytest
+
+os.environ.setdefault('TQDM_DISABLE', '1')
+
+ROOT = osp.dirname(osp.dirname(osp.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, osp.join(ROOT, 'benchmarks'))
+
+import wyscout  # noqa: E402
+from mock_server import MockWyscoutServer  # noqa: E402
+
+SEASON_ID = 1
+
+
+class FailingServer(MockWyscoutServer):
+    """
+    Mock server answering 500 to the paths matching one of the fail regexes, and 429 (with
+    Retry-After) to the first n requests of the paths matching a key of throttle.
+    """
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.fail = []
+        self.throttle = {}
+        self.paths = []
+
+    def respond(self, path):
+        with self._lock:
+            self.paths.append(path)
+            throttled = next((pattern for pattern, n in self.throttle.items() if n and re.search(pattern, path)), None)
+            if throttled is not None:
+                self.throttle[throttled] -= 1
+        if throttled is not None:
+            return 429, b'{"error":{"code":429,"message":"Too Many Requests"}}', {'Retry-After': '0.05'}
+        if any(re.search(pattern, path) for pattern in self.fail):
+            return 500, b'{"error":{"code":500,"message":"Internal Server Error"}}', {}
+        return super().respond(path)
+
+
+@pytest.fixture
+def server():
+    with FailingServer(latency=0, jitter=0, matches=6, players_per_match=5, events_per_match=20) as server:
+        wyscout.set_base_url(server.url)
+        wyscout.set_rate_limiter(None)
+        wyscout.set_retry_policy(wyscout.RetryPolicy(max_retries=0))
+        wyscout.disable_disk_cache()
+        wyscout.clear_memo()
+        yield server
+
+
+def _calls(server, pattern):
+    return sum(bool(re.search(pattern, path)) for path in server.paths)
+
+
+def test_iter_with_str_journal_records_failures_and_resumes(server, tmp_path):
+    journal = str(tmp_path / 'formations.jsonl')
+    server.fail = [r'/matches/1002/formations']
+
+    results = dict(wyscout.iter_match_formations(SEASON_ID, journal=journal))
+    assert sorted(results) == [1000, 1001, 1003, 1004, 1005]
+    recorded = wyscout.DownloadJournal(journal)
+    assert recorded.run['run'] == 'download_match_formations'
+    assert [failure['key'] for failure in recorded.failures()] == [1002]
+
+    server.fail = []
+    formations = wyscout.resume_download(journal)
+    assert len(formations) == 6
+    # Only the failed match is downloaded again
+    assert _calls(server, r'/matches/\d+/formations') == 7
+    assert wyscout.DownloadJournal(journal).failures() == []
+
+
+def test_iter_players_match_advance_stats_with_str_journal(server, tmp_path):
+    journal = str(tmp_path / 'players.jsonl')
+    players = [{'wyId': 101}, {'wyId': 102}]
+
+    stats = dict(wyscout.iter_players_match_advance_stats(players, 1000, journal=journal))
+    assert sorted(stats) == [101, 102]
+    assert wyscout.DownloadJournal(journal).run['run'] == 'download_players_match_advance_stats'
+    assert len(wyscout.resume_download(journal)) == 2
+
+
+def test_journal_of_another_downloader_is_rejected(server, tmp_path):
+    journal = str(tmp_path / 'events.jsonl')
+    wyscout.download_match_events(SEASON_ID, journal=journal)
+    with pytest.raises(ValueError):
+        list(wyscout.iter_match_formations(SEASON_ID, journal=journal))
+
+
+def test_bulk_failure_falls_back_per_player(server):
+    server.fail = [r'/advancedstats/players$', r'/players/102/matches/']
+
+    stats = wyscout.download_players_matches_advance_stats([(101, 1000), (102, 1000)])
+    assert set(stats) == {(101, 1000), (102, 1000)}
+    assert stats[(101, 1000)]['playerId'] == 101
+    assert stats[(102, 1000)] == -1
+
+
+def test_typed_players_match_stats_keep_failures(server):
+    server.fail = [r'/advancedstats/players$', r'/players/102/matches/']
+
+    stats = wyscout.download_players_match_advance_stats([{'wyId': 101}, {'wyId': 102}], 1000, typed=True)
+    assert isinstance(stats[0], wyscout.PlayerMatchStats) and stats[0].playerId == 101
+    assert stats[1] == -1
+
+
+def test_run_async_shares_tasks_within_a_loop_only():
+    registry = wyscout.RequestRegistry()
+
+    async def fetch():
+        await asyncio.sleep(0.05)
+        return {'ok': True}
+
+    async def concurrent():
+        return await asyncio.gather(*(registry.run_async('https://api/x', None, fetch) for _ in range(3)))
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(asyncio.run(concurrent()))) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == [[{'ok': True}] * 3] * 2
+    assert registry.report()['network_calls'] == 2
+    assert registry.report()['deduplicated_in_flight'] == 4
+
+
+def test_parquet_bool_columns_with_and_without_gaps(tmp_path):
+    pytest.importorskip('pyarrow')
+    data = {1: [{'playerId': 1, 'isGk': True}, {'playerId': 2, 'isGk': False}],
+            2: [{'playerId': 1, 'isGk': True}, {'playerId': 2}]}
+
+    wyscout.write_parquet('player_match_stats', data, str(tmp_path), 524, SEASON_ID)
+    df = wyscout.read_parquet('player_match_stats', str(tmp_path)).sort_values(['matchId', 'playerId'])
+    assert df['isGk'].tolist() == [True, False, True, None]
+
+
+def test_percentile_nearest_rank():
+    values = list(range(1, 11))
+    assert [wyscout._percentile(values, q) for q in (0, 25, 50, 95, 100)] == [1, 3, 5, 10, 10]
+    assert wyscout._percentile([1, 2, 3, 4], 50) == 2
+    assert wyscout._percentile([1, 2], 25) == 1
+    assert wyscout._percentile([], 50) is None
+
+
+def test_flattener_learned_columns_are_per_call():
+    flattener = wyscout.Flattener(columns={'wyId': 'Int64'}, rules=[(wyscout.ID_COLUMNS_PATTERN, 'Int64')])
+    declared = list(flattener.paths)
+    for matchId in range(50):
+        flattener([{str(matchId): {'wyId': matchId}}])
+    assert flattener.paths == declared
+
+    df = flattener([{'wyId': 1, 'score': 2.5}])
+    assert list(df.columns) == ['wyId', 'score']
+
+
+def test_keyed_match_details_frame_has_a_row_per_match(server):
+    df = wyscout.download_match_details(SEASON_ID, to_df=True, with_matchId_keys=True)
+    assert sorted(df['wyId'].tolist()) == [1000, 1001, 1002, 1003, 1004, 1005]
+    assert not any(column.split('.')[0].isdigit() for column in df.columns)
+
+
+def test_match_data_is_cached_forever_only_once_final(tmp_path):
+    cache = wyscout.DiskCache(str(tmp_path))
+    events = 'https://api/v3/matches/424242/events'
+    assert cache.ttl(events, {}) == wyscout.MATCH_DATA_TTL
+
+    wyscout.mark_matches_final([{'matchId': 424242, 'status': 'Played'}, {'matchId': 424243, 'status': 'Fixture'}])
+    assert cache.ttl(events, {}) == wyscout.FOREVER
+    assert cache.ttl('https://api/v3/players/7/matches/424243/advancedstats', {}) == wyscout.MATCH_DATA_TTL
+
+
+def test_client_resize_closes_the_replaced_adapter():
+    client = wyscout.WyscoutClient(username='u', password='p', pool_size=2)
+    old = client.session.get_adapter('https://api')
+    closed = []
+    old.close = lambda: closed.append(True)
+
+    client.resize(1)
+    assert client.session.get_adapter('https://api') is old and closed == []
+    client.resize(8)
+    assert client.session.get_adapter('https://api') is not old and closed == [True]
+    assert client.pool_size == 8
+    client.close()
+
+
+def test_throttled_calls_are_retried_after_retry_after(server):
+    server.throttle = {r'/matches/1000$': 2}
+    limiter = wyscout.RateLimiter(rate=50, adaptive=True)
+    wyscout.set_rate_limiter(limiter)
+    wyscout.set_retry_policy(wyscout.RetryPolicy(max_retries=3, backoff_base=0.01))
+    url = wyscout.base_url['v3'].format('/matches/1000')
+
+    start = time.monotonic()
+    assert wyscout.call_api(url)['wyId'] == 1000
+    assert time.monotonic() - start >= 0.1
+    assert _calls(server, r'/matches/1000$') == 3
+    # Two throttles halve the rate twice, the success adds it back a little
+    assert 12.5 < limiter.rate < 13
+
+
+def test_retries_exhausted_raise(server):
+    server.throttle = {r'/matches/1000$': 5}
+    wyscout.set_retry_policy(wyscout.RetryPolicy(max_retries=1, backoff_base=0.01))
+
+    with pytest.raises(wyscout.WyscoutAPIError) as error:
+        wyscout.call_api(wyscout.base_url['v3'].format('/matches/1000'))
+    assert error.value.status_code == 429
+    assert _calls(server, r'/matches/1000$') == 2
+
+
+def test_rate_limiter_bucket_and_retry_after():
+    limiter = wyscout.RateLimiter(rate=20, burst=2, adaptive=False)
+    start = time.monotonic()
+    for _ in range(4):
+        limiter.acquire()
+    # The burst is free, the next two tokens come at 20/s
+    assert 0.08 <= time.monotonic() - start < 0.5
+
+    limiter.on_throttle(retry_after=0.2)
+    assert limiter.rate == 20
+    start = time.monotonic()
+    limiter.acquire()
+    assert time.monotonic() - start >= 0.19
+
+    assert wyscout._parse_retry_after('3') == 3.0
+    assert wyscout._parse_retry_after('Wed, 21 Oct 2015 07:28:00 GMT') == 0.0
+    assert wyscout._parse_retry_after('soon') is None
+    policy = wyscout.RetryPolicy(backoff_base=1, backoff_max=4)
+    assert policy.delay(0, retry_after=10) == 4
+    assert all(0 <= policy.delay(5) <= 4 for _ in range(20))
+
+
+def test_season_matches_list_marks_match_data_final(server, tmp_path):
+    wyscout._final_matches.clear()
+    cache = wyscout.enable_disk_cache(str(tmp_path))
+    try:
+        assert len(wyscout.get_matches_list_by_season(SEASON_ID)['matches']) == 6
+        wyscout.get_match_events(1000)
+        url = wyscout.base_url['v3'].format('/matches/1000/events')
+        with gzip.open(cache._file(cache.key(url)), 'rb') as f:
+            assert json.loads(f.read())['expires_at'] is None
+
+        # A new process knows the final matches from the cache directory
+        wyscout._final_matches.clear()
+        cache = wyscout.enable_disk_cache(str(tmp_path))
+        assert cache.ttl(wyscout.base_url['v3'].format('/matches/1005/formations'), {}) == wyscout.FOREVER
+    finally:
+        wyscout.disable_disk_cache()
+
+
+def test_ttl_cache_coalesces_concurrent_misses():
+    cache = wyscout.TTLCache(maxsize=2, ttl=0.2)
+    calls = []
+    release = threading.Event()
+
+    def slow():
+        calls.append(1)
+        release.wait(1)
+        return {'wyId': 1}
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_call('k', slow))) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.05)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1 and results == [{'wyId': 1}] * 5
+    assert cache.info()['misses'] == 1 and cache.info()['coalesced'] == 4
+    assert cache.get_or_call('k', slow) == {'wyId': 1} and cache.info()['hits'] == 1
+
+    # Failures are not stored, expired and least recently used entries are dropped
+    assert cache.get_or_call('failed', lambda: -1) == -1
+    assert cache.get_or_call('failed', lambda: 'ok') == 'ok'
+    cache.get_or_call('other', lambda: 'other')
+    assert cache.info()['size'] == 2
+    time.sleep(0.25)
+    assert cache.get_or_call('other', lambda: 'fresh') == 'fresh'
+
+
+def test_memoized_lookup_shares_entries_across_call_forms(server):
+    hits = wyscout.memo_stats()['get_team_details']['hits']
+    assert wyscout.get_team_details(3) == wyscout.get_team_details(3, 'v3') == wyscout.get_team_details(teamId=3)
+    assert _calls(server, r'/teams/3$') == 1
+    assert wyscout.memo_stats()['get_team_details']['hits'] == hits + 2
+
+    wyscout.clear_memo()
+    wyscout.get_team_details(3)
+    assert _calls(server, r'/teams/3$') == 2
+
+
+def test_parquet_single_player_stats_keep_their_positions(server, tmp_path):
+    pytest.importorskip('pyarrow')
+    season = dict(wyscout.iter_advanced_stats(524, SEASON_ID, player_list=[101, 102]))
+    wyscout.write_parquet('player_season_stats', season, str(tmp_path), 524, SEASON_ID)
+    df = wyscout.read_parquet('player_season_stats', str(tmp_path)).sort_values('playerId')
+    assert df['playerId'].tolist() == [101, 102]
+    assert df['total.passes'].notna().all() and df['positions'].notna().all()
+
+    # Per-player payloads of a match and the match-level payload give one row per player
+    per_player = wyscout.download_players_matches_advance_stats([(101, 1000), (102, 1000)], min_bulk_players=3)
+    wyscout.write_parquet('player_match_stats', {1000: list(per_player.values())}, str(tmp_path), 524, SEASON_ID)
+    wyscout.write_parquet('player_match_stats', {1001: wyscout.get_all_players_match_advanced_stats(1001)}, str(tmp_path), 524, SEASON_ID)
+    df = wyscout.read_parquet('player_match_stats', str(tmp_path))
+    assert df.groupby('matchId').size().to_dict() == {1000: 2, 1001: 5}
+    assert df['total.goals'].notna().all()
+
+
+def test_parquet_integer_categoricals_are_stable_across_files(tmp_path):
+    pytest.importorskip('pyarrow')
+    import pyarrow.parquet as pq
+
+    wyscout.write_parquet('matches', [{'wyId': 1, 'gameweek': 1, 'winner': 7}, {'wyId': 2, 'gameweek': 2, 'winner': 8}],
+                          str(tmp_path / 'a'), 524, SEASON_ID)
+    wyscout.write_parquet('matches', [{'wyId': 3, 'gameweek': 1, 'winner': None}, {'wyId': 4, 'winner': 7}],
+                          str(tmp_path / 'b'), 524, 2)
+    schemas = [pq.read_schema(tmp_path / root / 'matches' / 'competitionId=524' / f'seasonId={season}' / 'part-0.parquet')
+               for root, season in (('a', SEASON_ID), ('b', 2))]
+    assert schemas[0].field('gameweek').type == schemas[1].field('gameweek').type
+    assert schemas[0].field('winner').type == schemas[1].field('winner').type
+    assert 'int64' in str(schemas[1].field('gameweek').type)
+    df = wyscout.read_parquet('matches', str(tmp_path / 'b')).sort_values('wyId')
+    assert df['gameweek'].tolist()[0] == 1 and df['winner'].tolist()[1] == 7
+
+
+class PendingServer(FailingServer):
+    """
+    Mock server whose season matches list shows the matches of pending as not played yet.
+    """
+
+    def __init__(self, pending=(), **kwargs):
+        super().__init__(**kwargs)
+        self.pending = set(pending)
+
+    def season_matches(self, seasonId, query):
+        payload = super().season_matches(seasonId, query)
+        for match in payload['matches']:
+            if match['matchId'] in self.pending:
+                match['status'] = 'Fixture'
+        return payload
+
+
+def test_sync_season_fetches_only_new_or_changed_matches(server, tmp_path):
+    manifest = str(tmp_path / 'manifest.json')
+    with PendingServer(pending={1005}, latency=0, jitter=0, matches=6, events_per_match=5) as pending:
+        wyscout.set_base_url(pending.url)
+        results = wyscout.sync_season(SEASON_ID, manifest, kinds=['details', 'events'])
+        assert sorted(results['details']) == [1000, 1001, 1002, 1003, 1004, 1005]
+        # Events are fetched once a match is final
+        assert sorted(results['events']) == [1000, 1001, 1002, 1003, 1004]
+        assert wyscout.sync_season(SEASON_ID, manifest, kinds=['details', 'events']) == {'details': {}, 'events': {}}
+
+    wyscout.set_base_url(server.url)
+    saved = []
+    results = wyscout.sync_season(SEASON_ID, manifest, kinds=['details', 'events'],
+                                  sink=lambda kind, matchId, payload: saved.append((kind, matchId)))
+    assert results == {'details': {}, 'events': {}}
+    assert sorted(saved) == [('details', 1005), ('events', 1005)]
+
+    with pytest.raises(ValueError):
+        wyscout.sync_season(2, manifest)
+
+
+def test_journal_keeps_only_keys_in_memory(server, tmp_path):
+    journal = wyscout.DownloadJournal(str(tmp_path / 'events.jsonl'))
+    events = dict(wyscout.iter_match_events(SEASON_ID, journal=journal))
+    assert len(events) == 6
+    assert journal._results == {} and len(journal._completed) == 6
+
+    # The payloads are read back from the file
+    resumed = wyscout.DownloadJournal(str(tmp_path / 'events.jsonl'))
+    assert dict(resumed.completed_items([1001, 1003, 4242])) == {1001: events[1001], 1003: events[1003]}
+    assert len(wyscout.resume_download(resumed)) == 6
+    assert _calls(server, r'/matches/\d+/events') == 6
+
+    in_memory = wyscout.DownloadJournal(None)
+    wyscout.download_match_formations(SEASON_ID, journal=in_memory)
+    assert len(list(in_memory.completed_items(range(1000, 1006)))) == 6
+
+
+def test_players_list_pages_are_fetched_concurrently(server):
+    with FailingServer(latency=0.1, jitter=0, season_players=550) as slow:
+        wyscout.set_base_url(slow.url)
+        start = time.monotonic()
+        players = wyscout.get_players_list_by_season(SEASON_ID, n_jobs=5)
+        # Page 1, then the 5 other pages at the same time
+        assert time.monotonic() - start < 0.45
+        assert [p['wyId'] for p in players] == list(range(1000, 1550))
+
+        pages = list(wyscout.get_players_list_by_season(SEASON_ID, stream=True))
+        assert len(pages) == 6 and len(pages[0]) == 100
+
+        slow.fail = [r'/players\?.*page=4']
+        with pytest.raises(wyscout.WyscoutAPIError):
+            wyscout.get_players_list_by_season(2)
+
+
+EVENTS = [
+    {'id': 1, 'type': {'primary': 'pass'}, 'player': {'id': 10}, 'team': {'id': 1}, 'matchPeriod': '1H', 'minute': 3, 'second': 0, 'location': {'x': 50, 'y': 50}},
+    {'id': 2, 'type': {'primary': 'shot'}, 'player': {'id': 10}, 'team': {'id': 1}, 'matchPeriod': '1H', 'minute': 20, 'second': 5, 'location': {'x': 90, 'y': 45}},
+    {'id': 3, 'type': {'primary': 'pass'}, 'player': {'id': 20}, 'team': {'id': 2}, 'matchPeriod': '2H', 'minute': 50, 'second': 1},
+    {'id': 4, 'type': {'name': 'duel'}, 'playerId': 20, 'teamId': 2, 'period': '2H', 'minute': 70, 'second': 9},
+    {'id': 5, 'type': {'primary': 'interception'}, 'team': {'id': 2}, 'matchPeriod': '2H', 'minute': 80, 'second': 0},
+]
+
+
+def test_event_store_filters_and_counts():
+    store = wyscout.EventStore.from_payload({'elements': [{'events': EVENTS}]}, matchId=7)
+    assert len(store) == 5
+
+    assert [e['id'] for e in store.filter(type='pass')] == [1, 3]
+    assert [e['id'] for e in store.filter(playerId=20)] == [3, 4]
+    assert [e['id'] for e in store.filter(teamId=2, minute_from=60)] == [4, 5]
+    assert [e['id'] for e in store.filter(type=['pass', 'shot'], period='1H', minute_to=10)] == [1]
+    assert store.select(type='shot')[['x', 'y']].values.tolist() == [[90, 45]]
+
+    assert store.count(type='pass') == 2
+    assert store.count('teamId').to_dict() == {1: 2, 2: 3}
+    assert store.count('playerId', teamId=2).size == 2
+
+
+def test_event_views_download_the_match_once(server):
+    store = wyscout.load_event_store(1000)
+    shots = wyscout.get_match_events_by_type(1000, 'shot')['events']
+    assert shots == store.filter(type='shot') and all(e['type']['primary'] == 'shot' for e in shots)
+
+    playerId = store.events[0]['player']['id']
+    assert all(e['player']['id'] == playerId for e in wyscout.get_player_match_events(playerId, 1000)['events'])
+
+    summary = wyscout.get_match_events_summary(1000)
+    assert summary['total_events'] == 20
+    assert sum(summary['events_by_type'].values()) == sum(summary['events_by_period'].values()) == 20
+    assert _calls(server, r'/matches/1000/events') == 1
+
+
+def test_event_warehouse_loads_final_matches_and_queries_them(server, tmp_path):
+    path = str(tmp_path / 'events.sqlite')
+    with PendingServer(pending={1005}, latency=0, jitter=0, matches=6, events_per_match=20) as pending:
+        wyscout.set_base_url(pending.url)
+        warehouse = wyscout.EventWarehouse(path)
+        assert warehouse.load_season(SEASON_ID) == 5
+        assert warehouse.load_season(SEASON_ID) == 0
+        assert _calls(pending, r'/matches/\d+/events') == 5
+        warehouse.close()
+
+    warehouse = wyscout.EventWarehouse(path)
+    assert warehouse.loaded_matches() == {1000, 1001, 1002, 1003, 1004}
+    shots = warehouse.query(type='shot')
+    assert len(shots) and set(shots['type']) == {'shot'}
+    assert len(warehouse.query(matchIds=[1000, 1001])) == 40
+
+    events = [dict(e, type=dict(e['type'], secondary=['progressive_pass'] if e['id'] == 1 else [])) for e in EVENTS]
+    warehouse.add_match(7, {'events': events}, date='2024-05-01 15:00:00', seasonId=2)
+    warehouse.add_match(8, {'events': EVENTS[:2]}, date='2024-05-08 15:00:00', seasonId=2)
+    assert warehouse.last_matches(1, n=2) == [8, 7]
+    assert warehouse.last_matches(1, n=1, before='2024-05-05') == [7]
+    assert [e['id'] for e in warehouse.query(teamId=1, secondary='progressive_pass', events=True)] == [1]
+    assert warehouse.query(playerId=10, date_from='2024-05-01', date_to='2024-05-02')['eventId'].tolist() == [1, 2]
+
+    # Adding a match again replaces its events
+    warehouse.add_match(8, {'events': EVENTS[:1]}, date='2024-05-08 15:00:00', seasonId=2)
+    assert len(warehouse.query(matchIds=8)) == 1
+    warehouse.close()
+
+
+def test_summarize_matches_events_matches_the_single_match_summary(server):
+    df = wyscout.summarize_matches_events([1000, 1001], minute_bucket=30)
+    assert set(df['breakdown']) == {'total', 'type', 'team', 'period', 'player', 'minute'}
+
+    for matchId in (1000, 1001):
+        summary = wyscout.get_match_events_summary(matchId)
+        rows = df[df['matchId'] == matchId]
+        assert rows[rows['breakdown'] == 'total']['events'].tolist() == [summary['total_events']]
+        by_type = rows[rows['breakdown'] == 'type']
+        assert dict(zip(by_type['key'], by_type['events'])) == summary['events_by_type']
+        by_team = rows[rows['breakdown'] == 'team']
+        assert dict(zip(by_team['key'], by_team['events'])) == summary['events_by_team']
+        assert set(rows[rows['breakdown'] == 'minute']['key']) <= {0, 30, 60, 90}
+        assert rows[rows['breakdown'] == 'player']['events'].sum() == 20
+
+    assert len(wyscout.summarize_matches_events(seasonId=SEASON_ID).query("breakdown == 'total'")) == 6
+    with pytest.raises(ValueError):
+        wyscout.summarize_matches_events()
+
+
+def test_projection_params_and_prune():
+    projection = wyscout.Projection(events=['type.primary', 'player.id', 'location'],
+                                    player_season_stats=['playerId', 'total.goals'],
+                                    match_details=['wyId', 'teams.home'])
+    assert projection.params('events') == {'fetch': [], 'details': [], 'exclude': ['possessions', 'names', 'positions', 'formations']}
+    assert projection.params('player_season_stats') == {'details': []}
+    assert projection.params('match_details') == {'details': ['teams']}
+    assert projection.params('formations') is None
+
+    event = {'type': {'primary': 'pass', 'secondary': ['x']}, 'player': {'id': 1, 'name': 'A'}, 'location': {'x': 1, 'y': 2}, 'minute': 3}
+    assert projection.prune('events', {'elements': [{'events': [event]}]}) == \
+        {'elements': [{'events': [{'type': {'primary': 'pass'}, 'player': {'id': 1}, 'location': {'x': 1, 'y': 2}}]}]}
+    stats = {'playerId': 1, 'total': {'goals': 2, 'assists': 1}, 'positions': []}
+    assert projection.prune('player_season_stats', stats) == {'playerId': 1, 'total': {'goals': 2}}
+    assert projection.prune('formations', stats) is stats
+    assert projection.prune('player_season_stats', -1) == -1
+
+
+def test_projection_in_the_downloaders(server):
+    projection = wyscout.Projection(events=['type.primary', 'player.name'], player_season_stats=['playerId', 'total.goals'])
+
+    events = dict(wyscout.iter_match_events(SEASON_ID, matches_list=[1000], projection=projection))[1000]['events']
+    assert events[0] == {'type': {'primary': events[0]['type']['primary']}, 'player': {'name': 'Player'}}
+    assert [path for path in server.paths if '/events' in path][0].endswith('exclude=possessions%2Cpositions%2Cformations')
+
+    stats = wyscout.download_advanced_stats(524, SEASON_ID, player_list=[101, 102], projection=projection)
+    # The declared columns of the flattener are always there, the other fields are dropped
+    assert sorted(stats['playerId']) == [101, 102] and 'total.goals' in stats.columns
+    assert not any(column.startswith(('total.passes', 'average.', 'player.')) for column in stats.columns)
+
+
+def test_credentials_read_streamlit_secrets_only_inside_an_app(monkeypatch):
+    monkeypatch.setattr(wyscout, '_credentials_value', None)
+    monkeypatch.setenv('WYSCOUT_USERNAME', 'env-user')
+    monkeypatch.setenv('WYSCOUT_PASSWORD', 'env-password')
+    monkeypatch.delitem(sys.modules, 'streamlit', raising=False)
+    assert wyscout._credentials() == ('env-user', 'env-password')
+    assert 'streamlit' not in sys.modules
+
+    app = types.ModuleType('streamlit')
+    app.secrets = {'WYSCOUT_USERNAME': 'app-user', 'WYSCOUT_PASSWORD': 'app-password'}
+    monkeypatch.setitem(sys.modules, 'streamlit', app)
+    monkeypatch.setattr(wyscout, '_credentials_value', None)
+    assert wyscout._credentials() == ('app-user', 'app-password')
+
+
+def test_async_players_match_stats_use_the_match_level_endpoint(server):
+    pytest.importorskip('aiohttp')
+    players = [{'wyId': 101}, {'wyId': 102}, {'wyId': 7}]
+    stats = asyncio.run(wyscout.async_download_players_match_advance_stats(players, 1000))
+    assert [s['playerId'] for s in stats] == [101, 102, 7]
+    assert _calls(server, r'/matches/1000/advancedstats/players') == 1
+    # 7 doesn't play in the match, only it goes through the per-player endpoint
+    assert _calls(server, r'/players/\d+/matches/1000/') == 1
+    assert stats[:2] == wyscout.download_players_match_advance_stats(players[:2], 1000)
+
+    server.fail = [r'/advancedstats/players$', r'/players/102/matches/']
+    stats = asyncio.run(wyscout.async_download_players_match_advance_stats(players[:2], 1001))
+    assert stats[0]['playerId'] == 101 and stats[1] == -1
+
+
+def test_pull_season_runs_every_kind_as_one_job(tmp_path, executor):
+    pytest.importorskip('pyarrow')
+    # n_jobs only sets the read-ahead, one worker keeps the requests in priority order
+    wyscout.configure_io_executor(max_workers=1)
+    with PendingServer(pending={1005}, latency=0, jitter=0, matches=6, teams=4, players_per_match=4) as pending:
+        wyscout.set_base_url(pending.url)
+        results = wyscout.pull_season(SEASON_ID, kinds=['players_advanced_stats', 'details', 'team_details'],
+                                      priorities={'players_advanced_stats': 0, 'details': 1, 'team_details': 1}, n_jobs=1, root=str(tmp_path))
+        assert sorted(results['details']) == [1000, 1001, 1002, 1003, 1004, 1005]
+        assert sorted(results['players_advanced_stats']) == [1000, 1001, 1002, 1003, 1004]
+        assert sorted(results['team_details']) == [1, 2, 3, 4]
+
+        # The season lists are fetched once, then the requests follow the priorities
+        assert _calls(pending, r'/seasons/1/matches') == 1
+        requests = [path for path in pending.paths if '/seasons/' not in path]
+        assert all('/advancedstats/players' in path for path in requests[:5])
+        assert all('/advancedstats' not in path for path in requests[5:])
+
+        assert len(wyscout.read_parquet('player_match_stats', str(tmp_path))) == 20
+        assert len(wyscout.read_parquet('matches', str(tmp_path))) == 6
+
+        with pytest.raises(ValueError):
+            wyscout.pull_season(SEASON_ID, kinds=['lineups'])
+
+
+def test_pull_season_journal_with_a_sink(server, tmp_path):
+    journal = str(tmp_path / 'pull.jsonl')
+    server.fail = [r'/matches/1003/formations']
+    saved = []
+    sink = lambda kind, key, payload: saved.append((kind, key))
+
+    assert wyscout.pull_season(SEASON_ID, kinds=['formations'], sink=sink, journal=journal) == {'formations': {}}
+    assert sorted(key for _, key in saved) == [1000, 1001, 1002, 1004, 1005]
+
+    server.fail = []
+    saved.clear()
+    wyscout.resume_download(journal, sink=sink)
+    assert ('formations', 1003) in saved
+    assert _calls(server, r'/matches/1003/formations') == 2
+
+
+def test_mock_server_bodies_are_cached_per_instance():
+    server = MockWyscoutServer(latency=0, jitter=0, matches=2)
+    body = server._body('/v3/seasons/1/matches', '')
+    assert server._body('/v3/seasons/1/matches', '') is body
+    other = MockWyscoutServer(latency=0, jitter=0, matches=3)
+    assert other._body('/v3/seasons/1/matches', '') != body
+    other.server.server_close()
+    server.server.server_close()
+
+    ref = weakref.ref(server)
+    del server
+    gc.collect()
+    assert ref() is None
+
+
+def test_fixtures_record_then_replay_without_network(server, tmp_path):
+    archive = str(tmp_path / 'fixtures.sqlite')
+    missing = wyscout.base_url['v3'].format('/nothing')
+    wyscout.enable_fixtures(archive, mode='record')
+    try:
+        recorded = wyscout.download_match_formations(SEASON_ID, with_matchId_keys=True)
+        assert wyscout.call_api(missing) == -1
+        assert len(wyscout.get_fixtures()) == 8
+    finally:
+        wyscout.disable_fixtures()
+    requests = len(server.paths)
+
+    # Replayed behind another host: the recorded responses are keyed without it
+    wyscout.set_base_url('http://127.0.0.1:9')
+    wyscout.enable_fixtures(archive, mode='replay')
+    try:
+        replayed = wyscout.download_match_formations(SEASON_ID, with_matchId_keys=True)
+        assert sorted(replayed, key=lambda d: next(iter(d))) == sorted(recorded, key=lambda d: next(iter(d)))
+        assert wyscout.call_api(wyscout.base_url['v3'].format('/nothing')) == -1
+        with pytest.raises(wyscout.FixtureNotFoundError):
+            wyscout.get_match_events(1000)
+        assert wyscout.get_fixtures().replayed == 8
+    finally:
+        wyscout.disable_fixtures()
+    assert len(server.paths) == requests
+
+
+def test_fixtures_record_with_a_warm_cache(server, tmp_path):
+    archive = str(tmp_path / 'fixtures.sqlite')
+    wyscout.enable_disk_cache(str(tmp_path / 'cache'))
+    try:
+        with wyscout.request_session():
+            expected = wyscout.download_match_formations(SEASON_ID, with_matchId_keys=True)
+            wyscout.get_match_details(1000)
+
+            wyscout.enable_fixtures(archive, mode='record')
+            try:
+                requests = len(server.paths)
+                # Neither the disk cache, the session nor the memoized lookups hide a request from the archive
+                recorded = wyscout.download_match_formations(SEASON_ID, with_matchId_keys=True)
+                assert len(server.paths) - requests == 7 == len(wyscout.get_fixtures())
+            finally:
+                wyscout.disable_fixtures()
+    finally:
+        wyscout.disable_disk_cache()
+    by_match = lambda d: next(iter(d))
+    assert sorted(recorded, key=by_match) == sorted(expected, key=by_match)
+
+    wyscout.clear_memo()
+    wyscout.set_base_url('http://127.0.0.1:9')
+    wyscout.enable_fixtures(archive, mode='replay')
+    try:
+        replayed = wyscout.download_match_formations(SEASON_ID, with_matchId_keys=True)
+    finally:
+        wyscout.disable_fixtures()
+    assert sorted(replayed, key=by_match) == sorted(expected, key=by_match)
+
+
+def test_async_downloaders_match_the_threaded_ones(server):
+    pytest.importorskip('aiohttp')
+
+    async def run():
+        async with wyscout.AsyncWyscoutClient(username='user', password='secret', max_in_flight=4) as client:
+            assert client.session.headers['Authorization'] == 'Basic dXNlcjpzZWNyZXQ='
+            details = await wyscout.async_download_match_details(SEASON_ID, to_df=True, client=client)
+            formations = await wyscout.async_download_match_formations(SEASON_ID, with_matchId_keys=True, client=client)
+            return details, formations
+
+    with warnings.catch_warnings():
+        warnings.simplefilter('error', DeprecationWarning)
+        details, formations = asyncio.run(run())
+    assert sorted(details['wyId'].tolist()) == [1000, 1001, 1002, 1003, 1004, 1005]
+    expected = wyscout.download_match_formations(SEASON_ID, with_matchId_keys=True)
+    assert sorted(formations, key=lambda d: next(iter(d))) == sorted(expected, key=lambda d: next(iter(d)))
+
+    # Failures are printed and skipped, like in the threaded downloaders
+    server.fail = [r'/matches/1002/advancedstats$']
+    stats = asyncio.run(wyscout.async_download_match_advance_stats(SEASON_ID, with_matchId_keys=True))
+    assert sorted(next(iter(d)) for d in stats) == [1000, 1001, 1003, 1004, 1005]
+
+
+def test_overlapping_cache_bypass_blocks(server, tmp_path):
+    cache = wyscout.enable_disk_cache(str(tmp_path))
+    try:
+        url = wyscout.base_url['v3'].format('/seasons/1/matches')
+        wyscout.call_api(url)
+        barrier = threading.Barrier(8)
+
+        def bypass():
+            for _ in range(200):
+                with wyscout.cache_bypass():
+                    pass
+            barrier.wait()
+
+        threads = [threading.Thread(target=bypass) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert wyscout._cache_bypass == 0
+        # Reads hit the cache again once every block is closed
+        wyscout.call_api(url)
+        assert _calls(server, r'/seasons/1/matches') == 1
+        assert cache.get(url)[0]
+    finally:
+        wyscout.disable_disk_cache()
+
+
+def test_request_session_keeps_only_the_shared_endpoints(server):
+    with wyscout.request_session() as session:
+        wyscout.download_match_formations(SEASON_ID)
+        wyscout.download_match_events(SEASON_ID)
+        wyscout.get_match_events(1000)
+
+    assert _calls(server, r'/seasons/1/matches') == 1
+    assert _calls(server, r'/matches/1000/events') == 2
+    assert session.report()['reused'] == 1
+    assert len(session._results) == 1
+
+
+def test_resume_download_runs_only_the_downloaders(tmp_path, capsys, server):
+    journal = str(tmp_path / 'evil.jsonl')
+    with open(journal, 'w') as f:
+        f.write(json.dumps({'run': 'enable_disk_cache', 'args': {'path': str(tmp_path / 'x')}}) + '\n')
+    with pytest.raises(ValueError):
+        wyscout.resume_download(journal)
+    assert wyscout.get_disk_cache() is None
+
+    # Failures recorded in a journal are not printed
+    server.fail = [r'/matches/1002/formations']
+    wyscout.download_match_formations(SEASON_ID, journal=str(tmp_path / 'formations.jsonl'))
+    assert 'Error fetching' not in capsys.readouterr().out
+    wyscout.download_match_formations(SEASON_ID)
+    assert 'Error fetching' in capsys.readouterr().out
+
+
+def test_event_store_of_a_live_match_expires_with_the_match_data(server):
+    wyscout._final_matches.discard(1000)
+
+    def lifetime():
+        (expires, _), = wyscout.load_event_store.cache._data.values()
+        return expires - time.monotonic()
+
+    wyscout.load_event_store(1000)
+    assert lifetime() <= wyscout.MATCH_DATA_TTL
+
+    wyscout.clear_memo()
+    wyscout.mark_matches_final([{'matchId': 1000, 'status': 'Played'}])
+    wyscout.load_event_store(1000)
+    assert wyscout.MATCH_DATA_TTL < lifetime() <= wyscout.EVENT_STORE_TTL
+
+
+def test_default_json_decoder_fallback_order(monkeypatch):
+    fast = types.ModuleType('orjson')
+    fast.loads = lambda raw: 'orjson'
+    other = types.ModuleType('ujson')
+    other.loads = lambda raw: 'ujson'
+
+    monkeypatch.setitem(sys.modules, 'orjson', fast)
+    monkeypatch.setitem(sys.modules, 'ujson', other)
+    assert wyscout._default_json_decoder() is fast.loads
+    monkeypatch.setitem(sys.modules, 'orjson', None)
+    assert wyscout._default_json_decoder() is other.loads
+    monkeypatch.setitem(sys.modules, 'ujson', None)
+    assert wyscout._default_json_decoder() is json.loads
+
+
+def test_custom_json_decoder_and_timings(server, tmp_path):
+    decoded = []
+
+    def decoder(raw):
+        assert isinstance(raw, bytes)
+        decoded.append(len(raw))
+        return json.loads(raw)
+
+    wyscout.set_json_decoder(decoder)
+    cache = wyscout.enable_disk_cache(str(tmp_path))
+    try:
+        wyscout.reset_timings()
+        urls = [wyscout.base_url['v3'].format(path) for path in ('/matches/1000/events', '/matches/1001/formations')]
+        payloads = [wyscout.call_api(url) for url in urls]
+        sizes = [len(server._body(urlsplit(url).path, '')) for url in urls]
+
+        timings = wyscout.get_timings()
+        assert timings['requests'] == 2 and timings['bytes'] == sum(sizes)
+        assert timings['network_seconds'] > 0 and timings['decode_seconds'] > 0
+        assert 0 < timings['decode_share'] < 1
+        assert decoded == sizes
+
+        # The cache reads go through the same decoder, and don't count as API calls
+        assert cache.get(urls[0]) == (True, payloads[0])
+        assert len(decoded) == 3 and wyscout.get_timings()['requests'] == 2
+    finally:
+        wyscout.set_json_decoder(None)
+        wyscout.disable_disk_cache()
+        wyscout.reset_timings()
+    assert wyscout.get_timings() == {'requests': 0, 'bytes': 0, 'network_seconds': 0.0, 'decode_seconds': 0.0, 'decode_share': 0.0}
+
+
+def test_iter_download_reads_ahead_of_the_consumer():
+    for max_pending, expected in ((None, 4), (6, 6)):
+        started = []
+        fn = lambda key: started.append(key) or key
+        results = wyscout._iter_download(fn, range(10), 2, 'test', 'test', max_pending=max_pending)
+        next(results)
+        time.sleep(0.1)
+        # The consumer is busy with the first result, the others keep downloading
+        assert len(started) == expected
+        assert len(list(results)) == 9
+
+
+@pytest.fixture
+def executor():
+    yield
+    wyscout.configure_io_executor()
+
+
+def test_io_executor_async_mode(executor):
+    io = wyscout.configure_io_executor(max_workers=2, mode='async')
+    assert wyscout.get_io_executor() is io
+    running, peak = [0], [0]
+
+    async def job(n):
+        running[0] += 1
+        peak[0] = max(peak[0], running[0])
+        await asyncio.sleep(0.02)
+        running[0] -= 1
+        return n * 2
+
+    futures = [io.submit(job, n) for n in range(6)] + [io.submit(lambda: 'thread')]
+    assert [future.result(timeout=5) for future in futures] == [0, 2, 4, 6, 8, 10, 'thread']
+    # Coroutine functions run on the loop, at most max_workers at a time
+    assert peak[0] == 2
+
+
+def test_io_executor_runs_nested_submits_inline(executor):
+    previous = wyscout.get_io_executor()
+    io = wyscout.configure_io_executor(max_workers=1)
+    assert io is not previous and previous._pool._shutdown
+
+    def outer():
+        # With one worker, waiting on a queued inner call would deadlock
+        inner = wyscout.get_io_executor().submit(threading.current_thread)
+        return inner.result(timeout=5) is threading.current_thread()
+
+    assert io.submit(outer).result(timeout=5) is True
+
+    async def coroutine():
+        return 1
+
+    nested = io.submit(lambda: wyscout.get_io_executor().submit(coroutine)).result(timeout=5)
+    with pytest.raises(TypeError):
+        nested.result()
+    with pytest.raises(ValueError):
+        wyscout.IOExecutor(mode='process')
+
+
+def _metrics_record(endpoint='/v3/matches/{id}', status=200, cache='miss', seconds=0.1, **values):
+    return dict({'time': 0.0, 'endpoint': endpoint, 'status': status, 'cache': cache, 'bytes': 100, 'retries': 0,
+                 'wait': 0.0, 'ttfb': 0.05, 'download': 0.01, 'decode': 0.001, 'seconds': seconds, 'error': None}, **values)
+
+
+def test_metrics_aggregator_counters_and_latencies():
+    metrics = wyscout.MetricsAggregator(max_samples=50)
+    for i in range(1, 101):
+        metrics(_metrics_record(seconds=i / 100))
+    metrics(_metrics_record(status=429, retries=2, wait=1.5))
+    metrics(_metrics_record(status=None, cache='hit', bytes=0, ttfb=None, download=None, decode=None))
+    metrics(_metrics_record(status=None, error='ConnectionError: refused'))
+    metrics(_metrics_record(endpoint='/v3/areas', cache='shared'))
+
+    stats = metrics.summary()['/v3/matches/{id}']
+    assert stats['requests'] == 103 and stats['errors'] == 2
+    assert stats['statuses'] == {200: 100, 429: 1}
+    assert stats['cache_hits'] == 1 and stats['retries'] == 2 and stats['wait'] == 1.5
+    assert stats['bytes'] == 102 * 100
+    assert stats['ttfb'] == pytest.approx(0.05 * 102)
+    # The latencies past max_samples are a uniform sample
+    assert len(metrics.endpoints['/v3/matches/{id}']['latencies']) == 50
+    assert stats['p50'] <= stats['p95'] <= stats['p99'] <= stats['max'] <= 1.0
+    assert metrics.summary()['/v3/areas']['shared'] == 1
+
+    metrics.reset()
+    assert metrics.summary() == {}
+
+
+def test_metrics_sinks_get_every_call(server, tmp_path):
+    path = str(tmp_path / 'metrics' / 'calls.jsonl')
+    sink = wyscout.add_metrics_sink(wyscout.JsonLinesMetricsSink(path))
+    metrics = wyscout.add_metrics_sink(wyscout.MetricsAggregator())
+    try:
+        wyscout.call_api(wyscout.base_url['v3'].format('/matches/1000'))
+        wyscout.call_api(wyscout.base_url['v3'].format('/nothing'))
+    finally:
+        sink.close()
+        wyscout.remove_metrics_sink(metrics)
+
+    with open(path) as f:
+        records = [json.loads(line) for line in f]
+    assert [(r['endpoint'], r['status'], r['cache']) for r in records] == [('/v3/matches/{id}', 200, 'miss'), ('/v3/nothing', 404, 'miss')]
+    assert records[0]['bytes'] > 0 and records[0]['seconds'] >= records[0]['ttfb'] > 0
+
+    exporter = wyscout.PrometheusExporter(metrics, port=0)
+    try:
+        with urllib.request.urlopen(f'http://127.0.0.1:{exporter.port}/metrics') as response:
+            text = response.read().decode()
+        with pytest.raises(urllib.error.HTTPError):
+            urllib.request.urlopen(f'http://127.0.0.1:{exporter.port}/other')
+    finally:
+        exporter.close()
+    assert '# TYPE wyscout_requests_total counter' in text
+    assert 'wyscout_requests_total{endpoint="/v3/matches/{id}",status="200"} 1' in text
+    assert 'wyscout_requests_total{endpoint="/v3/nothing",status="404"} 1' in text
+    assert 'wyscout_request_seconds_count{endpoint="/v3/matches/{id}"} 1' in text
+    assert 'wyscout_request_seconds{endpoint="/v3/matches/{id}",quantile="0.99"}' in text
+
+
+def test_last_run_metrics_of_a_run_stopped_early(server):
+    wyscout.download_match_formations(SEASON_ID)
+    assert wyscout.last_run_metrics()['/v3/matches/{id}/formations']['requests'] == 6
+
+    for _ in wyscout.iter_match_events(SEASON_ID, n_jobs=1, max_pending=1):
+        break
+    summary = wyscout.last_run_metrics()
+    assert '/v3/matches/{id}/formations' not in summary
+    assert 1 <= summary['/v3/matches/{id}/events']['requests'] < 6
+
+
+def test_parse_records_of_every_payload_shape(server):
+    match = wyscout.get_match_details(1000, typed=True)
+    raw = wyscout.get_match_details(1000)
+    assert match == wyscout.parse_records('match', raw)
+    assert (match.matchId, match.status, match.homeTeamId) == (1000, 'Played', raw['teamsData'][str(match.homeTeamId)]['teamId'])
+    assert match.homeScore == raw['teamsData'][str(match.homeTeamId)]['score']
+    matches = wyscout.get_matches_list_by_season(SEASON_ID, typed=True)
+    assert [m.matchId for m in matches] == list(range(1000, 1006))
+    assert wyscout.parse_records('match', -1) == -1
+
+    team = wyscout.parse_records('team', {'wyId': 3, 'name': 'Team 3', 'area': {'name': 'Italy'}, 'extra': True})
+    assert (team.teamId, team.name, team.area, team.city) == (3, 'Team 3', 'Italy', None)
+    assert team.to_dict()['officialName'] is None
+
+    # The physical data come either as a list of records or as one record, nested objects are flattened
+    physical = wyscout.get_all_players_match_physical_data(1000, typed=True)
+    assert len(physical) == 5 * 2 and physical[0].values.names() == ['distance', 'sprints', 'topSpeed']
+    single = wyscout.parse_records('physical_data', {'playerId': 7, 'matchId': 1, 'speed': {'max': 33.1, 'avg': 7.2},
+                                                     'distance': 5000.5, 'splits': [1, 2]})
+    assert len(single) == 1 and single[0].playerId == 7
+    assert single[0].values.to_dict() == {'speed.max': 33.1, 'speed.avg': 7.2, 'distance': 5000.5}
+
+    events = wyscout.get_match_events(1000, typed=True)
+    raw = wyscout.get_match_events(1000)['events']
+    assert len(events) == len(raw) == 20 and events[0].id == raw[0]['id']
+    assert (events[0].x, events[0].y) == (raw[0]['location']['x'], raw[0]['location']['y'])
+    assert (events[0].playerId, events[0].teamId, events[0].period) == (raw[0]['player']['id'], raw[0]['team']['id'], raw[0]['matchPeriod'])
+    assert events[0].type == raw[0]['type']['primary'] and events[0].secondary == ()
+    assert wyscout.parse_records('events', {'elements': [{'events': raw[:3]}]}) == events[:3]
+
+    stats = wyscout.get_all_players_match_advanced_stats(1000, typed=True)
+    assert stats[0].total.goals == wyscout.get_all_players_match_advanced_stats(1000)[0]['total']['goals']
+    assert stats[0].positions[0] in ('cmf', 'dmf', 'amf')
+
+
+def test_records_to_frame(server):
+    frame = wyscout.records_to_frame(wyscout.download_all_players_match_advance_stats(SEASON_ID, matches_list=[1000, 1001], typed=True))
+    assert len(frame) == 10
+    assert {'playerId', 'matchId', 'total.goals', 'average.passes', 'percent.duelsWon'} <= set(frame.columns)
+
+    physical = wyscout.records_to_frame([wyscout.get_all_players_match_physical_data(1000, typed=True),
+                                         wyscout.parse_records('physical_data', {'playerId': 7, 'speed': {'max': 33.1}})])
+    # The values of PhysicalData are columns without prefix, missing ones are None
+    assert len(physical) == 11 and {'distance', 'speed.max'} <= set(physical.columns)
+    assert physical['speed.max'].iloc[-1] == 33.1 and physical['distance'].isna().iloc[-1]
+
+    events = wyscout.records_to_frame([wyscout.get_match_events(1000, typed=True)])
+    assert len(events) == 20 and list(events.columns) == list(wyscout.Event.FIELDS)
+    assert wyscout.records_to_frame([-1]).empty
+
+
+def test_metrics_schemas_are_bounded(monkeypatch):
+    monkeypatch.setattr(wyscout.Metrics, 'MAX_SCHEMAS', 3)
+    monkeypatch.setattr(wyscout.Metrics, '_schemas', {})
+    groups = [wyscout.Metrics({f'metric{i}': i, 'shared': -i}) for i in range(10)]
+    assert len(wyscout.Metrics._schemas) <= 3
+    assert [g.get(f'metric{i}') for i, g in enumerate(groups)] == list(range(10))
+    assert groups[9].shared == -9 and groups[0].to_dict() == {'metric0': 0, 'shared': 0}
+    # Groups with the same names still share one map
+    assert wyscout.Metrics({'metric9': 1, 'shared': 2})._index is groups[9]._index
@@ -1,1006 +1,4764 @@
-from functools import partial
-from multiprocessing import Pool
+import base64
+from collections import OrderedDict
+from contextlib import contextmanager
+from email.utils import parsedate_to_datetime
+from functools import partial, wraps
+import gzip
+import hashlib
+import importlib
+import inspect
+import json
+import math
 import os 
 import os.path as osp
-
-import pandas as pd
+import random
+import re
+import sqlite3
+import sys
+import threading
+import time
+from urllib.parse import urlencode, urlsplit
+import zlib
 
 
 import requests
+from requests.adapters import HTTPAdapter
 from requests.auth import HTTPBasicAuth
 
-from tqdm import tqdm
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
 
 #from data_download.config import (WYSCOUT_USERNAME, WYSCOUT_PASSWORD)
 
-from data_download.wyscout_ids import (base_url,
-                         legues_ids,
-                         serieA_seasons,
-                         competitions)
 
-import streamlit as st
+#MARK: Lazy imports
+# pandas, numpy, asyncio, tqdm, streamlit, dotenv, multiprocessing and the ids module are imported by the
+# functions that need them, so that importing this module (e.g. in a worker that only uses
+# call_api) stays cheap. See benchmarks/bench_import.py.
+class _LazyModule:
+    """
+    Stands for a module that is imported on first attribute access (e.g. pd.json_normalize).
+    """
 
-try:
-    WYSCOUT_USERNAME = st.secrets['WYSCOUT_USERNAME']
-    WYSCOUT_PASSWORD = st.secrets['WYSCOUT_PASSWORD']
-except Exception:
-    from dotenv import load_dotenv
-    load_dotenv()
-    WYSCOUT_USERNAME = os.environ.get('WYSCOUT_USERNAME')
-    WYSCOUT_PASSWORD = os.environ.get('WYSCOUT_PASSWORD')
+    def __init__(self, name):
+        self._name = name
 
+    def __getattr__(self, attr):
+        value = getattr(importlib.import_module(self._name), attr)
+        # Later lookups of the attribute don't go through __getattr__
+        self.__dict__[attr] = value
+        return value
 
-def call_api(url,params=None):
-  """
-  Funzione per fare una call all'api tramite una get:
-  url:string = url richiesto per scaricare i dati
 
-  Return:
-  - Se il download ha successo, restituisce il json relativo
-  - Se il download non ha successo stampa l'errore e restituisce -1
-  """
-  response = requests.get(url, auth = HTTPBasicAuth(username=WYSCOUT_USERNAME, password=WYSCOUT_PASSWORD), headers = {
-        'Content-Type': 'application/json',
-    },
-    params=params)
-
-  if response.ok:
-    return response.json()
-  else :
-    print('Chimata errata: ', response.text)
-    return -1
-  
-def get_areas(version='v3'):
-    url = base_url[version].format(f'/areas')
-    return call_api(url)
+pd = _LazyModule('pandas')
+np = _LazyModule('numpy')
+asyncio = _LazyModule('asyncio')
 
-  
-#MARK: Competition list
-def get_competition_details(competitionId, version='v3'):
-    """
-    Ottiene i dettagli della competizione specificata tramite richiesta API.
 
-    Args:
-    - competitionId (str): Identificativo della competizione.
-    - version (str, optional): Versione dell'API da utilizzare. Predefinito a 'v3'.
+def tqdm(*args, **kwargs):
+    from tqdm import tqdm
+    return tqdm(*args, **kwargs)
 
-    Returns:
-    - dict: Dettagli della competizione.
+
+class _LazyIds:
+    """
+    Stands for a mapping of data_download.wyscout_ids (e.g. base_url), imported on first use.
     """
-    url = base_url[version].format(f'/competitions/{competitionId}')
-    return call_api(url)
 
+    def __init__(self, name):
+        self._name = name
 
-def get_competitions_list(areaId = 'ITA',version='v3'):
+    def _value(self):
+        return getattr(importlib.import_module('data_download.wyscout_ids'), self._name)
+
+    def __getitem__(self, key):
+        return self._value()[key]
+
+    def __iter__(self):
+        return iter(self._value())
+
+    def __len__(self):
+        return len(self._value())
+
+    def __contains__(self, key):
+        return key in self._value()
+
+    def __repr__(self):
+        return repr(self._value())
+
+
+base_url = _LazyIds('base_url')
+legues_ids = _LazyIds('legues_ids')
+serieA_seasons = _LazyIds('serieA_seasons')
+competitions = _LazyIds('competitions')
+
+API_VERSIONS = ('v2', 'v3', 'v4')
+
+
+def set_base_url(host):
     """
-    Function to retrieve a list of competitions using the Wyscout API.
+    Sends the API calls to another host (e.g. the mock server of benchmarks/mock_server.py),
+    or back to the Wyscout API with None. The WYSCOUT_BASE_URL environment variable sets it at import.
+    The memoized lookups are not keyed by host: call clear_memo() after switching.
 
     Parameters:
-    - user (str): The user identifier for Wyscout API credentials.
-    - version (str, optional): The API version to use (default is 'v3').
-
-    Returns:
-    - Returns the list of competitions obtained from the Wyscout API.
+    - host (str or None): The root url, e.g. 'http://127.0.0.1:8000' (the version is appended).
     """
-    # Construct the URL for retrieving competitions in Italy (areaId=ITA)
-    url = base_url[version].format(f'/competitions?areaId={areaId}')
+    global base_url
+    if host is None:
+        base_url = _LazyIds('base_url')
+    else:
+        base_url = {version: host.rstrip('/') + f'/{version}{{}}' for version in API_VERSIONS}
 
-    # Make an API call to get the competitions list
-    return call_api(url=url)
 
-#MARK: Season list
-def get_season_details(seasonId, version='v3'):
-    """
-    Ottiene i dettagli della stagione specificata tramite richiesta API.
+if os.environ.get('WYSCOUT_BASE_URL'):
+    set_base_url(os.environ['WYSCOUT_BASE_URL'])
 
-    Args:
-    - seasonId (str): Identificativo della stagione.
-    - version (str, optional): Versione dell'API da utilizzare. Predefinito a 'v3'.
 
-    Returns:
-    - dict: Dettagli della stagione.
-    """
-    url = base_url[version].format(f'/seasons/{seasonId}')
-    return call_api(url)
+_credentials_value = None
+_credentials_lock = threading.Lock()
 
 
-def get_seasons_list(compId, version='v3'):
+def _credentials():
     """
-    Function to download a list of seasons for a specific competition using the Wyscout API.
+    Resolves (WYSCOUT_USERNAME, WYSCOUT_PASSWORD) on first call: from the Streamlit secrets when
+    running in a Streamlit app, otherwise from the environment (and the .env file).
+    Streamlit is never imported here: outside of an app (e.g. a CLI job using call_api) it is
+    not loaded, and the secrets are not looked up.
+    """
+    global _credentials_value
+    with _credentials_lock:
+        if _credentials_value is None:
+            try:
+                st = sys.modules['streamlit']
+                _credentials_value = (st.secrets['WYSCOUT_USERNAME'], st.secrets['WYSCOUT_PASSWORD'])
+            except Exception:
+                try:
+                    from dotenv import load_dotenv
+                    load_dotenv()
+                except ImportError:
+                    pass
+                _credentials_value = (os.environ.get('WYSCOUT_USERNAME'), os.environ.get('WYSCOUT_PASSWORD'))
+    return _credentials_value
+
+
+def __getattr__(name):
+    # Module attributes that used to be resolved at import time
+    if name == 'WYSCOUT_USERNAME':
+        return _credentials()[0]
+    if name == 'WYSCOUT_PASSWORD':
+        return _credentials()[1]
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
+
+#MARK: JSON decoding
+_json_decoder = None
+
+
+def _default_json_decoder():
+    # Fastest installed parser, all of them decode straight from bytes
+    try:
+        import orjson
+        return orjson.loads
+    except ImportError:
+        pass
+    try:
+        import ujson
+        return ujson.loads
+    except ImportError:
+        return json.loads
+
+
+def set_json_decoder(decoder):
+    """
+    Sets the function used to decode the API responses, called with the raw response bytes.
+    Pass None to go back to the default (orjson if installed, else ujson, else the stdlib json).
+    """
+    global _json_decoder
+    _json_decoder = decoder
 
-    Parameters:
-    - compId (int): The identifier of the competition for which seasons are requested.
-    - user (str): The user identifier for Wyscout API credentials.
-    - version (str, optional): The API version to use (default is 'v3').
 
-    Returns:
-    - Returns the list of seasons for the specified competition obtained from the Wyscout API.
+def decode_json(raw):
     """
-    # Print a message indicating the start of downloading seasons for the given competition
-    print('Downloading seasons for competition: ', compId)
+    Decodes a json document from bytes (or str) with the configured decoder.
+    """
+    global _json_decoder
+    if _json_decoder is None:
+        _json_decoder = _default_json_decoder()
+    return _json_decoder(raw)
 
-    # Construct the URL for retrieving seasons for the specified competition
-    url = base_url[version].format(f'/competitions/{compId}/seasons')
 
-    # Make an API call to get the seasons list
-    return call_api(url=url)
+class _Timings:
+    # Process-wide totals of the time spent waiting for the API vs decoding its responses
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
 
-def get_season_transfers(seasonId, fromDate, toDate ,version='v3'):
-    
-    url = base_url[version].format(f"/seasons/{seasonId}/transfers")
+    def reset(self):
+        with self._lock:
+            self.requests = 0
+            self.bytes = 0
+            self.network = 0.0
+            self.decode = 0.0
 
-    if fromDate or toDate:
-        url +='?'
-        if fromDate:
-            url += f'fromDate={fromDate}'
-            if toDate:
-                url += f'&toDate={toDate}'
-        else:
-            url += f'toDate={toDate}'
-   
-    return call_api(url=url)
+    def add(self, size, network, decode):
+        with self._lock:
+            self.requests += 1
+            self.bytes += size
+            self.network += network
+            self.decode += decode
 
+    def report(self):
+        with self._lock:
+            return {'requests': self.requests, 'bytes': self.bytes,
+                    'network_seconds': self.network, 'decode_seconds': self.decode,
+                    'decode_share': self.decode / (self.network + self.decode) if self.requests else 0.0}
 
-def get_season_table(seasonId,version='v3', team_details=False):
-    url = base_url[version].format(f"/seasons/{seasonId}/standings")
 
-    if team_details:
-        url += '?details=teams'
-   
-    return call_api(url=url)
+_timings = _Timings()
 
 
-#MARK: ROUND
-def get_round_details(roundId, version='v3', details=[]):
-    # Construct the URL for retrieving seasons for the specified competition
-    url = base_url[version].format(f'/rounds/{roundId}')
+def get_timings():
+    """
+    Returns the total network time (request sent -> body received) and decode time of the successful
+    API calls since the last reset_timings(), with the share of the time spent decoding.
+    """
+    return _timings.report()
 
 
-    # Make an API call to get the seasons list
-    return call_api(url=url, params={'details': (','.join(details))})
+def reset_timings():
+    _timings.reset()
 
 
-#MARK: TEAMS
-def get_team_details(teamId, version='v3'):
-    # Construct the URL for retrieving seasons for the specified competition
-    url = base_url[version].format(f'/teams/{teamId}')
+#MARK: Metrics
+# Every call_api emits one record to the registered sinks:
+#   time, endpoint (url template), status (None if no response), cache ('hit', 'miss', 'replay' from the
+#   fixtures or 'shared' with an identical request in flight), bytes, retries, wait (seconds in the rate limiter and retry backoff),
+#   ttfb (request sent -> response headers, connection setup included), download, decode, seconds (total), error.
+_metrics_sinks = []
+_metrics_run = threading.local()
 
-    # Make an API call to get the seasons list
-    return call_api(url=url)
 
+def add_metrics_sink(sink):
+    """
+    Registers a callable called as sink(record) after every call_api (see MetricsAggregator,
+    JsonLinesMetricsSink and PrometheusExporter). Sinks run in the calling thread, keep them fast.
+    """
+    _metrics_sinks.append(sink)
+    return sink
 
 
-def get_teams_list_by_competition(compId, version='v3'):
+def remove_metrics_sink(sink):
+    if sink in _metrics_sinks:
+        _metrics_sinks.remove(sink)
+
+
+def _emit_metrics(url, start, record, error=None):
+    run = getattr(_metrics_run, 'aggregator', None)
+    if not _metrics_sinks and run is None:
+        return
+    record = dict({'time': time.time(), 'endpoint': _endpoint_template(url), 'status': None, 'cache': 'shared',
+                   'bytes': 0, 'retries': 0, 'wait': 0.0, 'ttfb': None, 'download': None, 'decode': None}, **record)
+    record['seconds'] = time.perf_counter() - start
+    record['error'] = None if error is None else f'{type(error).__name__}: {error}'
+    for sink in list(_metrics_sinks) + ([run] if run is not None else []):
+        try:
+            sink(record)
+        except Exception as e:
+            print(f"Error in metrics sink: {type(e).__name__}\n{e}")
+
+
+def _percentile(values, q):
+    # Nearest-rank percentile of sorted values
+    if not values:
+        return None
+    return values[max(0, math.ceil(q / 100 * len(values)) - 1)]
+
+
+class MetricsAggregator:
     """
-    Function to download a list of teams for a specific competition using the Wyscout API.
+    In-memory metrics sink: per endpoint counts of requests, statuses, cache hits, retries and bytes,
+    the total time per phase, and a sample of the latencies for the percentiles.
+
+        metrics = add_metrics_sink(MetricsAggregator())
+        download_match_events(seasonId)
+        metrics.summary()
 
     Parameters:
-    - compId (int): The identifier of the competition for which teams are requested.
-    - user (str): The user identifier for Wyscout API credentials.
-    - version (str, optional): The API version to use (default is 'v3').
+    - max_samples (int, optional): Latencies kept per endpoint for the percentiles (default is 10000,
+      a uniform sample of the requests is kept past it).
+    """
 
-    Returns:
-    - Returns the list of teams for the specified competition obtained from the Wyscout API.
+    def __init__(self, max_samples=10000):
+        self.max_samples = max_samples
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.endpoints = {}
+
+    def __call__(self, record):
+        with self._lock:
+            stats = self.endpoints.get(record['endpoint'])
+            if stats is None:
+                stats = self.endpoints[record['endpoint']] = {
+                    'requests': 0, 'errors': 0, 'statuses': {}, 'cache_hits': 0, 'shared': 0, 'retries': 0, 'bytes': 0,
+                    'seconds': 0.0, 'wait': 0.0, 'ttfb': 0.0, 'download': 0.0, 'decode': 0.0, 'latencies': []}
+            stats['requests'] += 1
+            stats['errors'] += record['error'] is not None or (record['status'] is not None and record['status'] >= 400)
+            if record['status'] is not None:
+                stats['statuses'][record['status']] = stats['statuses'].get(record['status'], 0) + 1
+            stats['cache_hits'] += record['cache'] == 'hit'
+            stats['shared'] += record['cache'] == 'shared'
+            stats['retries'] += record['retries']
+            stats['bytes'] += record['bytes']
+            for phase in ('seconds', 'wait', 'ttfb', 'download', 'decode'):
+                stats[phase] += record[phase] or 0.0
+
+            latencies = stats['latencies']
+            if len(latencies) < self.max_samples:
+                latencies.append(record['seconds'])
+            else:
+                index = random.randrange(stats['requests'])
+                if index < self.max_samples:
+                    latencies[index] = record['seconds']
+
+    def summary(self):
+        """
+        Returns a dict endpoint -> {requests, errors, statuses, cache_hits, shared, retries, bytes,
+        p50, p95, p99, max (seconds), and the total seconds, wait, ttfb, download and decode}.
+        """
+        with self._lock:
+            summary = {}
+            for endpoint, stats in self.endpoints.items():
+                latencies = sorted(stats['latencies'])
+                summary[endpoint] = dict({k: v for k, v in stats.items() if k != 'latencies'},
+                                         statuses=dict(stats['statuses']),
+                                         p50=_percentile(latencies, 50), p95=_percentile(latencies, 95),
+                                         p99=_percentile(latencies, 99), max=latencies[-1] if latencies else None)
+            return summary
+
+
+class JsonLinesMetricsSink:
     """
-    # Print a message indicating the start of downloading teams for the given competition
-    print('Downloading teams for competition: ', compId)
+    Metrics sink appending every record to a json-lines file.
 
-    # Construct the URL for retrieving teams for the specified competition
-    url = base_url[version].format(f'/competitions/{compId}/teams')
+    Parameters:
+    - path (str): The log file, appended to if it exists.
+    """
 
-    # Make an API call to get the teams list
-    return call_api(url=url)
+    def __init__(self, path):
+        self.path = osp.expanduser(path)
+        directory = osp.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = open(self.path, 'a')
+        self._lock = threading.Lock()
 
+    def __call__(self, record):
+        line = json.dumps(record, separators=(',', ':')) + '\n'
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
 
-def get_teams_list_by_season(seasonId, version='v3'):
+    def close(self):
+        remove_metrics_sink(self)
+        with self._lock:
+            self._file.close()
+
+
+class PrometheusExporter:
     """
-    Function to download a list of teams for a specific season using the Wyscout API.
+    Serves the metrics of a MetricsAggregator in the Prometheus text format on http://host:port/metrics,
+    from a background thread. The aggregator is registered as a sink if it is not given.
+
+        exporter = PrometheusExporter(port=9464)
 
     Parameters:
-    - seasonId (int): The identifier of the season for which teams are requested.
-    - user (str): The user identifier for Wyscout API credentials.
-    - version (str, optional): The API version to use (default is 'v3').
+    - aggregator (MetricsAggregator, optional): The metrics to export.
+    - port (int, optional): The port (default is 9464).
+    - host (str, optional): The interface (default is 127.0.0.1, local only).
+    """
 
-    Returns:
-    - Returns the list of teams for the specified season obtained from the Wyscout API.
+    def __init__(self, aggregator=None, port=9464, host='127.0.0.1'):
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        if aggregator is None:
+            aggregator = add_metrics_sink(MetricsAggregator())
+        self.aggregator = aggregator
+        exporter = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] != '/metrics':
+                    self.send_error(404)
+                    return
+                body = exporter.render().encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self.port = self.server.server_address[1]
+        threading.Thread(target=self.server.serve_forever, name='wyscout-metrics', daemon=True).start()
+
+    def render(self):
+        def label(value):
+            return str(value).replace('\\', '\\\\').replace('"', '\\"')
+
+        lines = ['# TYPE wyscout_requests_total counter', '# TYPE wyscout_cache_hits_total counter',
+                 '# TYPE wyscout_retries_total counter', '# TYPE wyscout_response_bytes_total counter',
+                 '# TYPE wyscout_phase_seconds_total counter', '# TYPE wyscout_request_seconds summary']
+        for endpoint, stats in sorted(self.aggregator.summary().items()):
+            endpoint = label(endpoint)
+            for status, count in sorted(stats['statuses'].items()):
+                lines.append(f'wyscout_requests_total{{endpoint="{endpoint}",status="{status}"}} {count}')
+            lines.append(f'wyscout_cache_hits_total{{endpoint="{endpoint}"}} {stats["cache_hits"]}')
+            lines.append(f'wyscout_retries_total{{endpoint="{endpoint}"}} {stats["retries"]}')
+            lines.append(f'wyscout_response_bytes_total{{endpoint="{endpoint}"}} {stats["bytes"]}')
+            for phase in ('wait', 'ttfb', 'download', 'decode'):
+                lines.append(f'wyscout_phase_seconds_total{{endpoint="{endpoint}",phase="{phase}"}} {stats[phase]}')
+            for quantile, key in (('0.5', 'p50'), ('0.95', 'p95'), ('0.99', 'p99')):
+                if stats[key] is not None:
+                    lines.append(f'wyscout_request_seconds{{endpoint="{endpoint}",quantile="{quantile}"}} {stats[key]}')
+            lines.append(f'wyscout_request_seconds_sum{{endpoint="{endpoint}"}} {stats["seconds"]}')
+            lines.append(f'wyscout_request_seconds_count{{endpoint="{endpoint}"}} {stats["requests"]}')
+        return '\n'.join(lines) + '\n'
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+_last_run_metrics = None
+
+
+def last_run_metrics():
     """
-    # Print a message indicating the start of downloading teams for the given season
-    print('Downloading teams for season: ', seasonId)
+    Returns the per-endpoint summary (see MetricsAggregator.summary) of the requests made by the
+    last download_* run (or iter_* run, also if its consumer stopped early), with the p50/p95/p99 latencies.
+    """
+    return _last_run_metrics
 
-    # Construct the URL for retrieving teams for the specified season
-    url = base_url[version].format(f'/seasons/{seasonId}/teams')
 
-    # Make an API call to get the teams list
-    return call_api(url=url)
+#MARK: HTTP client
+DEFAULT_POOL_SIZE = 10
 
 
+class WyscoutClient:
+    """
+    Thread-safe HTTP client shared by every call to the Wyscout API.
 
-def get_team_advance_stats(teamId, compId, seasonId,version = 'v3'):
+    Wraps a single requests.Session mounted with a pooled HTTPAdapter, so the
+    TCP+TLS connections to the API hosts are kept alive and reused across calls
+    and across the threads of the download_* functions.
 
-    print(teamId)
-    url = base_url[version].format(f'/teams/{teamId}/advancedstats?compId={compId}&seasonId={seasonId}')
-    #url = f'https://apirest.wyscout.com/v3/teams/3158/advancedstats'
+    Parameters:
+    - username (str, optional): Wyscout username (default is WYSCOUT_USERNAME).
+    - password (str, optional): Wyscout password (default is WYSCOUT_PASSWORD).
+    - pool_size (int, optional): Max connections kept open per host (default is DEFAULT_POOL_SIZE).
+    - timeout (float or tuple, optional): Timeout passed to requests (default is None, no timeout).
+    """
 
-    # Make an API call to get the teams advance stats
-    return call_api(url=url)
+    def __init__(self, username=None, password=None, pool_size=DEFAULT_POOL_SIZE, timeout=None):
+        self.timeout = timeout
+        self.pool_size = 0
+        self._lock = threading.Lock()
+
+        self.session = requests.Session()
+        default_username, default_password = _credentials() if username is None or password is None else (None, None)
+        self.session.auth = HTTPBasicAuth(username=username if username is not None else default_username,
+                                          password=password if password is not None else default_password)
+        self.session.headers.update({'Content-Type': 'application/json'})
+
+        self.resize(pool_size)
+
+    def resize(self, pool_size):
+        """
+        Grows the per-host connection pool to at least pool_size connections.
+        The pool never shrinks, so concurrent downloaders with different n_jobs can share the client.
+        The replaced adapter is closed: its idle sockets are released now, and the ones still
+        in use are closed when their request returns them.
+        """
+        with self._lock:
+            if pool_size <= self.pool_size:
+                return
+            old_adapter = self.session.adapters.get('https://') if self.pool_size else None
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size)
+            self.session.mount('https://', adapter)
+            self.session.mount('http://', adapter)
+            self.pool_size = pool_size
+            if old_adapter is not None:
+                old_adapter.close()
+
+    def get(self, url, params=None):
+        return self.session.get(url, params=params, timeout=self.timeout)
+
+    def close(self):
+        self.session.close()
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client(pool_size=None):
+    """
+    Returns the shared WyscoutClient, creating it on first use.
 
-def get_team_match_advance_stats(teamId, matchId, version = 'v3'):
+    Parameters:
+    - pool_size (int, optional): If given, the connection pool is grown to at least this size
+      (the downloaders pass the size of the IOExecutor here).
 
+    Returns:
+    - WyscoutClient: The client used by call_api by default.
+    """
+    global _client
+    with _client_lock:
+        if _client is None:
+            # Sized from the executor budget up front, so the first download doesn't replace the pool
+            budget = _io_executor.max_workers if _io_executor is not None else DEFAULT_IO_WORKERS
+            _client = WyscoutClient(pool_size=max(pool_size or 0, budget, DEFAULT_POOL_SIZE))
+    if pool_size:
+        _client.resize(pool_size)
+    return _client
+
+
+def set_client(client):
+    """
+    Replaces the shared client used by call_api (e.g. to use different credentials or a timeout).
+    """
+    global _client
+    with _client_lock:
+        previous, _client = _client, client
+    if previous is not None and previous is not client:
+        previous.close()
 
-    url = base_url[version].format(f'/teams/{teamId}/matches/{matchId}/advancedstats')
-    #url = f'https://apirest.wyscout.com/v3/teams/3158/advancedstats'
 
-    # Make an API call to get the teams advance stats
-    return call_api(url=url)
+#MARK: I/O executor
+DEFAULT_IO_WORKERS = 16
 
+_io_worker = threading.local()
 
 
-#MARK: PLAYERS
-def get_player_details(playerId, version='v3'):
-    # Construct the URL for retrieving teams for the specified season
-    url = base_url[version].format(f'/players/{playerId}?details=currentTeam')
+def _mark_io_worker():
+    _io_worker.active = True
 
-    # Make an API call to get the teams list
-    return call_api(url=url)
 
-def search_players_by_name(player_name, version='v3'):
+class IOExecutor:
     """
-    Function to search for players by name using the Wyscout API.
-    
+    Long-lived executor shared by all the downloaders, so that a download doesn't pay for starting
+    (and tearing down) its own pool and the total number of concurrent requests of the process is
+    bounded by one budget, however many downloads run at the same time.
+
+    Modes:
+    - 'thread': the calls run on a pool of max_workers threads.
+    - 'async': the calls are scheduled on an event loop running on a background thread, at most
+      max_workers at a time. Coroutine functions (e.g. async_call_api) run on the loop, plain
+      functions on the loop's worker threads.
+
+    submit() returns a concurrent.futures.Future in both modes. A call submitted from a task of
+    the executor itself (e.g. a download nested in another one) runs inline in the calling
+    worker, so nested downloads can't deadlock on the shared budget.
+
+    Note: the async_download_* functions don't go through the executor, they run on the caller's
+    event loop and are bounded by the max_in_flight of their AsyncWyscoutClient instead. They
+    still share the process-wide rate limiter with the threaded downloads.
+    """
+
+    def __init__(self, max_workers=DEFAULT_IO_WORKERS, mode='thread'):
+        if mode not in ('thread', 'async'):
+            raise ValueError(f"Unknown executor mode {mode!r}, expected 'thread' or 'async'")
+        self.max_workers = max_workers
+        self.mode = mode
+
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='wyscout-io',
+                                        initializer=_mark_io_worker)
+        self._loop = None
+        if mode == 'async':
+            self._loop = asyncio.new_event_loop()
+            self._loop.set_default_executor(self._pool)
+            self._semaphore = asyncio.Semaphore(max_workers)
+            threading.Thread(target=self._run_loop, name='wyscout-io-loop', daemon=True).start()
+
+    def _run_loop(self):
+        _mark_io_worker()
+        asyncio.set_event_loop(self._loop)
+        self._loop.run_forever()
+
+    async def _run(self, fn, args, kwargs):
+        async with self._semaphore:
+            if inspect.iscoroutinefunction(fn):
+                return await fn(*args, **kwargs)
+            return await self._loop.run_in_executor(None, partial(fn, *args, **kwargs))
+
+    def submit(self, fn, *args, **kwargs):
+        if getattr(_io_worker, 'active', False):
+            future = Future()
+            try:
+                result = fn(*args, **kwargs)
+                if inspect.isawaitable(result):
+                    if inspect.iscoroutine(result):
+                        result.close()
+                    raise TypeError('Coroutine functions can not be submitted from a task of the executor')
+                future.set_result(result)
+            except Exception as e:
+                future.set_exception(e)
+            return future
+
+        if self.mode == 'thread':
+            return self._pool.submit(fn, *args, **kwargs)
+        return asyncio.run_coroutine_threadsafe(self._run(fn, args, kwargs), self._loop)
+
+    def shutdown(self, wait=True):
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+        self._pool.shutdown(wait=wait)
+
+
+_io_executor = None
+_io_executor_lock = threading.Lock()
+
+
+def get_io_executor():
+    """
+    Returns the shared IOExecutor, creating a thread one with DEFAULT_IO_WORKERS workers on first use.
+    """
+    global _io_executor
+    with _io_executor_lock:
+        if _io_executor is None:
+            _io_executor = IOExecutor()
+    return _io_executor
+
+
+def configure_io_executor(max_workers=DEFAULT_IO_WORKERS, mode='thread'):
+    """
+    Replaces the shared executor used by the downloaders (e.g. to change the global concurrency budget).
+
+        configure_io_executor(max_workers=32, mode='async')
+
     Parameters:
-    - player_name (str): The name of the player to search for.
-    - version (str, optional): The API version to use (default is 'v3').
-    
+    - max_workers (int, optional): Maximum number of calls running at the same time in the process.
+    - mode (str, optional): 'thread' or 'async' (see IOExecutor).
+
     Returns:
-    - Returns a list of players matching the search query.
+    - IOExecutor: The new executor.
+    """
+    global _io_executor
+    executor = IOExecutor(max_workers=max_workers, mode=mode)
+    with _io_executor_lock:
+        previous, _io_executor = _io_executor, executor
+    if previous is not None:
+        previous.shutdown(wait=False)
+    return executor
+
+
+def _run_bounded(fn, keys, n_jobs):
+    """
+    Submits fn(key) for every key to the shared IOExecutor with at most n_jobs calls in flight, and
+    yields (key, future) as each call completes. No call is submitted while the consumer is busy
+    with a result. Closing the generator early cancels the pending calls.
+    """
+    keys_iter = iter(keys)
+    pending = {}
+
+    def submit_next():
+        for key in keys_iter:
+            pending[get_io_executor().submit(fn, key)] = key
+            if len(pending) >= n_jobs:
+                break
+
+    try:
+        submit_next()
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield pending.pop(future), future
+            submit_next()
+    finally:
+        for future in pending:
+            future.cancel()
+
+
+#MARK: Rate limiting
+class WyscoutAPIError(Exception):
+    """
+    Raised when a request keeps failing with a retryable status (429/5xx) after every retry,
+    so that the downloaders report it instead of storing a -1 entry.
     """
-    # Try the search endpoint first
-    url = base_url[version].format('/search')
-    
-    # Set up parameters for the search
-    params = {
-        'query': player_name,
-        'objType': 'player'
-    }
-    
-    # Make an API call to search for players
-    search_result = call_api(url=url, params=params)
-    
-    # If search doesn't work, try alternative approach
-    if search_result == -1 or not search_result:
-        # Try with different parameters
-        params_alt = {
-            'q': player_name,
-            'type': 'player'
-        }
-        search_result = call_api(url=url, params=params_alt)
-    
-    return search_result
 
+    def __init__(self, url, status_code, text):
+        super().__init__(f'{status_code} on {url} after retries: {text[:200]}')
+        self.url = url
+        self.status_code = status_code
 
 
-def get_players_list_by_season(seasonId, version='v3'):
+class RateLimiter:
     """
-    Function to download a list of players for a specific season using the Wyscout API.
+    Token bucket rate limiter shared by every thread (and by the async client) of the process.
+
+    With adaptive=True it runs in AIMD mode: each successful call adds increase/rate req/s
+    (about +increase req/s for every second of traffic), each throttling response multiplies
+    the rate by decrease, so the limiter converges to the highest rate the API sustains.
+    A throttling response with Retry-After also pauses the whole bucket for that long.
 
     Parameters:
-    - seasonId (int): The identifier of the season for which players are requested.
-    - user (str): The user identifier for Wyscout API credentials.
-    - version (str, optional): The API version to use (default is 'v3').
+    - rate (float, optional): Requests per second (default is 20).
+    - burst (int, optional): Bucket capacity (default is max(1, rate)).
+    - adaptive (bool, optional): Enable AIMD (default is True).
+    - min_rate (float, optional): Lower bound of the adaptive rate (default is 0.5).
+    - max_rate (float, optional): Upper bound of the adaptive rate (default is 100).
+    - increase (float, optional): Additive increase, in req/s per second (default is 1).
+    - decrease (float, optional): Multiplicative decrease on throttling (default is 0.5).
+    """
 
-    Returns:
-    - Returns the list of players for the specified season obtained from the Wyscout API.
+    def __init__(self, rate=20.0, burst=None, adaptive=True, min_rate=0.5, max_rate=100.0, increase=1.0, decrease=0.5):
+        self.rate = float(rate)
+        self.burst = burst
+        self.adaptive = adaptive
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase = increase
+        self.decrease = decrease
+
+        self._lock = threading.Lock()
+        self._tokens = self._capacity()
+        self._last = time.monotonic()
+        self._paused_until = 0.0
+
+    def _capacity(self):
+        return self.burst if self.burst is not None else max(1.0, self.rate)
+
+    def _reserve(self):
+        # Returns 0 if a token was taken, otherwise how long to wait before trying again
+        with self._lock:
+            now = time.monotonic()
+            if now < self._paused_until:
+                return self._paused_until - now
+            self._tokens = min(self._capacity(), self._tokens + (now - self._last) * self.rate)
+            self._last = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0.0
+            return (1 - self._tokens) / self.rate
+
+    def acquire(self):
+        while True:
+            wait = self._reserve()
+            if not wait:
+                return
+            time.sleep(wait)
+
+    async def acquire_async(self):
+        while True:
+            wait = self._reserve()
+            if not wait:
+                return
+            await asyncio.sleep(wait)
+
+    def on_success(self):
+        if self.adaptive:
+            with self._lock:
+                self.rate = min(self.max_rate, self.rate + self.increase / self.rate)
+
+    def on_throttle(self, retry_after=None):
+        with self._lock:
+            if self.adaptive:
+                self.rate = max(self.min_rate, self.rate * self.decrease)
+                self._tokens = min(self._tokens, self._capacity())
+            if retry_after:
+                self._paused_until = max(self._paused_until, time.monotonic() + retry_after)
+
+
+class RetryPolicy:
     """
-    # Call the API to get the initial response for the first page of players
-    response_json = call_api(url=base_url[version].format(f"/seasons/{seasonId}/players?limit=100"))
+    Retries of call_api on throttling, server errors and connection errors.
+    Waits use exponential backoff with full jitter, or the Retry-After header when the API sends it.
 
-    # Loop over pages to retrieve all players
-    players = []
-    page = 1
-    total_pages = response_json['meta']['page_count']
+    Parameters:
+    - max_retries (int, optional): Retries after the first attempt (default is 5).
+    - backoff_base (float, optional): Base of the exponential backoff in seconds (default is 0.5).
+    - backoff_max (float, optional): Max wait between two attempts in seconds (default is 60).
+    - retry_statuses (tuple, optional): HTTP statuses that are retried (default is 429, 500, 502, 503, 504).
+    - throttle_statuses (tuple, optional): Statuses that slow down the rate limiter (default is 429, 503).
+    """
 
-    while response_json['meta']['page_current'] != response_json['meta']['page_count']:
-        print(f"Reading page {page}/{total_pages}")
+    def __init__(self, max_retries=5, backoff_base=0.5, backoff_max=60.0,
+                 retry_statuses=(429, 500, 502, 503, 504), throttle_statuses=(429, 503)):
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.retry_statuses = retry_statuses
+        self.throttle_statuses = throttle_statuses
 
-        # Call the API for the next page of players
-        response_json = call_api(url=base_url[version].format(f"/seasons/{seasonId}/players?limit=100&page={page}"),)
+    def delay(self, attempt, retry_after=None):
+        if retry_after is not None:
+            return min(retry_after, self.backoff_max)
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
 
-        # Append the players from the current page to the list
-        players += response_json['players']
-        page += 1
 
-    return players
+def _parse_retry_after(value):
+    # Retry-After is either a number of seconds or an HTTP date
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
 
-def get_players_list_by_team_season(teamId, seasonId, version='v3'):
-    # Construct the URL for retrieving teams for the specified season
-    url = base_url[version].format(f'/teams/{teamId}/squad?seasonId={seasonId}')
 
-    # Make an API call to get the teams list
-    return call_api(url=url)
+_rate_limiter = RateLimiter()
+_retry_policy = RetryPolicy()
 
 
-def get_players_transfers(playerId, version='v3'):
-    # Construct the URL for retrieving teams for the specified season
-    url = base_url[version].format(f'/players/{playerId}/transfers')
-    
+def get_rate_limiter():
+    return _rate_limiter
 
-    # Make an API call to get the teams list
-    return call_api(url=url)
 
-def get_player_matches(playerId, seasonId=None, version='v3'):
+def set_rate_limiter(limiter):
     """
-    Function to retrieve matches for a specific player using the Wyscout API.
-    
-    Parameters:
-    - playerId (int): The unique ID of the player.
-    - seasonId (int, optional): The unique ID of the season.
-    - version (str, optional): The API version to use (default is 'v2').
-    
-    Returns:
-    - Returns the list of matches for the specified player obtained from the Wyscout API.
+    Replaces the process-wide rate limiter. Pass None to disable rate limiting.
     """
-    # Construct the URL for retrieving matches for the specified player
-    url = base_url[version].format(f'/players/{playerId}/matches')
-    
-    # Set up parameters
-    params = {}
-    if seasonId:
-        params['seasonId'] = seasonId
-    
-    # Make an API call to get the matches list
-    return call_api(url=url, params=params)
+    global _rate_limiter
+    _rate_limiter = limiter
 
-def get_player_fixtures(playerId, dateFrom=None, dateTo=None, version='v2'):
+
+def set_retry_policy(policy):
     """
-    Function to retrieve fixtures for a specific player using the Wyscout API.
-    
-    Parameters:
-    - playerId (int): The unique ID of the player.
-    - dateFrom (str, optional): Start date in YYYY-MM-DD format.
-    - dateTo (str, optional): End date in YYYY-MM-DD format.
-    - version (str, optional): The API version to use (default is 'v2').
-    
-    Returns:
-    - Returns the list of fixtures for the specified player obtained from the Wyscout API.
+    Replaces the retry policy of call_api. Pass RetryPolicy(max_retries=0) to disable retries.
     """
-    # Construct the URL for retrieving fixtures for the specified player
-    url = base_url[version].format(f'/players/{playerId}/fixtures')
-    
-    # Set up parameters
-    params = {}
-    if dateFrom:
-        params['fromDate'] = dateFrom
-    if dateTo:
-        params['toDate'] = dateTo
-    
-    # Make an API call to get the fixtures list
-    return call_api(url=url, params=params)
+    global _retry_policy
+    _retry_policy = policy
 
 
-def get_advanced_stats_match(matchId, version='v3'):
-    # Construct the URL for retrieving teams for the specified season
-    url = base_url[version].format(f'/matches/{matchId}/advancedstats/players?fetch=match')
-    
+#MARK: Disk cache
+FOREVER = float('inf')
+FINISHED_MATCH_STATUSES = ('Played',)
 
-    # Make an API call to get the teams list
-    return call_api(url=url)
 
+MATCH_DATA_TTL = 10 * 60
 
+# matchIds seen final in a season matches list or a match details payload. The DiskCache keeps
+# them in its final_matches.txt file, so a new process knows them without listing the season again
+_final_matches = set()
+_final_matches_lock = threading.Lock()
 
 
-def get_advanced_stats_season(playerid, compId, seasonId, details=['player'],version='v3'):
+def mark_matches_final(matches):
     """
-    Function to retrieve advanced statistics for a specific player, competition, and season using the Wyscout API.
+    Records the final matches of a season matches list, so that their match-level data is cached forever.
+
+    get_matches_list_by_season() and get_player_matches() call it on every list they return, so the
+    download_* functions, sync_season(), pull_season() and EventWarehouse.load_season() go through it
+    as well. Until a match is known to be final its data is cached for MATCH_DATA_TTL only.
 
     Parameters:
-    - playerid (int): The identifier of the player for whom advanced statistics are requested.
-    - compId (int): The identifier of the competition for which statistics are requested.
-    - seasonId (int): The identifier of the season for which statistics are requested.
-    - user (str): The user identifier for Wyscout API credentials.
-    - version (str, optional): The API version to use (default is 'v3').
+    - matches (list): Matches of the list, dicts with the 'matchId' (or 'wyId') and 'status' keys.
+    """
+    final = {int(m.get('matchId', m.get('wyId'))) for m in matches
+             if isinstance(m, dict) and m.get('status') in FINISHED_MATCH_STATUSES}
+    with _final_matches_lock:
+        new = final - _final_matches
+        _final_matches.update(new)
+    cache = _disk_cache
+    if new and cache is not None:
+        cache.save_final_matches(new)
+
+
+def _match_details_ttl(path, payload):
+    # A match is immutable only once it is final, before that its details change
+    if isinstance(payload, dict) and payload.get('status') in FINISHED_MATCH_STATUSES:
+        mark_matches_final([payload])
+        return FOREVER
+    return MATCH_DATA_TTL
+
+
+def _match_data_ttl(path, payload):
+    # Events, formations and stats of a live match keep changing until it's final
+    matchId = int(re.search(r'/matches/(\d+)', path).group(1))
+    return FOREVER if matchId in _final_matches else MATCH_DATA_TTL
+
+
+# (regex on the url path, ttl in seconds or callable(path, payload) -> ttl). First match wins,
+# urls that match no policy are not cached.
+DEFAULT_CACHE_POLICIES = [
+    (r'/matches/\d+/(events|formations|physicaldata|advancedstats)(/players)?$', _match_data_ttl),
+    (r'/players/\d+/matches/\d+/advancedstats$', _match_data_ttl),
+    (r'/matches/\d+$', _match_details_ttl),
+    (r'/seasons/\d+/standings$', 60 * 60),
+    (r'/teams/\d+/squad$', 60 * 60),
+    (r'/seasons/\d+/(matches|fixtures)$', 60 * 60),
+]
+
+
+class DiskCache:
+    """
+    Persistent, content-addressed cache of API responses.
+
+    Each response is stored gzip-compressed under the sha256 of its url and params, with an
+    expiry taken from the first matching policy. Reads refresh the file mtime, and when the
+    store grows over max_size the least recently used entries are evicted.
+
+    Note: the match-level endpoints are cached forever once the match is known to be final
+    (see mark_matches_final()), and for MATCH_DATA_TTL before that. The final matchIds are kept
+    in the final_matches.txt file of the cache and loaded back when the cache is opened.
+
+    Parameters:
+    - path (str): Directory of the cache.
+    - max_size (int, optional): Max size of the store in bytes (default is 2 GB).
+    - policies (list, optional): (url path regex, ttl) pairs (default is DEFAULT_CACHE_POLICIES).
+    """
+
+    def __init__(self, path, max_size=2 * 1024 ** 3, policies=None):
+        self.path = osp.expanduser(path)
+        self.max_size = max_size
+        self.policies = [(re.compile(pattern), ttl) for pattern, ttl in (policies if policies is not None else DEFAULT_CACHE_POLICIES)]
+        self._lock = threading.Lock()
+
+        os.makedirs(self.path, exist_ok=True)
+        self._size = sum(osp.getsize(f) for f in self._files())
+        self._load_final_matches()
+
+    def _files(self):
+        for root, _, files in os.walk(self.path):
+            for name in files:
+                if name.endswith('.json.gz'):
+                    yield osp.join(root, name)
+
+    @staticmethod
+    def key(url, params=None):
+        if params:
+            url += '?' + urlencode(sorted((k, v) for k, v in params.items() if v is not None))
+        return hashlib.sha256(url.encode()).hexdigest()
+
+    def _file(self, key):
+        return osp.join(self.path, key[:2], key + '.json.gz')
+
+    def _load_final_matches(self):
+        try:
+            with open(osp.join(self.path, 'final_matches.txt')) as f:
+                final = {int(line) for line in f if line.strip()}
+        except OSError:
+            final = set()
+        with _final_matches_lock:
+            # Matches marked before the cache was opened are saved too
+            missing = _final_matches - final
+            _final_matches.update(final)
+        if missing:
+            self.save_final_matches(missing)
+
+    def save_final_matches(self, matchIds):
+        """
+        Appends matchIds to the final_matches.txt file of the cache (see mark_matches_final()).
+        """
+        with self._lock:
+            with open(osp.join(self.path, 'final_matches.txt'), 'a') as f:
+                f.writelines(f'{matchId}\n' for matchId in sorted(matchIds))
+
+    def ttl(self, url, payload):
+        path = urlsplit(url).path
+        for pattern, ttl in self.policies:
+            if pattern.search(path):
+                return ttl(path, payload) if callable(ttl) else ttl
+        return 0
+
+    def get(self, url, params=None):
+        """
+        Returns (True, payload) on a hit, (False, None) on a miss or an expired entry.
+        """
+        file = self._file(self.key(url, params))
+        try:
+            with gzip.open(file, 'rb') as f:
+                entry = decode_json(f.read())
+        except (OSError, ValueError):
+            return False, None
+
+        if entry['expires_at'] is not None and entry['expires_at'] < time.time():
+            return False, None
+
+        try:
+            os.utime(file)
+        except OSError:
+            pass
+        return True, entry['payload']
+
+    def set(self, url, params, payload):
+        ttl = self.ttl(url, payload)
+        if not ttl:
+            return
+
+        entry = {'url': url, 'params': params, 'stored_at': time.time(),
+                 'expires_at': None if ttl == FOREVER else time.time() + ttl, 'payload': payload}
+
+        file = self._file(self.key(url, params))
+        os.makedirs(osp.dirname(file), exist_ok=True)
+        tmp = f'{file}.{threading.get_ident()}.tmp'
+        with gzip.open(tmp, 'wt', encoding='utf-8') as f:
+            json.dump(entry, f, separators=(',', ':'))
+
+        with self._lock:
+            previous = osp.getsize(file) if osp.exists(file) else 0
+            os.replace(tmp, file)
+            self._size += osp.getsize(file) - previous
+            if self._size > self.max_size:
+                self._evict()
+
+    def _evict(self):
+        # Drop the least recently used entries down to 90% of max_size
+        files = sorted(((osp.getmtime(f), osp.getsize(f), f) for f in self._files()))
+        self._size = sum(size for _, size, _ in files)
+        for _, size, f in files:
+            if self._size <= self.max_size * 0.9:
+                break
+            try:
+                os.remove(f)
+                self._size -= size
+            except OSError:
+                pass
+
+    def clear(self):
+        with self._lock:
+            for f in list(self._files()):
+                os.remove(f)
+            self._size = 0
+
+
+_disk_cache = DiskCache(os.environ['WYSCOUT_CACHE_DIR']) if os.environ.get('WYSCOUT_CACHE_DIR') else None
+_cache_bypass = 0
+# The bypass blocks of several threads can overlap, the counter is updated under a lock
+_cache_bypass_lock = threading.Lock()
+
+
+def enable_disk_cache(path='~/.cache/wyscout', max_size=2 * 1024 ** 3, policies=None):
+    """
+    Turns on the on-disk response cache used by call_api (it is also turned on at import time
+    when the WYSCOUT_CACHE_DIR environment variable is set).
 
     Returns:
-    - Returns the advanced statistics for the specified player, competition, and season obtained from the Wyscout API.
+    - DiskCache: The enabled cache.
     """
-    # Construct the URL for retrieving advanced statistics
-    url = base_url[version].format(f"/players/{playerid}/advancedstats?compId={compId}&seasonId={seasonId}")
+    global _disk_cache
+    _disk_cache = DiskCache(path, max_size=max_size, policies=policies)
+    return _disk_cache
 
-    if details:
-        url += '&details='
-        details_string = ','.join(details)
-        url += details_string
 
-    # Make an API call to get the advanced statistics
-    return call_api(url=url)
+def disable_disk_cache():
+    global _disk_cache
+    _disk_cache = None
 
 
-# def get_stats(player, args):
-#         compId, seasonId, v = args
-#         return get_advanced_stats_season(player['wyId'], compId=compId, seasonId=seasonId, version=v)
+def get_disk_cache():
+    return _disk_cache
 
 
-def get_players_match_advanced_stats(playerid, matchId, version='v3'):
+@contextmanager
+def cache_bypass():
     """
-    Function to retrieve advanced statistics for a specific player, competition, and season using the Wyscout API.
-
-    Parameters:
-    - playerid (int): The identifier of the player for whom advanced statistics are requested.
-    - version (str, optional): The API version to use (default is 'v3').
+    Calls made while this block is open skip the cache reads and go to the API. The flag is
+    process-wide, so it also covers the worker threads of the download_* functions.
+    The fresh responses are still stored, so the cache gets refreshed.
 
-    Returns:
-    - Returns the advanced statistics for the specified player, competition, and season obtained from the Wyscout API.
+        with cache_bypass():
+            events = get_match_events(matchId)
     """
-    
-    # Construct the URL for retrieving advanced statistics
-    url = base_url[version].format(f"/players/{playerid}/matches/{matchId}/advancedstats")
+    global _cache_bypass
+    with _cache_bypass_lock:
+        _cache_bypass += 1
+    try:
+        yield
+    finally:
+        with _cache_bypass_lock:
+            _cache_bypass -= 1
 
-    # Make an API call to get the advanced statistics
-    return call_api(url=url)
 
+def _cache_lookup(url, params):
+    if _disk_cache is None or _cache_bypass:
+        return False, None
+    return _disk_cache.get(url, params)
 
-def get_player_match_advance_stats_parallel(player, args):
-    matchId, v = args
-    return get_players_match_advanced_stats(player['wyId'], matchId=matchId, version=v)
+
+def _cache_store(url, params, payload):
+    if _disk_cache is not None:
+        _disk_cache.set(url, params, payload)
 
 
-def get_all_players_match_advanced_stats(matchId, version='v3'):
+#MARK: Fixtures
+class FixtureNotFoundError(WyscoutAPIError):
     """
-    Function to retrieve advanced statistics for a specific player, competition, and season using the Wyscout API.
+    Raised in replay mode for a request that is not in the fixture archive.
+    """
+
+    def __init__(self, url, path):
+        Exception.__init__(self, f'{url} is not recorded in {path}')
+        self.url = url
+        self.status_code = None
+
+
+class FixtureArchive:
+    """
+    SQLite archive of raw API responses, for deterministic and network-free runs.
+
+    In 'record' mode every response received by call_api (status and raw body, zlib-compressed) is
+    stored under the path and params of the request, whatever the host; the DiskCache, the
+    request_session results and the memoized lookups are not read, so every request reaches
+    the API and the archive is complete. In 'replay' mode call_api
+    serves the recorded responses and never touches the network, the rate limiter or the disk
+    cache: the bodies still go through decode_json, so a replay also exercises the parsing code.
+
+        enable_fixtures('fixtures/serieA_2024.sqlite', mode='record')
+        download_match_events(seasonId)
+        # later, in CI or a notebook
+        enable_fixtures('fixtures/serieA_2024.sqlite', mode='replay')
+        download_match_events(seasonId)
 
     Parameters:
-    - playerid (int): The identifier of the player for whom advanced statistics are requested.
-    - compId (int): The identifier of the competition for which statistics are requested.
-    - seasonId (int): The identifier of the season for which statistics are requested.
-    - user (str): The user identifier for Wyscout API credentials.
-    - version (str, optional): The API version to use (default is 'v3').
+    - path (str): The archive file, created if missing.
+    - mode (str, optional): 'record' or 'replay' (default is 'replay').
+    """
+
+    def __init__(self, path, mode='replay'):
+        if mode not in ('record', 'replay'):
+            raise ValueError(f"Unknown fixtures mode {mode!r}, expected 'record' or 'replay'")
+        self.path = osp.expanduser(path)
+        self.mode = mode
+        self.recorded = 0
+        self.replayed = 0
+
+        directory = osp.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        with self._lock:
+            db = self._db()
+            db.execute('PRAGMA journal_mode=WAL')
+            db.execute('CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, url TEXT, params TEXT, '
+                       'status INTEGER, body BLOB, recorded_at REAL)')
+            db.commit()
+
+    def _db(self):
+        # One connection per thread, sqlite connections can't be shared
+        db = getattr(self._local, 'db', None)
+        if db is None:
+            db = self._local.db = sqlite3.connect(self.path)
+        return db
+
+    @staticmethod
+    def key(url, params=None):
+        # The host is left out, so the fixtures recorded on the API replay behind any base url
+        parts = urlsplit(url)
+        return DiskCache.key(parts.path + ('?' + parts.query if parts.query else ''), params)
+
+    def record(self, url, params, status, raw):
+        with self._lock:
+            db = self._db()
+            db.execute('INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)',
+                       (self.key(url, params), url, json.dumps(params, sort_keys=True, default=str), status,
+                        zlib.compress(raw), time.time()))
+            db.commit()
+            self.recorded += 1
+
+    def lookup(self, url, params=None):
+        """
+        Returns (status, raw body) of the recorded response, or None if the request was not recorded.
+        """
+        row = self._db().execute('SELECT status, body FROM responses WHERE key = ?', (self.key(url, params),)).fetchone()
+        if row is None:
+            return None
+        self.replayed += 1
+        return row[0], zlib.decompress(row[1])
+
+    def replay(self, url, params=None, record=None):
+        """
+        Same contract as call_api, from the archive: the decoded json, or -1 for a recorded error response.
+        Raises FixtureNotFoundError if the request was not recorded.
+        """
+        response = self.lookup(url, params)
+        if response is None:
+            raise FixtureNotFoundError(url, self.path)
+        status, raw = response
+        if record is not None:
+            record.update(cache='replay', status=status, bytes=len(raw))
+        if status >= 400:
+            print('Chimata errata: ', raw.decode('utf-8', 'replace'))
+            return -1
+        start = time.perf_counter()
+        payload = decode_json(raw)
+        if record is not None:
+            record['decode'] = time.perf_counter() - start
+        return payload
+
+    def __len__(self):
+        return self._db().execute('SELECT COUNT(*) FROM responses').fetchone()[0]
+
+    def close(self):
+        db = getattr(self._local, 'db', None)
+        if db is not None:
+            db.close()
+            self._local.db = None
+
+
+_fixtures = None
+
+
+def enable_fixtures(path, mode='replay'):
+    """
+    Turns on the record or replay mode of call_api (see FixtureArchive). It is also turned on at
+    import time when the WYSCOUT_FIXTURES environment variable is set (mode from WYSCOUT_FIXTURES_MODE).
 
     Returns:
-    - Returns the advanced statistics for the specified player, competition, and season obtained from the Wyscout API.
+    - FixtureArchive: The archive.
     """
-    # Construct the URL for retrieving advanced statistics
-    url = base_url[version].format(f"/matches/{matchId}/advancedstats/players")
+    global _fixtures
+    previous, _fixtures = _fixtures, FixtureArchive(path, mode=mode)
+    if previous is not None:
+        previous.close()
+    return _fixtures
 
-    # Make an API call to get the advanced statistics
-    return call_api(url=url)['players']
+
+def disable_fixtures():
+    global _fixtures
+    previous, _fixtures = _fixtures, None
+    if previous is not None:
+        previous.close()
+
+
+def get_fixtures():
+    return _fixtures
+
+
+def _replaying():
+    return _fixtures is not None and _fixtures.mode == 'replay'
+
+
+def _recording():
+    # While recording every request goes to the API: a response served by the DiskCache,
+    # a request_session or a memoized lookup would be missing from the archive
+    return _fixtures is not None and _fixtures.mode == 'record'
+
+
+def _fixture_store(url, params, status, raw):
+    fixtures = _fixtures
+    if fixtures is not None and fixtures.mode == 'record':
+        fixtures.record(url, params, status, raw)
 
 
-def get_all_players_match_physical_data(matchId, version='v4'):
+if os.environ.get('WYSCOUT_FIXTURES'):
+    enable_fixtures(os.environ['WYSCOUT_FIXTURES'], mode=os.environ.get('WYSCOUT_FIXTURES_MODE', 'replay'))
+
+
+#MARK: Memoization
+class _InFlightCall:
     """
-    Function to retrieve advanced statistics for a specific player, competition, and season using the Wyscout API.
+    A call being executed by one thread, whose result is shared with every other thread asking for the same key.
+    """
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+    def wait(self):
+        self.done.wait()
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+class TTLCache:
+    """
+    Bounded, thread-safe in-memory LRU cache whose entries expire after ttl seconds.
+
+    Concurrent misses on the same key are coalesced: only the first thread runs the call,
+    the others wait for its result. Failed calls (-1 or an exception) are not stored.
 
     Parameters:
-    - matchId (int): The identifier of the match for which advanced statistics are requested.
-    - user (str): The user identifier for Wyscout API credentials.
-    - version (str, optional): The API version to use (default is 'v3').
+    - maxsize (int, optional): Max number of entries (default is 1024).
+    - ttl (float or callable, optional): Lifetime of an entry in seconds, or ttl(result) -> seconds
+      (default is 600).
+    """
 
-    Returns:
-    - Returns the advanced statistics for the specified player, competition, and season obtained from the Wyscout API.
+    def __init__(self, maxsize=1024, ttl=600):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+        self._data = OrderedDict()
+        self._in_flight = {}
+        self._lock = threading.Lock()
+
+    def get_or_call(self, key, fn):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self._data.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+
+            call = self._in_flight.get(key)
+            if call is not None:
+                self.coalesced += 1
+                owner = False
+            else:
+                self.misses += 1
+                call = self._in_flight[key] = _InFlightCall()
+                owner = True
+
+        if not owner:
+            return call.wait()
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+                if call.error is None and not (isinstance(call.result, int) and call.result == -1):
+                    ttl = self.ttl(call.result) if callable(self.ttl) else self.ttl
+                    self._data[key] = (time.monotonic() + ttl, call.result)
+                    self._data.move_to_end(key)
+                    while len(self._data) > self.maxsize:
+                        self._data.popitem(last=False)
+            call.done.set()
+
+        return call.result
+
+    def info(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'coalesced': self.coalesced,
+                    'size': len(self._data), 'maxsize': self.maxsize, 'ttl': self.ttl}
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+_memoized = {}
+
+
+def _freeze(value):
+    # Lists (e.g. details=[...]) are not hashable, use tuples in the cache keys
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    return value
+
+
+def memoize(ttl=600, maxsize=1024):
     """
-    # Construct the URL for retrieving advanced statistics
-    url = base_url[version].format(f"/matches/{matchId}/physicaldata")
+    Decorator caching the results of a lookup function in a TTLCache.
+    The decorated function exposes cache_info() and cache_clear(), like functools.lru_cache.
 
-    # Make an API call to get the advanced statistics
-    return call_api(url=url)
+    Note: the cached objects are shared between callers, do not modify them in place.
+    """
+    def decorator(fn):
+        cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        signature = inspect.signature(fn)
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            # Bind to the signature so f(1), f(1, 'v3') and f(matchId=1) share the same entry
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            key = _freeze(bound.arguments)
+            if _recording():
+                return fn(*args, **kwargs)
+            return cache.get_or_call(key, lambda: fn(*args, **kwargs))
+
+        wrapper.cache = cache
+        wrapper.cache_info = cache.info
+        wrapper.cache_clear = cache.clear
+        _memoized[fn.__name__] = cache
+        return wrapper
+
+    return decorator
+
+
+def memo_stats():
+    """
+    Returns the hit/miss counters of every memoized lookup, keyed by function name.
+    """
+    return {name: cache.info() for name, cache in _memoized.items()}
 
 
-#MARK: MATCHES
-def get_matches_list_by_competition(compId, version='v3'):
+def clear_memo():
+    for cache in _memoized.values():
+        cache.clear()
+
+
+#MARK: Request coalescing
+def _endpoint_template(url):
+    # '/v3/matches/5476570/events' -> '/v3/matches/{id}/events'
+    return re.sub(r'/\d+(?=/|$)', '/{id}', urlsplit(url).path)
+
+
+# Endpoints whose results a request_session keeps: the season lists and the lookups that several
+# downloaders ask for. Match-level data (e.g. multi-MB event feeds) is never kept, so the memory
+# of a session doesn't grow with the downloads it runs.
+SESSION_SHARED_ENDPOINTS = re.compile(r'/(seasons/\d+(/(matches|teams|players|fixtures))?|competitions/\d+|teams/\d+|players/\d+|areas)$')
+
+
+class RequestRegistry:
     """
-    Function to retrieve a list of matches for a specific competition using the Wyscout API.
+    Registry of the requests made through call_api, used to deduplicate identical url+params
+    requests: while a request is running every other caller asking for it waits for the same
+    result instead of hitting the API again.
+
+    With keep_results=True (see request_session) the completed results of the shared endpoints
+    (SESSION_SHARED_ENDPOINTS) are also kept for the lifetime of the registry, so e.g. the season
+    matches list fetched by one downloader is reused by the next ones.
 
     Parameters:
-    - compId (int): The identifier of the competition for which matches are requested.
-    - user (str): The user identifier for Wyscout API credentials.
-    - version (str, optional): The API version to use (default is 'v3').
+    - keep_results (bool, optional): Keep completed results (default is False).
+    """
 
-    Returns:
-    - Returns the list of matches for the specified competition obtained from the Wyscout API.
+    def __init__(self, keep_results=False):
+        self.keep_results = keep_results
+        self.requests = 0
+        self.network_calls = 0
+        self.deduplicated = 0
+        self.reused = 0
+        self.saved_by_endpoint = {}
+
+        self._in_flight = {}
+        self._async_in_flight = {}
+        self._results = {}
+        self._lock = threading.Lock()
+
+    def _saved(self, url, counter):
+        setattr(self, counter, getattr(self, counter) + 1)
+        endpoint = _endpoint_template(url)
+        self.saved_by_endpoint[endpoint] = self.saved_by_endpoint.get(endpoint, 0) + 1
+
+    def _done(self, key, url, result):
+        if (self.keep_results and not (isinstance(result, int) and result == -1)
+                and SESSION_SHARED_ENDPOINTS.search(urlsplit(url).path)):
+            self._results[key] = result
+
+    def run(self, url, params, fn):
+        """
+        Returns fn() for the request (url, params), sharing the call with concurrent identical requests.
+        """
+        key = DiskCache.key(url, params)
+        with self._lock:
+            self.requests += 1
+            if key in self._results:
+                self._saved(url, 'reused')
+                return self._results[key]
+            call = self._in_flight.get(key)
+            owner = call is None
+            if owner:
+                self.network_calls += 1
+                call = self._in_flight[key] = _InFlightCall()
+            else:
+                self._saved(url, 'deduplicated')
+
+        if not owner:
+            return call.wait()
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+                if call.error is None:
+                    self._done(key, url, call.result)
+            call.done.set()
+
+        return call.result
+
+    async def run_async(self, url, params, coro_fn):
+        """
+        Async version of run: concurrent identical requests on the event loop await the same task.
+        Tasks are only shared within their own loop, as awaiting them from another loop fails.
+        """
+        key = DiskCache.key(url, params)
+        loop_key = (asyncio.get_running_loop(), key)
+        with self._lock:
+            self.requests += 1
+            if key in self._results:
+                self._saved(url, 'reused')
+                return self._results[key]
+            task = self._async_in_flight.get(loop_key)
+            if task is not None:
+                self._saved(url, 'deduplicated')
+            else:
+                self.network_calls += 1
+                task = self._async_in_flight[loop_key] = asyncio.ensure_future(coro_fn())
+                task.add_done_callback(lambda t: self._async_done(loop_key, url, t))
+        return await asyncio.shield(task)
+
+    def _async_done(self, loop_key, url, task):
+        with self._lock:
+            self._async_in_flight.pop(loop_key, None)
+            if not task.cancelled() and task.exception() is None:
+                self._done(loop_key[1], url, task.result())
+
+    def report(self):
+        """
+        Returns how many requests went through the registry and how many API calls were saved.
+        """
+        with self._lock:
+            return {'requests': self.requests,
+                    'network_calls': self.network_calls,
+                    'deduplicated_in_flight': self.deduplicated,
+                    'reused': self.reused,
+                    'saved': self.deduplicated + self.reused,
+                    'saved_by_endpoint': dict(self.saved_by_endpoint)}
+
+
+_registry = RequestRegistry()
+
+
+def get_request_registry():
+    return _registry
+
+
+@contextmanager
+def request_session():
     """
-    # Construct the URL for retrieving matches for the specified competition
-    url = base_url[version].format(f"/competitions/{compId}/matches")
+    Opens a session in which the completed requests of the season lists and lookups
+    (SESSION_SHARED_ENDPOINTS) are kept and shared, on top of the in-flight deduplication
+    that is always on. Useful when running several downloaders for the same season:
 
-    # Make an API call to get the matches list
-    return call_api(url=url)
+        with request_session() as session:
+            details = download_match_details(seasonId)
+            formations = download_match_formations(seasonId)
+        print(session.report())
+
+    The session is process-wide, so it also covers the worker threads of the downloaders.
+    """
+    global _registry
+    previous = _registry
+    _registry = session = RequestRegistry(keep_results=True)
+    try:
+        yield session
+    finally:
+        _registry = previous
+
+
+def call_api(url, params=None, client=None):
+  """
+  Funzione per fare una call all'api tramite una get:
+  url:string = url richiesto per scaricare i dati
+  params:dict = parametri della query string (opzionale)
+  client:WyscoutClient = client da usare, di default quello condiviso (get_client)
+
+  Le risposte 429/5xx e gli errori di connessione vengono ritentati secondo la RetryPolicy,
+  passando ogni volta dal RateLimiter condiviso.
+  Se la DiskCache e' attiva (enable_disk_cache) le risposte vengono lette e salvate su disco.
+  Le richieste identiche gia' in corso vengono condivise (RequestRegistry / request_session).
+  Con enable_fixtures le risposte vengono registrate su un archivio (mode='record', senza leggere
+  DiskCache e richieste condivise, cosi' l'archivio e' completo) o servite dall'archivio senza rete (mode='replay').
 
+  Return:
+  - Se il download ha successo, restituisce il json relativo
+  - Se il download non ha successo stampa l'errore e restituisce -1
+  - Se la chiamata continua a fallire con 429/5xx dopo tutti i tentativi solleva WyscoutAPIError
+  """
+  start = time.perf_counter()
+  # Filled by _request_json, stays empty if an identical request in flight is shared
+  record = {}
+  if _replaying():
+    try:
+      payload = _fixtures.replay(url, params, record)
+    except Exception as e:
+      _emit_metrics(url, start, record, error=e)
+      raise
+    _emit_metrics(url, start, record)
+    return payload
+
+  recording = _recording()
+  if not recording:
+    hit, payload = _cache_lookup(url, params)
+    if hit:
+      _emit_metrics(url, start, {'cache': 'hit'})
+      return payload
+
+  try:
+    if recording:
+      payload = _request_json(url, params, client, record)
+    else:
+      payload = _registry.run(url, params, lambda: _request_json(url, params, client, record))
+  except Exception as e:
+    _emit_metrics(url, start, record, error=e)
+    raise
+  _emit_metrics(url, start, record)
+  return payload
+
+
+def _request_json(url, params=None, client=None, record=None):
+    # The network part of call_api: rate limiting, retries and cache store
+    if client is None:
+        client = get_client()
+    limiter, policy = _rate_limiter, _retry_policy
+    record = {} if record is None else record
+    record.update(cache='miss', retries=0, wait=0.0)
+
+    attempt = 0
+    while True:
+        if limiter is not None:
+            start = time.perf_counter()
+            limiter.acquire()
+            record['wait'] += time.perf_counter() - start
+
+        try:
+            start = time.perf_counter()
+            response = client.get(url, params=params)
+            network = time.perf_counter() - start
+        except (requests.ConnectionError, requests.Timeout):
+            if attempt >= policy.max_retries:
+                raise
+            delay = policy.delay(attempt)
+            time.sleep(delay)
+            record['wait'] += delay
+            attempt += 1
+            record['retries'] = attempt
+            continue
+
+        # requests measures the time to the response headers, the rest of the network time is the body
+        ttfb = min(response.elapsed.total_seconds(), network)
+        record.update(status=response.status_code, bytes=len(response.content), ttfb=ttfb, download=network - ttfb)
+        if response.ok or response.status_code not in policy.retry_statuses:
+            _fixture_store(url, params, response.status_code, response.content)
+
+        if response.ok:
+            if limiter is not None:
+                limiter.on_success()
+            # Decode the raw bytes, without building the intermediate text
+            raw = response.content
+            start = time.perf_counter()
+            payload = decode_json(raw)
+            record['decode'] = time.perf_counter() - start
+            _timings.add(len(raw), network, record['decode'])
+            _cache_store(url, params, payload)
+            return payload
+
+        if response.status_code not in policy.retry_statuses:
+            print('Chimata errata: ', response.text)
+            return -1
+
+        retry_after = _parse_retry_after(response.headers.get('Retry-After'))
+        if limiter is not None and response.status_code in policy.throttle_statuses:
+            limiter.on_throttle(retry_after)
+        if attempt >= policy.max_retries:
+            raise WyscoutAPIError(url, response.status_code, response.text)
+        delay = policy.delay(attempt, retry_after)
+        time.sleep(delay)
+        record['wait'] += delay
+        attempt += 1
+        record['retries'] = attempt
+
+
+@memoize(ttl=24 * 60 * 60)
+def get_areas(version='v3'):
+    url = base_url[version].format(f'/areas')
+    return call_api(url)
 
-def get_matches_list_by_season(seasonId, version='v3'):
+  
+#MARK: Pagination
+def iter_pages(url, items_key, params=None, limit=100, n_jobs=5):
     """
-    Function to retrieve a list of matches for a specific season using the Wyscout API.
+    Generator over the items of a paginated Wyscout endpoint (the ones answering with meta.page_count).
 
-    Parameters:
-    - seasonId (int): The identifier of the season for which matches are requested.
-    - user (str): The user identifier for Wyscout API credentials.
-    - version (str, optional): The API version to use (default is 'v3').
+    The first page is requested to read page_count, then all the other pages are requested
+    concurrently; each page's list of items is yielded as soon as it arrives (page 1 first).
 
-    Returns:
-    - Returns the list of matches for the specified season obtained from the Wyscout API.
+    Parameters:
+    - url (str): The endpoint url.
+    - items_key (str): Key of the items in each page (e.g. 'players').
+    - params (dict, optional): Additional query string parameters.
+    - limit (int, optional): Page size (default is 100, the API max).
+    - n_jobs (int, optional): Pages downloaded at the same time (default is 5).
+
+    Yields:
+    - list: The items of one page.
     """
-    # Construct the URL for retrieving matches for the specified season
-    url = base_url[version].format(f"/seasons/{seasonId}/matches")
+    for _, page_items in _iter_numbered_pages(url, items_key, params, limit, n_jobs):
+        yield page_items
 
-    # Make an API call to get the matches list
-    return call_api(url=url)
 
-def get_season_fixtures(seasonId, version='v3'):
+def _iter_numbered_pages(url, items_key, params, limit, n_jobs):
+    params = dict(params or {}, limit=limit)
+
+    def page(number):
+        response_json = call_api(url=url, params=dict(params, page=number))
+        if isinstance(response_json, int) and response_json == -1:
+            raise WyscoutAPIError(url, None, f'page {number} failed')
+        return response_json
+
+    first = page(1)
+    yield 1, first[items_key]
+
+    page_count = first.get('meta', {}).get('page_count', 1)
+    if page_count <= 1:
+        return
+
+    if not _replaying():
+        get_client(pool_size=get_io_executor().max_workers)
+    for number, future in _run_bounded(page, range(2, page_count + 1), n_jobs):
+        yield number, future.result()[items_key]
+
+
+def fetch_all_pages(url, items_key, params=None, limit=100, n_jobs=5, dedupe_key=None):
     """
-    Function to retrieve fixtures for a specific season using the Wyscout API.
+    Downloads every page of a paginated endpoint concurrently (see iter_pages) and returns the complete list.
 
     Parameters:
-    - seasonId (int): The identifier of the season for which fixtures are requested.
-    - version (str, optional): The API version to use (default is 'v3').
+    - dedupe_key (str, optional): If given, items with the same value of this key (e.g. 'wyId') are kept once,
+      as the API may repeat an item across two pages when the data changes during the download.
 
     Returns:
-    - Returns the list of fixtures for the specified season obtained from the Wyscout API.
+    - list: The items of all the pages.
     """
-    # Construct the URL for retrieving fixtures for the specified season
-    url = base_url[version].format(f"/seasons/{seasonId}/fixtures")
+    pages = dict(_iter_numbered_pages(url, items_key, params, limit, n_jobs))
 
-    # Make an API call to get the fixtures list with match details
-    return call_api(url=url, params={'details': 'matches'})
+    items, seen = [], set()
+    for number in sorted(pages):
+        for item in pages[number]:
+            if dedupe_key is not None:
+                if item.get(dedupe_key) in seen:
+                    continue
+                seen.add(item.get(dedupe_key))
+            items.append(item)
+    return items
 
-def get_competition_fixtures(compId, version='v3'):
+
+#MARK: Competition list
+@memoize(ttl=24 * 60 * 60)
+def get_competition_details(competitionId, version='v3'):
     """
-    Function to retrieve fixtures for a specific competition using the Wyscout API.
+    Ottiene i dettagli della competizione specificata tramite richiesta API.
 
-    Parameters:
-    - compId (int): The identifier of the competition for which fixtures are requested.
-    - version (str, optional): The API version to use (default is 'v3').
+    Args:
+    - competitionId (str): Identificativo della competizione.
+    - version (str, optional): Versione dell'API da utilizzare. Predefinito a 'v3'.
 
     Returns:
-    - Returns the list of fixtures for the specified competition obtained from the Wyscout API.
+    - dict: Dettagli della competizione.
     """
-    # Construct the URL for retrieving fixtures for the specified competition
-    url = base_url[version].format(f"/competitions/{compId}/fixtures")
+    url = base_url[version].format(f'/competitions/{competitionId}')
+    return call_api(url)
 
-    # Make an API call to get the fixtures list with match details
-    return call_api(url=url, params={'details': 'matches'})
 
-def get_matches_list_by_team(teamId, version='v3'):
+def get_competitions_list(areaId = 'ITA',version='v3'):
     """
-    Function to retrieve a list of matches for a specific team using the Wyscout API.
+    Function to retrieve a list of competitions using the Wyscout API.
 
     Parameters:
-    - teamId (int): The identifier of the team for which matches are requested.
+    - user (str): The user identifier for Wyscout API credentials.
     - version (str, optional): The API version to use (default is 'v3').
 
     Returns:
-    - Returns the list of matches for the specified team obtained from the Wyscout API.
+    - Returns the list of competitions obtained from the Wyscout API.
     """
-    # Construct the URL for retrieving matches for the specified team
-    url = base_url[version].format(f"/teams/{teamId}/matches")
+    # Construct the URL for retrieving competitions in Italy (areaId=ITA)
+    url = base_url[version].format(f'/competitions?areaId={areaId}')
 
-    # Make an API call to get the matches list
+    # Make an API call to get the competitions list
     return call_api(url=url)
 
+#MARK: Season list
+@memoize(ttl=24 * 60 * 60)
+def get_season_details(seasonId, version='v3'):
+    """
+    Ottiene i dettagli della stagione specificata tramite richiesta API.
+
+    Args:
+    - seasonId (str): Identificativo della stagione.
+    - version (str, optional): Versione dell'API da utilizzare. Predefinito a 'v3'.
+
+    Returns:
+    - dict: Dettagli della stagione.
+    """
+    url = base_url[version].format(f'/seasons/{seasonId}')
+    return call_api(url)
+
 
-def get_match_events(matchId, version='v3', fetch=[], details=[], exclude=[]):
+def get_seasons_list(compId, version='v3'):
     """
-    Function to retrieve events for a specific match using the Wyscout API.
+    Function to download a list of seasons for a specific competition using the Wyscout API.
 
     Parameters:
-    - matchId (int): The identifier of the match for which events are requested.
+    - compId (int): The identifier of the competition for which seasons are requested.
+    - user (str): The user identifier for Wyscout API credentials.
     - version (str, optional): The API version to use (default is 'v3').
-    - fetch (list, optional): List of related objects to be fetched (e.g., ['teams', 'players', 'match']).
-    - details (list, optional): List of related objects to be detailed (e.g., ['tag']).
-    - exclude (list, optional): List of objects to exclude (e.g., ['possessions', 'names', 'positions']).
 
     Returns:
-    - Returns the events for the specified match obtained from the Wyscout API.
+    - Returns the list of seasons for the specified competition obtained from the Wyscout API.
     """
+    # Print a message indicating the start of downloading seasons for the given competition
+    print('Downloading seasons for competition: ', compId)
+
+    # Construct the URL for retrieving seasons for the specified competition
+    url = base_url[version].format(f'/competitions/{compId}/seasons')
+
+    # Make an API call to get the seasons list
+    return call_api(url=url)
+
+def get_season_transfers(seasonId, fromDate, toDate ,version='v3'):
+    
+    url = base_url[version].format(f"/seasons/{seasonId}/transfers")
+
+    if fromDate or toDate:
+        url +='?'
+        if fromDate:
+            url += f'fromDate={fromDate}'
+            if toDate:
+                url += f'&toDate={toDate}'
+        else:
+            url += f'toDate={toDate}'
+   
+    return call_api(url=url)
+
+
+def get_season_table(seasonId,version='v3', team_details=False):
+    url = base_url[version].format(f"/seasons/{seasonId}/standings")
+
+    if team_details:
+        url += '?details=teams'
+   
+    return call_api(url=url)
+
+
+#MARK: ROUND
+def get_round_details(roundId, version='v3', details=[]):
+    # Construct the URL for retrieving seasons for the specified competition
+    url = base_url[version].format(f'/rounds/{roundId}')
+
+
+    # Make an API call to get the seasons list
+    return call_api(url=url, params={'details': (','.join(details))})
+
+
+#MARK: TEAMS
+def _team_details_request(teamId, version='v3'):
+    return base_url[version].format(f'/teams/{teamId}'), None
+
+
+@memoize(ttl=60 * 60)
+def get_team_details(teamId, version='v3'):
+    # Construct the URL for retrieving seasons for the specified competition
+    url, params = _team_details_request(teamId, version=version)
+
+    # Make an API call to get the seasons list
+    return call_api(url=url, params=params)
+
+
+
+def get_teams_list_by_competition(compId, version='v3'):
+    """
+    Function to download a list of teams for a specific competition using the Wyscout API.
+
+    Parameters:
+    - compId (int): The identifier of the competition for which teams are requested.
+    - user (str): The user identifier for Wyscout API credentials.
+    - version (str, optional): The API version to use (default is 'v3').
+
+    Returns:
+    - Returns the list of teams for the specified competition obtained from the Wyscout API.
+    """
+    # Print a message indicating the start of downloading teams for the given competition
+    print('Downloading teams for competition: ', compId)
+
+    # Construct the URL for retrieving teams for the specified competition
+    url = base_url[version].format(f'/competitions/{compId}/teams')
+
+    # Make an API call to get the teams list
+    return call_api(url=url)
+
+
+def _teams_list_by_season_request(seasonId, version='v3'):
+    return base_url[version].format(f'/seasons/{seasonId}/teams'), None
+
+
+def get_teams_list_by_season(seasonId, version='v3'):
+    """
+    Function to download a list of teams for a specific season using the Wyscout API.
+
+    Parameters:
+    - seasonId (int): The identifier of the season for which teams are requested.
+    - user (str): The user identifier for Wyscout API credentials.
+    - version (str, optional): The API version to use (default is 'v3').
+
+    Returns:
+    - Returns the list of teams for the specified season obtained from the Wyscout API.
+    """
+    # Print a message indicating the start of downloading teams for the given season
+    print('Downloading teams for season: ', seasonId)
+
+    # Construct the URL for retrieving teams for the specified season
+    url, params = _teams_list_by_season_request(seasonId, version=version)
+
+    # Make an API call to get the teams list
+    return call_api(url=url, params=params)
+
+
+
+def get_team_advance_stats(teamId, compId, seasonId,version = 'v3'):
+
+    print(teamId)
+    url = base_url[version].format(f'/teams/{teamId}/advancedstats?compId={compId}&seasonId={seasonId}')
+    #url = f'https://apirest.wyscout.com/v3/teams/3158/advancedstats'
+
+    # Make an API call to get the teams advance stats
+    return call_api(url=url)
+
+def get_team_match_advance_stats(teamId, matchId, version = 'v3'):
+
+
+    url = base_url[version].format(f'/teams/{teamId}/matches/{matchId}/advancedstats')
+    #url = f'https://apirest.wyscout.com/v3/teams/3158/advancedstats'
+
+    # Make an API call to get the teams advance stats
+    return call_api(url=url)
+
+
+
+#MARK: PLAYERS
+@memoize(ttl=60 * 60)
+def get_player_details(playerId, version='v3'):
+    # Construct the URL for retrieving teams for the specified season
+    url = base_url[version].format(f'/players/{playerId}?details=currentTeam')
+
+    # Make an API call to get the teams list
+    return call_api(url=url)
+
+def search_players_by_name(player_name, version='v3'):
+    """
+    Function to search for players by name using the Wyscout API.
+    
+    Parameters:
+    - player_name (str): The name of the player to search for.
+    - version (str, optional): The API version to use (default is 'v3').
+    
+    Returns:
+    - Returns a list of players matching the search query.
+    """
+    # Try the search endpoint first
+    url = base_url[version].format('/search')
+    
+    # Set up parameters for the search
+    params = {
+        'query': player_name,
+        'objType': 'player'
+    }
+    
+    # Make an API call to search for players
+    search_result = call_api(url=url, params=params)
+    
+    # If search doesn't work, try alternative approach
+    if search_result == -1 or not search_result:
+        # Try with different parameters
+        params_alt = {
+            'q': player_name,
+            'type': 'player'
+        }
+        search_result = call_api(url=url, params=params_alt)
+    
+    return search_result
+
+
+
+def get_players_list_by_season(seasonId, version='v3', n_jobs=5, stream=False):
+    """
+    Function to download a list of players for a specific season using the Wyscout API.
+    The pages after the first one are downloaded concurrently (see fetch_all_pages).
+
+    Parameters:
+    - seasonId (int): The identifier of the season for which players are requested.
+    - version (str, optional): The API version to use (default is 'v3').
+    - n_jobs (int, optional): Pages downloaded at the same time (default is 5).
+    - stream (bool, optional): If True returns a generator of the pages' player lists, in arrival order.
+
+    Returns:
+    - Returns the list of players for the specified season obtained from the Wyscout API.
+    """
+    url = base_url[version].format(f"/seasons/{seasonId}/players")
+
+    if stream:
+        return iter_pages(url, 'players', n_jobs=n_jobs)
+    return fetch_all_pages(url, 'players', n_jobs=n_jobs, dedupe_key='wyId')
+
+def get_players_list_by_team_season(teamId, seasonId, version='v3'):
+    # Construct the URL for retrieving teams for the specified season
+    url = base_url[version].format(f'/teams/{teamId}/squad?seasonId={seasonId}')
+
+    # Make an API call to get the teams list
+    return call_api(url=url)
+
+
+def get_players_transfers(playerId, version='v3'):
+    # Construct the URL for retrieving teams for the specified season
+    url = base_url[version].format(f'/players/{playerId}/transfers')
+    
+
+    # Make an API call to get the teams list
+    return call_api(url=url)
+
+def get_player_matches(playerId, seasonId=None, version='v3'):
+    """
+    Function to retrieve matches for a specific player using the Wyscout API.
+    
+    Parameters:
+    - playerId (int): The unique ID of the player.
+    - seasonId (int, optional): The unique ID of the season.
+    - version (str, optional): The API version to use (default is 'v2').
+    
+    Returns:
+    - Returns the list of matches for the specified player obtained from the Wyscout API.
+    """
+    # Construct the URL for retrieving matches for the specified player
+    url = base_url[version].format(f'/players/{playerId}/matches')
+    
+    # Set up parameters
+    params = {}
+    if seasonId:
+        params['seasonId'] = seasonId
+    
+    # Make an API call to get the matches list
+    matches = call_api(url=url, params=params)
+    if isinstance(matches, dict):
+        mark_matches_final(matches.get('matches', []))
+    return matches
+
+def get_player_fixtures(playerId, dateFrom=None, dateTo=None, version='v2'):
+    """
+    Function to retrieve fixtures for a specific player using the Wyscout API.
+    
+    Parameters:
+    - playerId (int): The unique ID of the player.
+    - dateFrom (str, optional): Start date in YYYY-MM-DD format.
+    - dateTo (str, optional): End date in YYYY-MM-DD format.
+    - version (str, optional): The API version to use (default is 'v2').
+    
+    Returns:
+    - Returns the list of fixtures for the specified player obtained from the Wyscout API.
+    """
+    # Construct the URL for retrieving fixtures for the specified player
+    url = base_url[version].format(f'/players/{playerId}/fixtures')
+    
+    # Set up parameters
+    params = {}
+    if dateFrom:
+        params['fromDate'] = dateFrom
+    if dateTo:
+        params['toDate'] = dateTo
+    
+    # Make an API call to get the fixtures list
+    return call_api(url=url, params=params)
+
+
+def get_advanced_stats_match(matchId, version='v3'):
+    # Construct the URL for retrieving teams for the specified season
+    url = base_url[version].format(f'/matches/{matchId}/advancedstats/players?fetch=match')
+    
+
+    # Make an API call to get the teams list
+    return call_api(url=url)
+
+
+
+
+def _advanced_stats_season_request(playerid, compId, seasonId, details=['player'], version='v3'):
+    url = base_url[version].format(f"/players/{playerid}/advancedstats?compId={compId}&seasonId={seasonId}")
+
+    if details:
+        url += '&details='
+        details_string = ','.join(details)
+        url += details_string
+
+    return url, None
+
+
+def get_advanced_stats_season(playerid, compId, seasonId, details=['player'],version='v3'):
+    """
+    Function to retrieve advanced statistics for a specific player, competition, and season using the Wyscout API.
+
+    Parameters:
+    - playerid (int): The identifier of the player for whom advanced statistics are requested.
+    - compId (int): The identifier of the competition for which statistics are requested.
+    - seasonId (int): The identifier of the season for which statistics are requested.
+    - user (str): The user identifier for Wyscout API credentials.
+    - version (str, optional): The API version to use (default is 'v3').
+
+    Returns:
+    - Returns the advanced statistics for the specified player, competition, and season obtained from the Wyscout API.
+    """
+    # Construct the URL for retrieving advanced statistics
+    url, params = _advanced_stats_season_request(playerid, compId, seasonId, details=details, version=version)
+
+    # Make an API call to get the advanced statistics
+    return call_api(url=url, params=params)
+
+
+# def get_stats(player, args):
+#         compId, seasonId, v = args
+#         return get_advanced_stats_season(player['wyId'], compId=compId, seasonId=seasonId, version=v)
+
+
+def _players_match_advanced_stats_request(playerid, matchId, version='v3'):
+    return base_url[version].format(f"/players/{playerid}/matches/{matchId}/advancedstats"), None
+
+
+def get_players_match_advanced_stats(playerid, matchId, version='v3', typed=False):
+    """
+    Function to retrieve advanced statistics for a specific player, competition, and season using the Wyscout API.
+
+    Parameters:
+    - playerid (int): The identifier of the player for whom advanced statistics are requested.
+    - version (str, optional): The API version to use (default is 'v3').
+    - typed (bool, optional): Return a PlayerMatchStats record instead of the json (default is False).
+
+    Returns:
+    - Returns the advanced statistics for the specified player, competition, and season obtained from the Wyscout API.
+    """
+    
+    # Construct the URL for retrieving advanced statistics
+    url, params = _players_match_advanced_stats_request(playerid, matchId, version=version)
+
+    # Make an API call to get the advanced statistics
+    stats = call_api(url=url, params=params)
+    return parse_records('player_stats', stats) if typed else stats
+
+
+def get_player_match_advance_stats_parallel(player, args):
+    matchId, v = args
+    return get_players_match_advanced_stats(player['wyId'], matchId=matchId, version=v)
+
+
+def _all_players_match_advanced_stats_request(matchId, version='v3'):
+    return base_url[version].format(f"/matches/{matchId}/advancedstats/players"), None
+
+
+def get_all_players_match_advanced_stats(matchId, version='v3', typed=False):
+    """
+    Function to retrieve advanced statistics for a specific player, competition, and season using the Wyscout API.
+
+    Parameters:
+    - playerid (int): The identifier of the player for whom advanced statistics are requested.
+    - compId (int): The identifier of the competition for which statistics are requested.
+    - seasonId (int): The identifier of the season for which statistics are requested.
+    - user (str): The user identifier for Wyscout API credentials.
+    - version (str, optional): The API version to use (default is 'v3').
+    - typed (bool, optional): Return PlayerMatchStats records instead of the json (default is False).
+
+    Returns:
+    - Returns the advanced statistics for the specified player, competition, and season obtained from the Wyscout API.
+    """
+    # Construct the URL for retrieving advanced statistics
+    url, params = _all_players_match_advanced_stats_request(matchId, version=version)
+
+    # Make an API call to get the advanced statistics
+    players = call_api(url=url, params=params)['players']
+    return parse_records('player_match_stats', players) if typed else players
+
+
+def _all_players_match_physical_data_request(matchId, version='v4'):
+    return base_url[version].format(f"/matches/{matchId}/physicaldata"), None
+
+
+def get_all_players_match_physical_data(matchId, version='v4', typed=False):
+    """
+    Function to retrieve advanced statistics for a specific player, competition, and season using the Wyscout API.
+
+    Parameters:
+    - matchId (int): The identifier of the match for which advanced statistics are requested.
+    - user (str): The user identifier for Wyscout API credentials.
+    - version (str, optional): The API version to use (default is 'v3').
+    - typed (bool, optional): Return PhysicalData records instead of the json (default is False).
+
+    Returns:
+    - Returns the advanced statistics for the specified player, competition, and season obtained from the Wyscout API.
+    """
+    # Construct the URL for retrieving advanced statistics
+    url, params = _all_players_match_physical_data_request(matchId, version=version)
+
+    # Make an API call to get the advanced statistics
+    physical_data = call_api(url=url, params=params)
+    return parse_records('physical_data', physical_data) if typed else physical_data
+
+
+#MARK: MATCHES
+def get_matches_list_by_competition(compId, version='v3'):
+    """
+    Function to retrieve a list of matches for a specific competition using the Wyscout API.
+
+    Parameters:
+    - compId (int): The identifier of the competition for which matches are requested.
+    - user (str): The user identifier for Wyscout API credentials.
+    - version (str, optional): The API version to use (default is 'v3').
+
+    Returns:
+    - Returns the list of matches for the specified competition obtained from the Wyscout API.
+    """
+    # Construct the URL for retrieving matches for the specified competition
+    url = base_url[version].format(f"/competitions/{compId}/matches")
+
+    # Make an API call to get the matches list
+    return call_api(url=url)
+
+
+def _matches_list_by_season_request(seasonId, version='v3'):
+    return base_url[version].format(f"/seasons/{seasonId}/matches"), None
+
+
+def get_matches_list_by_season(seasonId, version='v3', typed=False):
+    """
+    Function to retrieve a list of matches for a specific season using the Wyscout API.
+
+    Parameters:
+    - seasonId (int): The identifier of the season for which matches are requested.
+    - user (str): The user identifier for Wyscout API credentials.
+    - version (str, optional): The API version to use (default is 'v3').
+    - typed (bool, optional): Return Match records instead of the json (default is False).
+
+    Returns:
+    - Returns the list of matches for the specified season obtained from the Wyscout API.
+    """
+    # Construct the URL for retrieving matches for the specified season
+    url, params = _matches_list_by_season_request(seasonId, version=version)
+
+    # Make an API call to get the matches list
+    matches = call_api(url=url, params=params)
+    if isinstance(matches, dict):
+        mark_matches_final(matches.get('matches', []))
+    return parse_records('matches', matches) if typed else matches
+
+def get_season_fixtures(seasonId, version='v3'):
+    """
+    Function to retrieve fixtures for a specific season using the Wyscout API.
+
+    Parameters:
+    - seasonId (int): The identifier of the season for which fixtures are requested.
+    - version (str, optional): The API version to use (default is 'v3').
+
+    Returns:
+    - Returns the list of fixtures for the specified season obtained from the Wyscout API.
+    """
+    # Construct the URL for retrieving fixtures for the specified season
+    url = base_url[version].format(f"/seasons/{seasonId}/fixtures")
+
+    # Make an API call to get the fixtures list with match details
+    return call_api(url=url, params={'details': 'matches'})
+
+def get_competition_fixtures(compId, version='v3'):
+    """
+    Function to retrieve fixtures for a specific competition using the Wyscout API.
+
+    Parameters:
+    - compId (int): The identifier of the competition for which fixtures are requested.
+    - version (str, optional): The API version to use (default is 'v3').
+
+    Returns:
+    - Returns the list of fixtures for the specified competition obtained from the Wyscout API.
+    """
+    # Construct the URL for retrieving fixtures for the specified competition
+    url = base_url[version].format(f"/competitions/{compId}/fixtures")
+
+    # Make an API call to get the fixtures list with match details
+    return call_api(url=url, params={'details': 'matches'})
+
+def get_matches_list_by_team(teamId, version='v3'):
+    """
+    Function to retrieve a list of matches for a specific team using the Wyscout API.
+
+    Parameters:
+    - teamId (int): The identifier of the team for which matches are requested.
+    - version (str, optional): The API version to use (default is 'v3').
+
+    Returns:
+    - Returns the list of matches for the specified team obtained from the Wyscout API.
+    """
+    # Construct the URL for retrieving matches for the specified team
+    url = base_url[version].format(f"/teams/{teamId}/matches")
+
+    # Make an API call to get the matches list
+    return call_api(url=url)
+
+
+def get_match_events(matchId, version='v3', fetch=[], details=[], exclude=[], typed=False):
+    """
+    Function to retrieve events for a specific match using the Wyscout API.
+
+    Parameters:
+    - matchId (int): The identifier of the match for which events are requested.
+    - version (str, optional): The API version to use (default is 'v3').
+    - fetch (list, optional): List of related objects to be fetched (e.g., ['teams', 'players', 'match']).
+    - details (list, optional): List of related objects to be detailed (e.g., ['tag']).
+    - exclude (list, optional): List of objects to exclude (e.g., ['possessions', 'names', 'positions']).
+    - typed (bool, optional): Return Event records instead of the json (default is False).
+
+    Returns:
+    - Returns the events for the specified match obtained from the Wyscout API.
+    """
+    # Construct the URL for retrieving events for the specified match
+    url = base_url[version].format(f"/matches/{matchId}/events")
+    
+    # Build parameters
+    params = {}
+    if fetch:
+        params['fetch'] = ','.join(fetch)
+    if details:
+        params['details'] = ','.join(details)
+    if exclude:
+        params['exclude'] = ','.join(exclude)
+
+    # Make an API call to get the match events
+    events = call_api(url=url, params=params if params else None)
+    return parse_records('events', events) if typed else events
+
+
+#MARK: Event store
+EVENT_PERIODS = ('1H', '2H', 'ET', 'P')
+
+
+def _match_events_list(payload):
+    # The events feed comes either as {'elements': [{'events': [...]}]} or as {'events': [...]}
+    if not isinstance(payload, dict):
+        return []
+    elements = payload.get('elements')
+    if elements:
+        return elements[0].get('events', [])
+    return payload.get('events', [])
+
+
+def _nested_id(event, flat_key, nested_key):
+    # v2 style 'playerId' or v3 style 'player': {'id': ...}
+    value = event.get(flat_key)
+    if value is None:
+        value = (event.get(nested_key) or {}).get('id')
+    return value
+
+
+def _event_location(event):
+    location = event.get('location')
+    if not location and event.get('positions'):
+        location = event['positions'][0]
+    location = location or {}
+    return location.get('x'), location.get('y')
+
+
+class EventStore:
+    """
+    Columnar, in-memory store of the events of one match.
+
+    The events feed is parsed once into pandas/NumPy columns (type, playerId, teamId, period,
+    minute, second, x, y), so filters, group-bys and counts are vectorized operations on
+    those columns instead of Python loops over the event dicts. The original events are kept
+    in the same order, so filters can still return them.
+
+        store = load_event_store(matchId)
+        shots = store.filter(type='shot', teamId=3159)
+        store.count('playerId', type='pass')
+
+    Parameters:
+    - events (list): The list of event dicts of the match.
+    - matchId (int, optional): The match the events belong to.
+    """
+
+    COLUMNS = ('type', 'playerId', 'teamId', 'period', 'minute', 'second', 'x', 'y')
+
+    def __init__(self, events, matchId=None):
+        self.matchId = matchId
+        self.events = np.empty(len(events), dtype=object)
+        self.events[:] = events
+
+        types, players, teams, periods, minutes, seconds, xs, ys = ([] for _ in range(8))
+        for event in events:
+            event_type = event.get('type') or {}
+            types.append(event_type.get('name', event_type.get('primary')))
+            players.append(_nested_id(event, 'playerId', 'player'))
+            teams.append(_nested_id(event, 'teamId', 'team'))
+            periods.append(event.get('period', event.get('matchPeriod')))
+            minutes.append(event.get('minute'))
+            seconds.append(event.get('second'))
+            x, y = _event_location(event)
+            xs.append(x)
+            ys.append(y)
+
+        self.frame = pd.DataFrame({
+            'type': pd.Categorical(types),
+            'playerId': pd.array(players, dtype='Int64'),
+            'teamId': pd.array(teams, dtype='Int64'),
+            'period': pd.Categorical(periods),
+            'minute': pd.array(minutes, dtype='Float64'),
+            'second': pd.array(seconds, dtype='Float64'),
+            'x': pd.array(xs, dtype='Float64'),
+            'y': pd.array(ys, dtype='Float64'),
+        })
+
+    @classmethod
+    def from_payload(cls, payload, matchId=None):
+        return cls(_match_events_list(payload), matchId=matchId)
+
+    def __len__(self):
+        return len(self.events)
+
+    def mask(self, type=None, playerId=None, teamId=None, period=None, minute_from=None, minute_to=None):
+        """
+        Returns the boolean mask of the events matching every given criterion.
+        Each criterion is a value or a list of accepted values.
+        """
+        mask = np.ones(len(self.frame), dtype=bool)
+        for column, value in (('type', type), ('playerId', playerId), ('teamId', teamId), ('period', period)):
+            if value is None:
+                continue
+            values = value if isinstance(value, (list, tuple, set)) else [value]
+            mask &= self.frame[column].isin(values).to_numpy(dtype=bool, na_value=False)
+        if minute_from is not None:
+            mask &= (self.frame['minute'] >= minute_from).to_numpy(dtype=bool, na_value=False)
+        if minute_to is not None:
+            mask &= (self.frame['minute'] < minute_to).to_numpy(dtype=bool, na_value=False)
+        return mask
+
+    def filter(self, **criteria):
+        """
+        Returns the original event dicts matching the criteria of mask().
+        """
+        return list(self.events[self.mask(**criteria)])
+
+    def select(self, **criteria):
+        """
+        Returns the columns of the events matching the criteria of mask(), as a DataFrame.
+        """
+        return self.frame[self.mask(**criteria)]
+
+    def count(self, *by, **criteria):
+        """
+        Counts the events matching the criteria, grouped by the given columns.
+
+        Returns:
+        - Series: The counts, indexed by the values of the by columns (a single int if by is empty).
+        """
+        frame = self.select(**criteria)
+        if not by:
+            return len(frame)
+        return frame.groupby(list(by), observed=True, dropna=False).size()
+
+
+EVENT_STORE_TTL = 60 * 60
+
+
+def _event_store_ttl(store):
+    # Like the disk cache, the events of a match that may still be live are kept for MATCH_DATA_TTL only
+    return EVENT_STORE_TTL if store.matchId in _final_matches else MATCH_DATA_TTL
+
+
+@memoize(ttl=_event_store_ttl, maxsize=32)
+def load_event_store(matchId, version='v3', fetch=[], details=[]):
+    """
+    Downloads the events of a match once and returns them as an EventStore. The last 32 stores
+    are kept in memory, so e.g. a per-player report over a match downloads its events only once.
+    A store is kept for EVENT_STORE_TTL once its match is known to be final (see mark_matches_final),
+    for MATCH_DATA_TTL before that.
+
+    Returns:
+    - EventStore: The events of the match, or -1 if the download fails.
+    """
+    events = get_match_events(matchId=matchId, version=version, fetch=fetch, details=details)
+
+    if events == -1:
+        return -1
+
+    return EventStore.from_payload(events, matchId=matchId)
+
+
+def get_match_events_by_type(matchId, eventType, version='v3', fetch=[], details=[]):
+    """
+    Function to retrieve specific type of events for a match using the Wyscout API.
+    Note: the API doesn't support an eventType parameter, the events are filtered on the match EventStore.
+
+    Parameters:
+    - matchId (int): The identifier of the match for which events are requested.
+    - eventType (str): The type of events to retrieve (e.g., 'shot', 'pass', 'duel', 'foul').
+    - version (str, optional): The API version to use (default is 'v3').
+    - fetch (list, optional): List of related objects to be fetched (e.g., ['teams', 'players']).
+    - details (list, optional): List of related objects to be detailed (e.g., ['tag']).
+
+    Returns:
+    - Returns the filtered events for the specified match obtained from the Wyscout API.
+    """
+    store = load_event_store(matchId, version=version, fetch=fetch, details=details)
+
+    if store == -1:
+        return -1
+
+    return {'events': store.filter(type=eventType)}
+
+
+def get_player_match_events(playerId, matchId, version='v3', fetch=[], details=[]):
+    """
+    Function to retrieve events for a specific player in a match using the Wyscout API.
+    Note: the API doesn't support a playerId parameter, the events are filtered on the match EventStore.
+
+    Parameters:
+    - playerId (int): The identifier of the player for which events are requested.
+    - matchId (int): The identifier of the match for which events are requested.
+    - version (str, optional): The API version to use (default is 'v3').
+    - fetch (list, optional): List of related objects to be fetched (e.g., ['teams', 'players']).
+    - details (list, optional): List of related objects to be detailed (e.g., ['tag']).
+
+    Returns:
+    - Returns the events for the specified player in the match obtained from the Wyscout API.
+    """
+    store = load_event_store(matchId, version=version, fetch=fetch, details=details)
+
+    if store == -1:
+        return -1
+
+    return {'events': store.filter(playerId=playerId)}
+
+
+def get_match_events_summary(matchId, version='v3'):
+    """
+    Function to retrieve a summary of events for a match using the Wyscout API.
+
+    Parameters:
+    - matchId (int): The identifier of the match for which events are requested.
+    - version (str, optional): The API version to use (default is 'v3').
+
+    Returns:
+    - Returns a summary of events for the specified match obtained from the Wyscout API.
+    """
+    store = load_event_store(matchId, version=version)
+
+    if store == -1:
+        return -1
+
+    by_period = store.count('period')
+    return {
+        'total_events': len(store),
+        'events_by_type': _counts_dict(store.count('type')),
+        'events_by_team': _counts_dict(store.count('teamId')),
+        'events_by_period': {period: int(by_period.get(period, 0)) for period in EVENT_PERIODS}
+    }
+
+
+def _counts_dict(counts):
+    # Missing values are reported as 'Unknown', like the API fields they come from
+    return {('Unknown' if pd.isna(key) else key.item() if hasattr(key, 'item') else key): int(n) for key, n in counts.items()}
+
+
+# breakdown name -> column of the EventStore frame
+SUMMARY_BREAKDOWNS = {'type': 'type', 'team': 'teamId', 'period': 'period', 'player': 'playerId', 'minute': 'minute_bucket'}
+
+
+def summarize_matches_events(matches_list=[], seasonId=None, minute_bucket=15, version='v3', n_jobs=5):
+    """
+    Batch version of get_match_events_summary over many matches (or a whole season).
+
+    The events of the matches are fetched concurrently, each feed is parsed once into an EventStore,
+    and the counts are computed with vectorized group-bys over the stacked columns of all the matches.
+    Besides the per-type, per-team and per-period counts of get_match_events_summary, it breaks the
+    events down per player and per minute bucket.
+
+    Parameters:
+    - matches_list (list, optional): The matches to summarize.
+    - seasonId (int, optional): The season whose matches are summarized, if matches_list is empty.
+    - minute_bucket (int, optional): Width of the minute buckets (default is 15: 0-14, 15-29, ...).
+    - version (str, optional): The API version to use (default is 'v3').
+    - n_jobs (int, optional): Up to 2 * n_jobs matches are downloaded ahead (default is 5).
+
+    Returns:
+    - DataFrame: One row per (matchId, breakdown, key) with the events count, where breakdown is one of
+      'total', 'type', 'team', 'period', 'player', 'minute' and key is the event type, teamId, period,
+      playerId or minute bucket start ('Unknown' when the field is missing, None for 'total').
+    """
+    if not matches_list and seasonId is None:
+        raise ValueError('Either matches_list or seasonId is required')
+
+    frames = []
+    for matchId, payload in iter_match_events(seasonId, matches_list=matches_list, version=version, n_jobs=n_jobs):
+        if isinstance(payload, int) and payload == -1:
+            continue
+        frame = EventStore.from_payload(payload, matchId=matchId).frame
+        frames.append(frame.assign(matchId=matchId))
+
+    columns = ['matchId', 'breakdown', 'key', 'events']
+    if not frames:
+        return pd.DataFrame(columns=columns)
+
+    events = pd.concat(frames, ignore_index=True)
+    events['minute_bucket'] = (events['minute'] // minute_bucket * minute_bucket).astype('Int64')
+
+    summaries = [events.groupby('matchId').size().rename('events').reset_index().assign(breakdown='total', key=None)]
+    for breakdown, column in SUMMARY_BREAKDOWNS.items():
+        counts = events.groupby(['matchId', column], observed=True, dropna=False).size().rename('events').reset_index()
+        key = counts[column].astype(object)
+        counts['key'] = key.where(key.notna(), 'Unknown')
+        summaries.append(counts.drop(columns=column).assign(breakdown=breakdown))
+
+    return pd.concat(summaries, ignore_index=True)[columns]
+
+
+def _match_details_request(matchId, useSides=False, details=[], version='v3'):
+    url = base_url[version].format(f"/matches/{matchId}")
+
+    if useSides or details:
+        url += '?'
+        if useSides:
+            url += 'useSides=true&'
+        if details:
+            url += 'details='
+            details_string = ','.join(details)
+            url += details_string
+
+    return url, None
+
+
+def get_match_details(matchId, useSides=False, details=[], version='v3', typed=False):
+
     # Construct the URL for retrieving events for the specified match
-    url = base_url[version].format(f"/matches/{matchId}/events")
-    
-    # Build parameters
-    params = {}
-    if fetch:
-        params['fetch'] = ','.join(fetch)
+    url, params = _match_details_request(matchId, useSides=useSides, details=details, version=version)
+
+    match = call_api(url=url, params=params)
+    # typed=True returns a Match record
+    return parse_records('match', match) if typed else match
+
+
+
+
+
+def _match_advance_stats_request(matchId, version='v3'):
+    return base_url[version].format(f"/matches/{matchId}/advancedstats"), None
+
+
+def get_match_advance_stats(matchId, version='v3'):
+    # Construct the URL for retrieving matches for the specified season
+    url, params = _match_advance_stats_request(matchId, version=version)
+
+    # Make an API call to get the matches list
+    return call_api(url=url, params=params)
+
+
+def get_match_advance_stats_parallel(match, args):
+    v = args
+    return get_match_advance_stats(match['matchId'], version=v)
+
+
+def _match_formations_request(matchId, details=[], version='v3'):
+    url = base_url[version].format(f"/matches/{matchId}/formations")
+
     if details:
-        params['details'] = ','.join(details)
-    if exclude:
-        params['exclude'] = ','.join(exclude)
+        url += '?'
+        if version =='v4':
+            url += 'details='
+        else:
+            url += 'fetch='
+        details_string = ','.join(details)
+        url += details_string
+
+    return url, None
+
+
+def get_match_formations(matchId, details=[], version='v3'):
+    # Construct the URL for retrieving matches for the specified season
+    url, params = _match_formations_request(matchId, details=details, version=version)
+
+    # Make an API call to get the matches list
+    return call_api(url=url, params=params)
+
+
+
+
+def get_match_physical_data(match_id, version='v4'):
+    url = base_url[version].format(f"/matches/{match_id}/physicaldata")
+
+    return call_api(url=url)
+
+
+def get_match_all_players_advance_stats(match_id, version='v4'):
+
+    url = base_url[version].format(f"/matches/{match_id}/advancedstats/players")
+
+    return call_api(url=url)
+
+#MARK: Records
+class Metrics:
+    """
+    Compact group of stats (e.g. the 'total' of a player in a match): the values are kept in a tuple
+    and the metric names are shared by every group with the same names, instead of a dict per group.
+
+        stats.total.goals, stats.percent.get('successfulPasses')
+    """
+
+    __slots__ = ('_index', '_values')
+    # Shared name -> position maps, bounded as physical data payloads can bring many different sets of names
+    MAX_SCHEMAS = 256
+    _schemas = {}
+
+    def __init__(self, values):
+        names = tuple(values)
+        index = Metrics._schemas.get(names)
+        if index is None:
+            if len(Metrics._schemas) >= Metrics.MAX_SCHEMAS:
+                # The groups already built keep their maps, the new ones start sharing again
+                Metrics._schemas.clear()
+            index = Metrics._schemas.setdefault(names, {name: i for i, name in enumerate(names)})
+        self._index = index
+        self._values = tuple(values.values())
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        try:
+            return self._values[self._index[name]]
+        except KeyError:
+            raise AttributeError(name) from None
+
+    def get(self, name, default=None):
+        i = self._index.get(name)
+        return default if i is None else self._values[i]
+
+    def names(self):
+        return list(self._index)
+
+    def to_dict(self):
+        return dict(zip(self._index, self._values))
+
+    def __repr__(self):
+        return f'Metrics({self.to_dict()!r})'
+
+    def __eq__(self, other):
+        return isinstance(other, Metrics) and self.to_dict() == other.to_dict()
+
+
+class _Record:
+    """
+    Base of the typed records: slotted attributes listed in FIELDS, missing ones are None.
+    """
+
+    __slots__ = ()
+    FIELDS = ()
+
+    def __init__(self, **values):
+        for field in self.FIELDS:
+            setattr(self, field, values.get(field))
+
+    def to_dict(self):
+        return {field: (value.to_dict() if isinstance(value, Metrics) else value)
+                for field, value in ((field, getattr(self, field)) for field in self.FIELDS)}
+
+    def __repr__(self):
+        return f'{type(self).__name__}({", ".join(f"{field}={getattr(self, field)!r}" for field in self.FIELDS)})'
+
+    def __eq__(self, other):
+        return type(other) is type(self) and all(getattr(self, f) == getattr(other, f) for f in self.FIELDS)
+
+
+def _metrics(value):
+    return Metrics(value) if isinstance(value, dict) else None
+
+
+class Match(_Record):
+    """
+    A match, from the match details or from an item of the season matches list.
+    """
+
+    FIELDS = ('matchId', 'competitionId', 'seasonId', 'roundId', 'gameweek', 'status', 'dateutc', 'label',
+              'winner', 'homeTeamId', 'awayTeamId', 'homeScore', 'awayScore')
+    __slots__ = FIELDS
+
+    @classmethod
+    def from_payload(cls, payload):
+        match = payload.get('match', payload)
+        teams = {team.get('side'): team for team in (match.get('teamsData') or {}).values() if isinstance(team, dict)}
+        home, away = teams.get('home') or {}, teams.get('away') or {}
+        return cls(matchId=match.get('wyId', match.get('matchId')), competitionId=match.get('competitionId'),
+                   seasonId=match.get('seasonId'), roundId=match.get('roundId'), gameweek=match.get('gameweek'),
+                   status=match.get('status'), dateutc=match.get('dateutc'), label=match.get('label'),
+                   winner=match.get('winner'), homeTeamId=home.get('teamId'), awayTeamId=away.get('teamId'),
+                   homeScore=home.get('score'), awayScore=away.get('score'))
+
+
+class Team(_Record):
+    FIELDS = ('teamId', 'name', 'officialName', 'city', 'type', 'category', 'gender', 'area')
+    __slots__ = FIELDS
+
+    @classmethod
+    def from_payload(cls, payload):
+        return cls(teamId=payload.get('wyId'), name=payload.get('name'), officialName=payload.get('officialName'),
+                   city=payload.get('city'), type=payload.get('type'), category=payload.get('category'),
+                   gender=payload.get('gender'), area=(payload.get('area') or {}).get('name'))
+
+
+class Player(_Record):
+    FIELDS = ('playerId', 'shortName', 'firstName', 'lastName', 'birthDate', 'birthArea', 'passportArea', 'height',
+              'weight', 'foot', 'role', 'currentTeamId', 'currentNationalTeamId', 'gender', 'status')
+    __slots__ = FIELDS
+
+    @classmethod
+    def from_payload(cls, payload):
+        return cls(playerId=payload.get('wyId'), shortName=payload.get('shortName'), firstName=payload.get('firstName'),
+                   lastName=payload.get('lastName'), birthDate=payload.get('birthDate'),
+                   birthArea=(payload.get('birthArea') or {}).get('name'),
+                   passportArea=(payload.get('passportArea') or {}).get('name'), height=payload.get('height'),
+                   weight=payload.get('weight'), foot=payload.get('foot'), role=(payload.get('role') or {}).get('code2'),
+                   currentTeamId=payload.get('currentTeamId'), currentNationalTeamId=payload.get('currentNationalTeamId'),
+                   gender=payload.get('gender'), status=payload.get('status'))
+
+
+class PlayerMatchStats(_Record):
+    """
+    Advanced stats of a player in a match, the stats groups are Metrics.
+    """
+
+    FIELDS = ('playerId', 'matchId', 'competitionId', 'seasonId', 'roundId', 'positions', 'total', 'average', 'percent')
+    __slots__ = FIELDS
+
+    @classmethod
+    def from_payload(cls, payload):
+        positions = payload.get('positions') or []
+        return cls(playerId=payload.get('playerId'), matchId=payload.get('matchId'), competitionId=payload.get('competitionId'),
+                   seasonId=payload.get('seasonId'), roundId=payload.get('roundId'),
+                   positions=tuple(p.get('position', {}).get('code', p) if isinstance(p, dict) else p for p in positions),
+                   total=_metrics(payload.get('total')), average=_metrics(payload.get('average')),
+                   percent=_metrics(payload.get('percent')))
+
+
+class PhysicalData(_Record):
+    """
+    Physical data of a player in a match: the ids, and every other scalar field as Metrics
+    (nested objects flattened with dotted names).
+    """
+
+    FIELDS = ('playerId', 'matchId', 'teamId', 'period', 'values')
+    __slots__ = FIELDS
+    IDS = ('playerId', 'matchId', 'teamId', 'period')
+
+    @classmethod
+    def from_payload(cls, payload):
+        values = {}
+        for key, value in payload.items():
+            if key in cls.IDS:
+                continue
+            if isinstance(value, dict):
+                for sub, sub_value in value.items():
+                    if not isinstance(sub_value, (dict, list)):
+                        values[f'{key}.{sub}'] = sub_value
+            elif not isinstance(value, list):
+                values[key] = value
+        return cls(playerId=payload.get('playerId'), matchId=payload.get('matchId'), teamId=payload.get('teamId'),
+                   period=payload.get('period'), values=Metrics(values))
+
+
+class Event(_Record):
+    FIELDS = ('id', 'matchId', 'type', 'secondary', 'period', 'minute', 'second', 'x', 'y', 'playerId', 'teamId',
+              'opponentTeamId', 'possessionId')
+    __slots__ = FIELDS
+
+    @classmethod
+    def from_payload(cls, payload):
+        event_type = payload.get('type') or {}
+        x, y = _event_location(payload)
+        return cls(id=payload.get('id'), matchId=payload.get('matchId'),
+                   type=event_type.get('name', event_type.get('primary')) if isinstance(event_type, dict) else event_type,
+                   secondary=tuple(event_type.get('secondary') or ()) if isinstance(event_type, dict) else (),
+                   period=payload.get('period', payload.get('matchPeriod')), minute=payload.get('minute'),
+                   second=payload.get('second'), x=x, y=y, playerId=_nested_id(payload, 'playerId', 'player'),
+                   teamId=_nested_id(payload, 'teamId', 'team'), opponentTeamId=_nested_id(payload, 'opponentTeamId', 'opponentTeam'),
+                   possessionId=(payload.get('possession') or {}).get('id'))
+
+
+# kind -> (record type, True if a payload holds a list of records)
+RECORD_KINDS = {
+    'match': (Match, False),
+    'matches': (Match, True),
+    'team': (Team, False),
+    'player': (Player, False),
+    'player_match_stats': (PlayerMatchStats, True),
+    'player_stats': (PlayerMatchStats, False),
+    'physical_data': (PhysicalData, True),
+    'events': (Event, True),
+}
+
+
+def parse_records(kind, payload):
+    """
+    Builds the typed records of an API payload.
+
+        stats = parse_records('player_match_stats', get_all_players_match_advanced_stats(matchId))
+        stats[0].total.goals
+
+    The match, player stats, physical data and events getters and their download_* functions
+    also take typed=True to return the records directly.
+
+    Parameters:
+    - kind (str): One of RECORD_KINDS: 'match' (match details), 'matches' (season matches list),
+      'team', 'player', 'player_match_stats' (all the players of a match), 'player_stats' (one player
+      of a match), 'physical_data', 'events'.
+    - payload: The decoded json (-1 is returned as is).
+
+    Returns:
+    - The record, or the list of records for the list kinds.
+    """
+    if isinstance(payload, int) and payload == -1:
+        return payload
+    cls, many = RECORD_KINDS[kind]
+    if not many:
+        return cls.from_payload(payload)
+    if kind == 'events':
+        items = _match_events_list(payload)
+    elif kind == 'matches' and isinstance(payload, dict):
+        items = payload.get('matches', [])
+    elif isinstance(payload, dict):
+        items = _payload_records(kind, payload)
+    else:
+        items = payload
+    return [cls.from_payload(item) for item in items if isinstance(item, dict)]
+
+
+def records_to_frame(records):
+    """
+    Converts typed records (or lists of records, e.g. one per match) to a DataFrame, one column per
+    field. Metrics fields are expanded into dotted columns ('total.goals'), like pd.json_normalize does.
+    """
+    flat = []
+    for record in records:
+        if isinstance(record, list):
+            flat.extend(record)
+        elif isinstance(record, _Record):
+            flat.append(record)
+    if not flat:
+        return pd.DataFrame()
+
+    columns = {}
+    for field in type(flat[0]).FIELDS:
+        values = [getattr(record, field) for record in flat]
+        groups = [value for value in values if value is not None]
+        if groups and isinstance(groups[0], Metrics):
+            prefix = '' if field == 'values' else f'{field}.'
+            schemas = {id(group._index): group._index for group in groups}
+            names = list(dict.fromkeys(name for index in schemas.values() for name in index))
+            for name in names:
+                columns[prefix + name] = [None if value is None else value.get(name) for value in values]
+        else:
+            columns[field] = values
+    return pd.DataFrame(columns)
+
+
+#MARK: Flattening
+# Ids are nullable integers, every other number is float64 (a metric can be 100 in one payload
+# and 66.7 in the next, so inferring int from the first value gives unstable dtypes)
+ID_COLUMNS_PATTERN = r'(^|\.)(id|[a-z][a-zA-Z]*Id)$'
+
+
+class Flattener:
+    """
+    Flattens a list of payloads of one endpoint into a DataFrame with dotted column names, like
+    pd.json_normalize, in a single pass that fills preallocated NumPy columns.
+
+    The schema of the known columns and rules is compiled once: the known columns are always in
+    the output, in order, with fixed dtypes. The other columns found in the payloads are added for
+    the current call only, with the dtype of the first matching rule ('float64' for numbers,
+    'boolean', 'object' otherwise), so the schema doesn't grow with every payload ever seen.
+    A value that doesn't fit its column (e.g. a string in a float column) turns the column into
+    'object' for the call. Missing keys are missing values (NaN / <NA> / None), lists are kept as is,
+    and the -1 of the failed downloads are skipped (their count is in df.attrs['failed']).
+
+    Parameters:
+    - columns (dict, optional): Known columns, dotted path -> dtype ('Int64', 'float64', 'boolean', 'object').
+    - rules (list, optional): (regex on the dotted path, dtype) pairs for the columns found in the payloads.
+    """
+
+    def __init__(self, columns=None, rules=()):
+        self.rules = [(re.compile(pattern), dtype) for pattern, dtype in rules]
+        self.paths = []
+        self.dtypes = []
+        # Nested dicts mirroring the payloads, the leaves are column indexes (None holds the
+        # column of a key found both as a scalar and as an object)
+        self._tree = {}
+        for path, dtype in (columns or {}).items():
+            self._column(tuple(path.split('.')), None, dtype)
+
+    def _copy(self):
+        # Working schema of one call, the columns it learns are dropped with it
+        def copy_tree(node):
+            return {key: copy_tree(child) if isinstance(child, dict) else child for key, child in node.items()}
+
+        flattener = Flattener.__new__(Flattener)
+        flattener.rules = self.rules
+        flattener.paths = list(self.paths)
+        flattener.dtypes = list(self.dtypes)
+        flattener._tree = copy_tree(self._tree)
+        return flattener
+
+    def _column(self, parts, value, dtype=None):
+        node = self._tree
+        for part in parts[:-1]:
+            child = node.get(part)
+            if not isinstance(child, dict):
+                child = node[part] = {} if child is None else {None: child}
+            node = child
+        path = '.'.join(str(part) for part in parts)
+        if dtype is None:
+            dtype = next((rule_dtype for pattern, rule_dtype in self.rules if pattern.search(path)), None)
+        if dtype is None:
+            if isinstance(value, bool):
+                dtype = 'boolean'
+            elif isinstance(value, (int, float)):
+                dtype = 'float64'
+            else:
+                dtype = 'object'
+        index = len(self.paths)
+        self.paths.append(path)
+        self.dtypes.append(dtype)
+        existing = node.get(parts[-1])
+        if isinstance(existing, dict):
+            existing[None] = index
+        else:
+            node[parts[-1]] = index
+        return index
+
+    def _allocate(self, index, n):
+        dtype = self.dtypes[index]
+        if dtype == 'float64':
+            return np.full(n, np.nan), None
+        if dtype == 'Int64':
+            return np.zeros(n, dtype=np.int64), np.ones(n, dtype=bool)
+        if dtype == 'boolean':
+            return np.zeros(n, dtype=bool), np.ones(n, dtype=bool)
+        return np.full(n, None, dtype=object), None
+
+    def _demote(self, index, columns):
+        # The column becomes object, the values already written are kept
+        values, mask = columns[index]
+        if mask is not None:
+            data = values.astype(object)
+            data[mask] = None
+        else:
+            data = values.astype(object)
+            data[pd.isna(values)] = None
+        self.dtypes[index] = 'object'
+        columns[index] = (data, None)
+
+    def _set(self, index, row, value, columns):
+        values, mask = columns[index]
+        dtype = self.dtypes[index]
+        if dtype == 'float64':
+            if isinstance(value, (int, float)):
+                values[row] = value
+                return
+        elif dtype == 'Int64':
+            if type(value) is int or (type(value) is float and value.is_integer()):
+                values[row] = value
+                mask[row] = False
+                return
+        elif dtype == 'boolean':
+            if type(value) is bool:
+                values[row] = value
+                mask[row] = False
+                return
+        else:
+            values[row] = value
+            return
+        self._demote(index, columns)
+        columns[index][0][row] = value
+
+    def _fill(self, node, payload, parts, row, n, columns):
+        dtypes = self.dtypes
+        for key, value in payload.items():
+            child = node.get(key)
+            if type(child) is int:
+                # Known column: the common cases inline, the rest (and the mismatches) in _set
+                if value is None:
+                    continue
+                if dtypes[child] == 'float64' and (type(value) is float or type(value) is int):
+                    columns[child][0][row] = value
+                else:
+                    self._set(child, row, value, columns)
+                continue
+
+            if value is None or (isinstance(value, dict) and not value):
+                continue
+            if isinstance(value, dict):
+                if child is None:
+                    child = node[key] = {}
+                self._fill(child, value, parts + (key,), row, n, columns)
+                continue
+            index = child.get(None) if child is not None else None
+            if index is None:
+                index = self._column(parts + (key,), value)
+                columns.extend(self._allocate(i, n) for i in range(len(columns), index + 1))
+            self._set(index, row, value, columns)
+
+    def __call__(self, payloads):
+        payloads = list(payloads)
+        records = [p for p in payloads if isinstance(p, dict)]
+        schema = self._copy()
+        n = len(records)
+        columns = [schema._allocate(index, n) for index in range(len(schema.paths))]
+        for row, record in enumerate(records):
+            schema._fill(schema._tree, record, (), row, n, columns)
+
+        data = {}
+        for index, (values, mask) in enumerate(columns):
+            dtype = schema.dtypes[index]
+            if dtype == 'Int64':
+                values = pd.arrays.IntegerArray(values, mask)
+            elif dtype == 'boolean':
+                values = pd.arrays.BooleanArray(values, mask)
+            data[schema.paths[index]] = values
+
+        df = pd.DataFrame(data, index=pd.RangeIndex(n))
+        df.attrs['failed'] = len(payloads) - n
+        return df
+
+
+FLATTENERS = {
+    'player_season_stats': Flattener(
+        columns={'playerId': 'Int64', 'competitionId': 'Int64', 'seasonId': 'Int64', 'positions': 'object'},
+        rules=[(r'^(total|average|percent)\.', 'float64'), (ID_COLUMNS_PATTERN, 'Int64'),
+               (r'^player\.(height|weight)$', 'float64')]),
+    'match_details': Flattener(
+        columns={'wyId': 'Int64', 'label': 'object', 'date': 'object', 'dateutc': 'object', 'status': 'object',
+                 'duration': 'object', 'winner': 'Int64', 'competitionId': 'Int64', 'seasonId': 'Int64',
+                 'roundId': 'Int64', 'gameweek': 'Int64'},
+        rules=[(ID_COLUMNS_PATTERN, 'Int64'), (r'(^|\.)(score\w*|gameweek)$', 'Int64')]),
+}
+
+
+def flatten(kind, payloads):
+    """
+    Flattens the payloads of one kind of data (a key of FLATTENERS) into a DataFrame, see Flattener.
+    """
+    return FLATTENERS[kind](payloads)
+
+
+#MARK: Projection
+# Top-level objects that /matches/{id} adds with details=...
+MATCH_DETAILS = ('coaches', 'players', 'teams', 'competition', 'round', 'season')
+
+# exclude=... token of /matches/{id}/events -> field names it removes from each event
+EVENT_EXCLUDES = {
+    'possessions': ('possession',),
+    'names': ('name', 'shortName', 'officialName', 'firstName', 'lastName'),
+    'positions': ('position',),
+    'formations': ('formation',),
+}
+
+
+class Projection:
+    """
+    Fields needed per kind of data, as dotted paths relative to each record. The downloaders
+    translate them into the narrowest server-side parameters (exclude/details/fetch) and strip
+    every other key as soon as each response is parsed, in the worker thread.
+
+        projection = Projection(events=['type.primary', 'player.id', 'team.id', 'location', 'minute'],
+                                player_season_stats=['playerId', 'total.goals', 'total.minutesOnField'])
+        download_match_events(seasonId, projection=projection)
+
+    Kinds: 'events' (each event), 'player_season_stats', 'match_details', 'match_advanced_stats',
+    'player_match_stats' (each player), 'formations', 'physical_data', 'team_details'.
+    Kinds without fields are downloaded and returned in full. When a kind has fields, its
+    server-side parameters are derived from them and replace the downloader's own details/exclude.
+
+    Parameters:
+    - fields: kind -> list of dotted paths. A path keeps its whole subtree (e.g. 'location').
+    """
+
+    def __init__(self, **fields):
+        self.fields = {kind: list(paths) for kind, paths in fields.items()}
+        self._trees = {kind: self._tree(paths) for kind, paths in self.fields.items()}
+
+    @staticmethod
+    def _tree(paths):
+        tree = {}
+        for path in paths:
+            node = tree
+            parts = path.split('.')
+            for part in parts[:-1]:
+                child = node.setdefault(part, {})
+                if child is True:
+                    break
+                node = child
+            else:
+                node[parts[-1]] = True
+        return tree
+
+    def _segments(self, kind):
+        return {segment for path in self.fields.get(kind, []) for segment in path.split('.')}
+
+    def params(self, kind):
+        """
+        Returns the narrowest query parameters for the kind, or None if the kind has no fields.
+        """
+        if kind not in self.fields:
+            return None
+        segments = self._segments(kind)
+        roots = {path.split('.')[0] for path in self.fields[kind]}
+
+        if kind == 'events':
+            exclude = [token for token, names in EVENT_EXCLUDES.items() if not segments & set(names)]
+            return {'fetch': [], 'details': [], 'exclude': exclude}
+        if kind == 'player_season_stats':
+            return {'details': ['player'] if 'player' in roots else []}
+        if kind == 'match_details':
+            return {'details': [detail for detail in MATCH_DETAILS if detail in roots]}
+        return {}
+
+    def prune(self, kind, payload):
+        """
+        Keeps only the fields of the kind in payload (lists are pruned element by element).
+        """
+        tree = self._trees.get(kind)
+        if tree is None or (isinstance(payload, int) and payload == -1):
+            return payload
+        if kind == 'events':
+            events = [_prune(event, tree) for event in _match_events_list(payload)]
+            return {'elements': [{'events': events}]} if isinstance(payload, dict) and payload.get('elements') else {'events': events}
+        return _prune(payload, tree)
+
+
+def _prune(value, tree):
+    if tree is True:
+        return value
+    if isinstance(value, list):
+        return [_prune(v, tree) for v in value]
+    if isinstance(value, dict):
+        return {k: _prune(value[k], sub) for k, sub in tree.items() if k in value}
+    return value
+
+
+def _as_projection(projection):
+    # Journals store the projection fields as a plain dict
+    if projection is None or isinstance(projection, Projection):
+        return projection
+    return Projection(**projection)
+
+
+def _projected(fn, projection, kind):
+    if projection is None or kind not in projection.fields:
+        return fn
+    return lambda key: projection.prune(kind, fn(key))
+
+
+#MARK: Checkpoints
+class DownloadJournal:
+    """
+    Append-only json-lines checkpoint of a download_* run (or of the matching iter_* run).
+
+    The first line records the downloader and its arguments, then one line is appended for every
+    completed or failed id (with the downloaded payload, unless store_results=False). If the run
+    crashes or is interrupted, resume_download re-issues only the ids that are missing or failed.
+    Only the completed and failed ids are kept in memory, the stored payloads are read back from
+    the file when a run is resumed.
+
+    Parameters:
+    - path (str or None): The journal file, appended to if it exists. None keeps the journal in memory
+      (useful just to collect the failures).
+    - store_results (bool, optional): Store the payloads, so a resumed run returns every result
+      (default is True). Set it to False when the results are already saved elsewhere (e.g. by a sink).
+    """
+
+    def __init__(self, path, store_results=True):
+        self.path = osp.expanduser(path) if path else None
+        self.store_results = store_results
+        self.run = None
+
+        self._completed = set()
+        self._failures = {}
+        # Payloads of an in-memory journal (path=None), which has no file to read them back from
+        self._results = {}
+        self._lock = threading.Lock()
+
+        if self.path and osp.exists(self.path):
+            with open(self.path) as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # Last line cut by a crash
+                        continue
+                    self._load(entry)
+
+    def _load(self, entry):
+        if 'run' in entry:
+            self.run = entry
+        elif entry['ok']:
+            self._failures.pop(entry['key'], None)
+            self._completed.add(entry['key'])
+            if self.path is None:
+                self._results[entry['key']] = entry.get('result')
+        else:
+            self._completed.discard(entry['key'])
+            self._failures[entry['key']] = {k: v for k, v in entry.items() if k != 'ok'}
+
+    def _append(self, entry):
+        with self._lock:
+            self._load(entry)
+            if self.path:
+                directory = osp.dirname(self.path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                with open(self.path, 'a') as f:
+                    f.write(json.dumps(entry, separators=(',', ':')) + '\n')
+
+    def start(self, name, args):
+        """
+        Records the downloader and its arguments, or checks that they match the journal being resumed.
+        """
+        if self.run is None:
+            self._append({'run': name, 'args': args, 'started_at': time.time()})
+        elif self.run['run'] != name:
+            raise ValueError(f'{self.path} is the journal of {self.run["run"]}, not {name}')
+
+    def record(self, key, result):
+        if isinstance(result, int) and result == -1:
+            self._append({'key': key, 'ok': False, 'error_type': 'APIError', 'error': 'The API returned an error (-1)', 'at': time.time()})
+        else:
+            self._append({'key': key, 'ok': True, 'result': result if self.store_results else None, 'at': time.time()})
+
+    def record_failure(self, key, error):
+        self._append({'key': key, 'ok': False, 'error_type': type(error).__name__, 'error': str(error),
+                      'status_code': getattr(error, 'status_code', None), 'at': time.time()})
+
+    def pending(self, keys):
+        """
+        Returns the keys that are not completed yet (never tried or failed).
+        """
+        return [key for key in keys if key not in self._completed]
+
+    def completed_items(self, keys):
+        """
+        Yields the (key, result) pairs of the completed keys, if the results are stored, reading
+        them back from the journal file one at a time.
+        """
+        if not self.store_results:
+            return
+        wanted = {key for key in keys if key in self._completed}
+        if self.path is None:
+            yield from ((key, self._results[key]) for key in keys if key in wanted)
+            return
+        if not wanted:
+            return
+        with open(self.path) as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                if entry.get('ok') and entry['key'] in wanted:
+                    wanted.discard(entry['key'])
+                    yield entry['key'], entry.get('result')
+
+    def failures(self):
+        """
+        Returns the ids whose last attempt failed, as a list of dicts with key, error_type, error,
+        status_code and time of the failure.
+        """
+        return list(self._failures.values())
+
+
+def _open_journal(journal, name, args):
+    if journal is None:
+        return None
+    if not isinstance(journal, DownloadJournal):
+        journal = DownloadJournal(journal)
+    # max_pending only exists on the iter_* functions, resume_download calls the download_* ones
+    journal.start(name, {k: (v.fields if isinstance(v, Projection) else v) for k, v in args.items() if k not in ('journal', 'max_pending')})
+    return journal
+
+
+# The functions a journal can be resumed with (resume_download never runs another name read from a file)
+RESUMABLE_DOWNLOADERS = ('download_advanced_stats', 'download_match_details', 'download_match_formations',
+                         'download_match_advance_stats', 'download_players_match_advance_stats',
+                         'download_players_matches_advance_stats', 'download_all_players_match_advance_stats',
+                         'download_all_players_match_physical_data', 'download_team_details', 'download_match_events',
+                         'pull_season')
+
+
+def resume_download(journal, **overrides):
+    """
+    Resumes an interrupted or partially failed download_* run from its journal: the ids already
+    completed are read back from the journal, only the missing and failed ones are downloaded.
+
+        matches = download_all_players_match_physical_data(seasonId, journal='physical_188994.jsonl')
+        # ... crash at 90% ...
+        matches = resume_download('physical_188994.jsonl')
+        failed = DownloadJournal('physical_188994.jsonl').failures()
+
+    Parameters:
+    - journal (str or DownloadJournal): The journal of the run.
+    - overrides: Arguments to change for the resumed run (e.g. n_jobs).
+
+    Returns:
+    - The same output as the original download_* call.
+    """
+    if not isinstance(journal, DownloadJournal):
+        journal = DownloadJournal(journal)
+    if journal.run is None:
+        raise ValueError(f'{journal.path} is not the journal of a download run')
+    if journal.run['run'] not in RESUMABLE_DOWNLOADERS:
+        raise ValueError(f'{journal.path} is the journal of {journal.run["run"]!r}, which can not be resumed '
+                         f'(expected one of {list(RESUMABLE_DOWNLOADERS)})')
+    downloader = globals()[journal.run['run']]
+    return downloader(**dict(journal.run['args'], **overrides), journal=journal)
+
+
+#MARK: Downloader
+def _iter_download(fn, keys, n_jobs, desc, what, max_pending=None, journal=None):
+    """
+    Runs fn(key) for every key on the shared IOExecutor and yields (key, result) as soon as each call completes.
+
+    At most max_pending calls are submitted ahead of the consumer (default is 2 * n_jobs), so workers
+    keep downloading while the consumer handles a result, and memory stays flat however many keys
+    there are. How many of them run at the same time is bounded by the global budget of the executor
+    (IOExecutor.max_workers). Failed calls are printed and skipped. Closing the generator early
+    cancels the pending calls.
+
+    With a DownloadJournal, the keys already completed in the journal are not downloaded again (their
+    stored results are yielded first) and every success or failure is appended to the journal; the
+    failures are then reported by the journal instead of being printed.
+
+    The requests of the run are collected in a MetricsAggregator, see last_run_metrics.
+    """
+    global _last_run_metrics
+    keys = list(keys)
+    max_pending = max_pending or 2 * n_jobs
+
+    if journal is not None:
+        for key, result in journal.completed_items(keys):
+            yield key, result
+        keys = journal.pending(keys)
+
+    # One pooled connection per worker of the executor
+    if not _replaying():
+        get_client(pool_size=get_io_executor().max_workers)
+
+    metrics = MetricsAggregator()
+
+    def run(key):
+        previous, _metrics_run.aggregator = getattr(_metrics_run, 'aggregator', None), metrics
+        try:
+            return fn(key)
+        finally:
+            _metrics_run.aggregator = previous
+
+    try:
+        with tqdm(total=len(keys), desc=desc) as pbar:
+            for key, future in _run_bounded(run, keys, max_pending):
+                pbar.update(1)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    # With a journal the failure is recorded there, see DownloadJournal.failures
+                    if journal is not None:
+                        journal.record_failure(key, e)
+                    else:
+                        print(f"Error fetching {what}: {type(e).__name__}\n{e}")  # Gestione degli errori
+                    continue
+                if journal is not None:
+                    journal.record(key, result)
+                yield key, result
+    finally:
+        # Also when the consumer stops early (break or close() of an iter_* generator)
+        _last_run_metrics = metrics.summary()
+
+
+def _season_matches(seasonId, matches_list):
+    if not matches_list:
+        matches_list = get_matches_list_by_season(seasonId=seasonId)['matches']
+        matches_list = [int(m['matchId']) for m in matches_list]
+    return matches_list
+
+
+def iter_advanced_stats(compId, seasonId, player_list=[], details=['player'], version='v3', n_jobs=3, max_pending=None, journal=None, projection=None):
+    """
+    Streaming version of download_advanced_stats: yields (playerId, stats) as each download completes.
+    """
+    journal = _open_journal(journal, 'download_advanced_stats', locals())
+    if not player_list:
+        player_list = get_players_list_by_season(seasonId=seasonId)
+        player_list = [int(p['wyId']) for p in player_list]
+
+    projection = _as_projection(projection)
+    details = (projection and projection.params('player_season_stats') or {}).get('details', details)
+    fn = lambda playerId: get_advanced_stats_season(playerId, compId, seasonId, details, version)
+
+    yield from _iter_download(_projected(fn, projection, 'player_season_stats'),
+                              player_list, n_jobs, f'Downloading advanced stats for players comp: {compId}, season: {seasonId}',
+                              'stats', max_pending=max_pending, journal=journal)
+
+
+def download_advanced_stats(compId, seasonId, player_list=[], details = ['player'], version='v3', n_jobs=3, journal=None, projection=None):
+    journal = _open_journal(journal, 'download_advanced_stats', locals())
+
+    players_stats = [stats for _, stats in iter_advanced_stats(compId, seasonId, player_list, details, version, n_jobs, journal=journal, projection=projection)]
+
+    players_stats = flatten('player_season_stats', players_stats)
+    
+    return players_stats
+
+
+def iter_match_details(seasonId, matches_list=[], useSides=False, details=[], version='v3', n_jobs=5, max_pending=None, journal=None, projection=None):
+    """
+    Streaming version of download_match_details: yields (matchId, details) as each download completes.
+    """
+    journal = _open_journal(journal, 'download_match_details', locals())
+    matches_list = _season_matches(seasonId, matches_list)
+
+    projection = _as_projection(projection)
+    details = (projection and projection.params('match_details') or {}).get('details', details)
+    fn = lambda matchId: get_match_details(matchId, useSides, details, version)
+
+    yield from _iter_download(_projected(fn, projection, 'match_details'),
+                              matches_list, n_jobs, f'Downloading matches details season: {seasonId}',
+                              'match details', max_pending=max_pending, journal=journal)
+
+
+def download_match_details(seasonId, matches_list=[], useSides=False, details=[], version='v3', to_df=False, with_matchId_keys=False, n_jobs=5, journal=None, projection=None, typed=False):
+    journal = _open_journal(journal, 'download_match_details', locals())
+
+    matches_details = []
+    for matchId, match_details in iter_match_details(seasonId, matches_list, useSides, details, version, n_jobs, journal=journal, projection=projection):
+        if typed:
+            match_details = parse_records('match', match_details)
+        matches_details.append({matchId: match_details} if with_matchId_keys else match_details)
+
+    if to_df:
+        # The DataFrame has a row per match whatever with_matchId_keys, the matchId is in wyId
+        payloads = [next(iter(d.values())) for d in matches_details] if with_matchId_keys else matches_details
+        matches_details = records_to_frame(payloads) if typed else flatten('match_details', payloads)
+        
+    return matches_details
+
+
+def iter_match_formations(seasonId, matches_list=[], version='v3', n_jobs=3, max_pending=None, journal=None, projection=None):
+    """
+    Streaming version of download_match_formations: yields (matchId, formations) as each download completes.
+    """
+    journal = _open_journal(journal, 'download_match_formations', locals())
+    matches_list = _season_matches(seasonId, matches_list)
+
+    fn = lambda matchId: get_match_formations(matchId, version=version)
+
+    yield from _iter_download(_projected(fn, _as_projection(projection), 'formations'),
+                              matches_list, n_jobs, f'Downloading matches formations for season: {seasonId}',
+                              'match formations', max_pending=max_pending, journal=journal)
+
+
+def download_match_formations(seasonId, matches_list=[], version='v3', with_matchId_keys=False, n_jobs=3, journal=None, projection=None):
+    journal = _open_journal(journal, 'download_match_formations', locals())
+
+    matches_formations = []
+    for matchId, formations in iter_match_formations(seasonId, matches_list, version, n_jobs, journal=journal, projection=projection):
+        matches_formations.append({matchId: formations} if with_matchId_keys else formations)
+
+    return matches_formations
+
+
+def iter_match_advance_stats(seasonId, matches_list=[], version='v3', n_jobs=5, max_pending=None, journal=None, projection=None):
+    """
+    Streaming version of download_match_advance_stats: yields (matchId, stats) as each download completes.
+    """
+    journal = _open_journal(journal, 'download_match_advance_stats', locals())
+    matches_list = _season_matches(seasonId, matches_list)
+
+    fn = lambda matchId: get_match_advance_stats(matchId, version)
+
+    yield from _iter_download(_projected(fn, _as_projection(projection), 'match_advanced_stats'),
+                              matches_list, n_jobs, f'Downloading matches advanced stats for season: {seasonId}',
+                              'match advanced stats', max_pending=max_pending, journal=journal)
+
+
+def download_match_advance_stats(seasonId, matches_list=[], with_matchId_keys=False, version='v3', n_jobs=5, journal=None, projection=None):
+    journal = _open_journal(journal, 'download_match_advance_stats', locals())
+    
+    matches_adv_stats = []
+    for matchId, stats in iter_match_advance_stats(seasonId, matches_list, version, n_jobs, journal=journal, projection=projection):
+        matches_adv_stats.append({matchId: stats} if with_matchId_keys else stats)
+
+    return matches_adv_stats
+
+
+def iter_players_match_advance_stats(players, matchId, version='v3', n_jobs=5, max_pending=None, journal=None, projection=None):
+    """
+    Streaming version of download_players_match_advance_stats: yields (playerId, stats) of each player.
+    The players are fetched with one call to the match-level endpoint (see iter_players_matches_advance_stats).
+    """
+    journal = _open_journal(journal, 'download_players_match_advance_stats', locals())
+    pairs = [(player['wyId'], matchId) for player in players]
+    for (playerId, _), stats in _iter_players_matches_advance_stats(pairs, version, n_jobs, max_pending, journal, projection):
+        yield playerId, stats
 
-    # Make an API call to get the match events
-    return call_api(url=url, params=params if params else None)
 
+def download_players_match_advance_stats(players, matchId, version='v3', n_jobs = 5, journal=None, projection=None, typed=False):
+    journal = _open_journal(journal, 'download_players_match_advance_stats', locals())
 
-def get_match_events_by_type(matchId, eventType, version='v3', fetch=[], details=[]):
+    players_stats = iter_players_match_advance_stats(players, matchId, version, n_jobs, journal=journal, projection=projection)
+    if typed:
+        return [parse_records('player_stats', stats) for _, stats in players_stats]
+    return [stats for _, stats in players_stats]
+
+
+def plan_players_match_advance_stats(pairs, min_bulk_players=2):
     """
-    Function to retrieve specific type of events for a match using the Wyscout API.
-    Note: This function fetches all events and filters by type client-side since the API doesn't support eventType parameter.
+    Groups the requested (playerId, matchId) pairs by match and picks the endpoint of each match:
+    the match-level /matches/{matchId}/advancedstats/players endpoint returns every player of the
+    match in one call, so it is used as soon as at least min_bulk_players players of the match are
+    requested. The other matches use the per-player endpoint (one call either way, with a smaller payload).
 
     Parameters:
-    - matchId (int): The identifier of the match for which events are requested.
-    - eventType (str): The type of events to retrieve (e.g., 'shot', 'pass', 'duel', 'foul').
-    - version (str, optional): The API version to use (default is 'v3').
-    - fetch (list, optional): List of related objects to be fetched (e.g., ['teams', 'players']).
-    - details (list, optional): List of related objects to be detailed (e.g., ['tag']).
+    - pairs (iterable): The (playerId, matchId) pairs.
+    - min_bulk_players (int, optional): Players of a match needed to use the match-level endpoint (default is 2).
 
     Returns:
-    - Returns the filtered events for the specified match obtained from the Wyscout API.
+    - dict: matchId -> (use_bulk, [playerId, ...]), the players in request order without duplicates.
     """
-    # Get all events first
-    all_events = get_match_events(matchId=matchId, version=version, fetch=fetch, details=details)
-    
-    if all_events == -1:
-        return -1
-    
-    # Extract events from the elements array
-    elements = all_events.get('elements', [])
-    if not elements:
-        return {'events': []}
-    
-    events_data = elements[0].get('events', [])
-    filtered_events = [event for event in events_data if event.get('type', {}).get('name') == eventType]
-    
-    return {'events': filtered_events}
+    players_by_match = {}
+    for playerId, matchId in pairs:
+        players = players_by_match.setdefault(int(matchId), [])
+        if int(playerId) not in players:
+            players.append(int(playerId))
+    return {matchId: (len(players) >= min_bulk_players, players) for matchId, players in players_by_match.items()}
+
+
+def _players_match_advance_stats_batch(matchId, use_bulk, players, version, prune=None):
+    stats = {}
+    if use_bulk:
+        url, params = _all_players_match_advanced_stats_request(matchId, version=version)
+        try:
+            response_json = call_api(url=url, params=params)
+        except Exception as e:
+            print(f"Error fetching match {matchId} players advanced stats: {type(e).__name__}\n{e}")  # Gestione degli errori
+            response_json = -1
+        if isinstance(response_json, dict):
+            wanted = set(players)
+            for player_stats in response_json.get('players', []):
+                if player_stats.get('playerId') in wanted:
+                    stats[player_stats['playerId']] = player_stats
+
+    # Fallback for the players the match-level endpoint didn't return (or if it failed),
+    # every requested player gets an entry, -1 if its call fails too
+    for playerId in players:
+        if playerId not in stats:
+            try:
+                stats[playerId] = get_players_match_advanced_stats(playerId, matchId=matchId, version=version)
+            except Exception as e:
+                print(f"Error fetching player {playerId} match {matchId} advanced stats: {type(e).__name__}\n{e}")  # Gestione degli errori
+                stats[playerId] = -1
+
+    if prune is not None:
+        stats = {playerId: player_stats if isinstance(player_stats, int) and player_stats == -1 else prune(player_stats)
+                 for playerId, player_stats in stats.items()}
+    return [[playerId, stats[playerId]] for playerId in players]
+
+
+def iter_players_matches_advance_stats(pairs, version='v3', n_jobs=3, max_pending=None, journal=None, projection=None, min_bulk_players=2):
+    """
+    Streaming version of download_players_matches_advance_stats: yields ((playerId, matchId), stats)
+    for every requested pair, a match at a time as each match completes.
+    """
+    journal = _open_journal(journal, 'download_players_matches_advance_stats', locals())
+    yield from _iter_players_matches_advance_stats(pairs, version, n_jobs, max_pending, journal, projection, min_bulk_players)
 
 
-def get_player_match_events(playerId, matchId, version='v3', fetch=[], details=[]):
+def _iter_players_matches_advance_stats(pairs, version, n_jobs, max_pending, journal, projection, min_bulk_players=2):
+    plan = plan_players_match_advance_stats(pairs, min_bulk_players=min_bulk_players)
+
+    projection = _as_projection(projection)
+    prune = (lambda stats: projection.prune('player_match_stats', stats)) if projection is not None and 'player_match_stats' in projection.fields else None
+    fn = lambda matchId: _players_match_advance_stats_batch(matchId, *plan[matchId], version, prune)
+
+    bulk_matches = sum(use_bulk for use_bulk, _ in plan.values())
+    for matchId, players_stats in _iter_download(fn, list(plan), n_jobs, f'Downloading players match advanced stats ({bulk_matches}/{len(plan)} matches in bulk)',
+                                                 'players match advanced stats', max_pending=max_pending, journal=journal):
+        for playerId, stats in players_stats:
+            yield (playerId, matchId), stats
+
+
+def download_players_matches_advance_stats(pairs, version='v3', n_jobs=3, journal=None, projection=None, min_bulk_players=2):
     """
-    Function to retrieve events for a specific player in a match using the Wyscout API.
-    Note: This function fetches all events and filters by player client-side since the API doesn't support playerId parameter.
+    Downloads the advanced stats of many (player, match) pairs with as few calls as possible: the pairs
+    are grouped by match and each match is fetched with one call to the match-level endpoint, then
+    split back per player (see plan_players_match_advance_stats). Per-player calls are made only for
+    the players missing from the match-level response, or when the match-level call fails.
+
+        stats = download_players_matches_advance_stats([(playerId, matchId) for matchId in matches])
+        stats[(playerId, matchId)]['total']['goals']
 
     Parameters:
-    - playerId (int): The identifier of the player for which events are requested.
-    - matchId (int): The identifier of the match for which events are requested.
+    - pairs (iterable): The (playerId, matchId) pairs.
     - version (str, optional): The API version to use (default is 'v3').
-    - fetch (list, optional): List of related objects to be fetched (e.g., ['teams', 'players']).
-    - details (list, optional): List of related objects to be detailed (e.g., ['tag']).
+    - n_jobs (int, optional): Up to 2 * n_jobs matches are downloaded ahead (default is 3).
+    - journal (str or DownloadJournal, optional): Checkpoint of the run, one entry per match.
+    - projection (Projection, optional): Fields to keep ('player_match_stats').
+    - min_bulk_players (int, optional): Players of a match needed to use the match-level endpoint (default is 2).
 
     Returns:
-    - Returns the events for the specified player in the match obtained from the Wyscout API.
+    - dict: (playerId, matchId) -> stats (-1 for the pairs whose download failed).
     """
-    # Get all events first
-    all_events = get_match_events(matchId=matchId, version=version, fetch=fetch, details=details)
-    
-    if all_events == -1:
-        return -1
-    
-    # Extract events from the elements array
-    elements = all_events.get('elements', [])
-    if not elements:
-        return {'events': []}
-    
-    events_data = elements[0].get('events', [])
-    filtered_events = [event for event in events_data if event.get('playerId') == playerId]
-    
-    return {'events': filtered_events}
+    pairs = [tuple(pair) for pair in pairs]
+    journal = _open_journal(journal, 'download_players_matches_advance_stats', locals())
 
+    return dict(iter_players_matches_advance_stats(pairs, version, n_jobs, journal=journal, projection=projection, min_bulk_players=min_bulk_players))
 
-def get_match_events_summary(matchId, version='v3'):
+
+def iter_all_players_match_advance_stats(seasonId, matches_list=[], version='v3', n_jobs=3, max_pending=None, journal=None, projection=None):
     """
-    Function to retrieve a summary of events for a match using the Wyscout API.
+    Streaming version of download_all_players_match_advance_stats: yields (matchId, players stats) as each download completes.
+    """
+    journal = _open_journal(journal, 'download_all_players_match_advance_stats', locals())
+    matches_list = _season_matches(seasonId, matches_list)
 
-    Parameters:
-    - matchId (int): The identifier of the match for which events are requested.
-    - version (str, optional): The API version to use (default is 'v3').
+    fn = lambda matchId: get_all_players_match_advanced_stats(matchId, version=version)
 
-    Returns:
-    - Returns a summary of events for the specified match obtained from the Wyscout API.
-    """
-    # Get all events with basic details
-    events = get_match_events(matchId=matchId, version=version, fetch=['teams', 'players'])
-    
-    if events == -1:
-        return -1
-    
-    # Extract events from the elements array
-    elements = events.get('elements', [])
-    if not elements:
-        return {
-            'total_events': 0,
-            'events_by_type': {},
-            'events_by_team': {},
-            'events_by_period': {'1H': 0, '2H': 0, 'ET': 0, 'P': 0}
-        }
-    
-    events_data = elements[0].get('events', [])
-    
-    summary = {
-        'total_events': len(events_data),
-        'events_by_type': {},
-        'events_by_team': {},
-        'events_by_period': {'1H': 0, '2H': 0, 'ET': 0, 'P': 0}
-    }
-    
-    for event in events_data:
-        # Count by event type
-        event_type = event.get('type', {}).get('name', 'Unknown')
-        summary['events_by_type'][event_type] = summary['events_by_type'].get(event_type, 0) + 1
-        
-        # Count by team
-        team_id = event.get('teamId', 'Unknown')
-        summary['events_by_team'][team_id] = summary['events_by_team'].get(team_id, 0) + 1
-        
-        # Count by period
-        period = event.get('period', 'Unknown')
-        if period in summary['events_by_period']:
-            summary['events_by_period'][period] += 1
-    
-    return summary
+    yield from _iter_download(_projected(fn, _as_projection(projection), 'player_match_stats'),
+                              matches_list, n_jobs, f'Downloading all players match adavance stats for season: {seasonId}',
+                              'all players match advanced stats', max_pending=max_pending, journal=journal)
 
 
-def get_match_details(matchId, useSides=False, details=[], version='v3'):
+def download_all_players_match_advance_stats(seasonId, matches_list=[], version='v3', with_matchId_keys=False, n_jobs=3, journal=None, projection=None, typed=False):
+    journal = _open_journal(journal, 'download_all_players_match_advance_stats', locals())
 
-    # Construct the URL for retrieving events for the specified match
-    url = base_url[version].format(f"/matches/{matchId}")
+    matches_adv_stats = []
+    for matchId, stats in iter_all_players_match_advance_stats(seasonId, matches_list, version, n_jobs, journal=journal, projection=projection):
+        if typed:
+            stats = parse_records('player_match_stats', stats)
+        matches_adv_stats.append({matchId: stats} if with_matchId_keys else stats)
 
-    if useSides or details:
-        url += '?'
-        if useSides:
-            url += 'useSides=true&'
-        if details:
-            url += 'details='
-            details_string = ','.join(details)
-            url += details_string
+    return matches_adv_stats
 
-    
 
-    return call_api(url=url)
+def iter_all_players_match_physical_data(seasonId, matches_list=[], version='v4', n_jobs=3, max_pending=None, journal=None, projection=None):
+    """
+    Streaming version of download_all_players_match_physical_data: yields (matchId, physical data) as each download completes.
 
+        for matchId, physical_data in iter_all_players_match_physical_data(seasonId):
+            save(matchId, physical_data)
+    """
+    journal = _open_journal(journal, 'download_all_players_match_physical_data', locals())
+    matches_list = _season_matches(seasonId, matches_list)
 
+    fn = lambda matchId: get_all_players_match_physical_data(matchId, version=version)
 
+    yield from _iter_download(_projected(fn, _as_projection(projection), 'physical_data'),
+                              matches_list, n_jobs, f'Downloading physical data for season: {seasonId}',
+                              'match physical data', max_pending=max_pending, journal=journal)
 
 
-def get_match_advance_stats(matchId, version='v3'):
-    # Construct the URL for retrieving matches for the specified season
-    url = base_url[version].format(f"/matches/{matchId}/advancedstats")
+def download_all_players_match_physical_data(seasonId, matches_list=[], version='v4', with_matchId_keys=False, n_jobs=3, journal=None, projection=None, typed=False):
+    journal = _open_journal(journal, 'download_all_players_match_physical_data', locals())
 
-    # Make an API call to get the matches list
-    return call_api(url=url)
+    matches_physical_data = []
+    for matchId, physical_data in iter_all_players_match_physical_data(seasonId, matches_list, version, n_jobs, journal=journal, projection=projection):
+        if typed:
+            physical_data = parse_records('physical_data', physical_data)
+        matches_physical_data.append({matchId: physical_data} if with_matchId_keys else physical_data)
 
+    return matches_physical_data
 
-def get_match_advance_stats_parallel(match, args):
-    v = args
-    return get_match_advance_stats(match['matchId'], version=v)
 
+def iter_team_details(seasonId, team_list=[], version='v3', n_jobs=3, max_pending=None, journal=None, projection=None):
+    """
+    Streaming version of download_team_details: yields (teamId, details) as each download completes.
+    """
+    journal = _open_journal(journal, 'download_team_details', locals())
+    if not team_list:
+        team_list = get_teams_list_by_season(seasonId=seasonId)['teams']
+        team_list = [t['wyId'] for t in team_list]
 
-def get_match_formations(matchId, details=[], version='v3'):
-    # Construct the URL for retrieving matches for the specified season
-    url = base_url[version].format(f"/matches/{matchId}/formations")
+    fn = lambda teamId: get_team_details(teamId, version)
 
-    if details:
-        url += '?'
-        if version =='v4':
-            url += 'details='
-        else:
-            url += 'fetch='
-        details_string = ','.join(details)
-        url += details_string
+    yield from _iter_download(_projected(fn, _as_projection(projection), 'team_details'),
+                              team_list, n_jobs, f'Downloading matches details season: {seasonId}',
+                              'team details', max_pending=max_pending, journal=journal)
 
-    # Make an API call to get the matches list
-    return call_api(url=url)
 
+def download_team_details(seasonId, team_list=[], version='v3', n_jobs=3, journal=None, projection=None, typed=False):
+    journal = _open_journal(journal, 'download_team_details', locals())
 
+    return [parse_records('team', details) if typed else details
+            for _, details in iter_team_details(seasonId, team_list, version, n_jobs, journal=journal, projection=projection)]
 
 
-def get_match_physical_data(match_id, version='v4'):
-    url = base_url[version].format(f"/matches/{match_id}/physicaldata")
+def iter_match_events(seasonId, matches_list=[], version='v3', fetch=[], details=[], exclude=[], n_jobs=3, max_pending=None, journal=None, projection=None):
+    """
+    Streaming download of the events of many matches: yields (matchId, events) as each download completes.
+    """
+    journal = _open_journal(journal, 'download_match_events', locals())
+    matches_list = _season_matches(seasonId, matches_list)
 
-    return call_api(url=url)
+    projection = _as_projection(projection)
+    params = dict({'fetch': fetch, 'details': details, 'exclude': exclude}, **(projection and projection.params('events') or {}))
+    fn = lambda matchId: get_match_events(matchId, version=version, **params)
 
+    yield from _iter_download(_projected(fn, projection, 'events'),
+                              matches_list, n_jobs, f'Downloading matches events for season: {seasonId}',
+                              'match events', max_pending=max_pending, journal=journal)
 
-def get_match_all_players_advance_stats(match_id, version='v4'):
 
-    url = base_url[version].format(f"/matches/{match_id}/advancedstats/players")
+def download_match_events(seasonId, matches_list=[], version='v3', fetch=[], details=[], exclude=[], with_matchId_keys=False, n_jobs=3, journal=None, projection=None, typed=False):
+    journal = _open_journal(journal, 'download_match_events', locals())
 
-    return call_api(url=url)
+    matches_events = []
+    for matchId, events in iter_match_events(seasonId, matches_list, version, fetch, details, exclude, n_jobs, journal=journal, projection=projection):
+        if typed:
+            events = parse_records('events', events)
+        matches_events.append({matchId: events} if with_matchId_keys else events)
 
-#MARK: Downloader
-def download_advanced_stats(compId, seasonId, player_list=[], details = ['player'], version='v3', n_jobs=3):
+    return matches_events
 
-    if not player_list:
-        player_list = get_players_list_by_season(seasonId=seasonId)
-        player_list = [int(p['wyId']) for p in player_list]
 
+#MARK: Async
+DEFAULT_MAX_IN_FLIGHT = 100
 
-    players_stats = []
-    
-    with ThreadPoolExecutor(max_workers=n_jobs) as executor:
-        futures = [executor.submit(get_advanced_stats_season, playerId, compId, seasonId, details, version) for playerId in player_list]
 
-        with tqdm(total=len(futures), desc=f'Downloading advanced stats for players comp: {compId}, season: {seasonId}') as pbar:
-            for future in as_completed(futures):
+class AsyncWyscoutClient:
+    """
+    asyncio counterpart of WyscoutClient, built on aiohttp.
+
+    A single event loop keeps up to max_in_flight requests open at the same time,
+    bounded by a semaphore, over one pooled aiohttp connector. This bound is separate
+    from the IOExecutor budget of the threaded downloaders. Use it as an async
+    context manager:
+
+        async with AsyncWyscoutClient(max_in_flight=200) as client:
+            matches = await async_download_match_details(seasonId, client=client)
+
+    Parameters:
+    - username (str, optional): Wyscout username (default is WYSCOUT_USERNAME).
+    - password (str, optional): Wyscout password (default is WYSCOUT_PASSWORD).
+    - max_in_flight (int, optional): Max concurrent requests (default is DEFAULT_MAX_IN_FLIGHT).
+    - timeout (float, optional): Total timeout per request in seconds (default is None, no timeout).
+    """
+
+    def __init__(self, username=None, password=None, max_in_flight=DEFAULT_MAX_IN_FLIGHT, timeout=None):
+        default_username, default_password = _credentials() if username is None or password is None else (None, None)
+        self.username = username if username is not None else default_username
+        self.password = password if password is not None else default_password
+        self.max_in_flight = max_in_flight
+        self.timeout = timeout
+        self.session = None
+        self.semaphore = None
+
+    async def __aenter__(self):
+        await self.open()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def open(self):
+        try:
+            import aiohttp
+        except ImportError as e:
+            raise ImportError('The async Wyscout client requires aiohttp: pip install aiohttp') from e
+
+        # The Authorization header is built once (aiohttp.BasicAuth is deprecated)
+        credentials = base64.b64encode(f'{self.username or ""}:{self.password or ""}'.encode('latin-1')).decode('ascii')
+        self.semaphore = asyncio.Semaphore(self.max_in_flight)
+        self.session = aiohttp.ClientSession(
+            headers={'Content-Type': 'application/json', 'Authorization': f'Basic {credentials}'},
+            connector=aiohttp.TCPConnector(limit=self.max_in_flight, limit_per_host=self.max_in_flight),
+            timeout=aiohttp.ClientTimeout(total=self.timeout),
+        )
+
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    async def get_json(self, url, params=None):
+        """
+        Same contract as call_api: returns the decoded json, prints the error and returns -1,
+        or raises WyscoutAPIError once the retries on 429/5xx are exhausted.
+        Shares the process-wide RateLimiter, RetryPolicy, DiskCache and RequestRegistry with call_api.
+        """
+        start = time.perf_counter()
+        record = {}
+        if _replaying():
+            try:
+                payload = _fixtures.replay(url, params, record)
+            except Exception as e:
+                _emit_metrics(url, start, record, error=e)
+                raise
+            _emit_metrics(url, start, record)
+            return payload
+
+        recording = _recording()
+        if not recording:
+            hit, payload = _cache_lookup(url, params)
+            if hit:
+                _emit_metrics(url, start, {'cache': 'hit'})
+                return payload
+
+        try:
+            if recording:
+                payload = await self._request_json(url, params, record)
+            else:
+                payload = await _registry.run_async(url, params, lambda: self._request_json(url, params, record))
+        except Exception as e:
+            _emit_metrics(url, start, record, error=e)
+            raise
+        _emit_metrics(url, start, record)
+        return payload
+
+    async def _request_json(self, url, params=None, record=None):
+        import aiohttp
+
+        limiter, policy = _rate_limiter, _retry_policy
+        record = {} if record is None else record
+        record.update(cache='miss', retries=0, wait=0.0)
+
+        attempt = 0
+        async with self.semaphore:
+            while True:
+                if limiter is not None:
+                    start = time.perf_counter()
+                    await limiter.acquire_async()
+                    record['wait'] += time.perf_counter() - start
+
                 try:
-                    players_stats.append(future.result())
-                except Exception as e:
-                    print(f"Error fetching stats: {e}")  # Gestione degli errori
-                pbar.update(1)
+                    start = time.perf_counter()
+                    async with self.session.get(url, params=params) as response:
+                        ttfb = time.perf_counter() - start
+                        raw = await response.read()
+                        record.update(status=response.status, bytes=len(raw), ttfb=ttfb, download=time.perf_counter() - start - ttfb)
+                        if response.ok or response.status not in policy.retry_statuses:
+                            _fixture_store(url, params, response.status, raw)
+                        if response.ok:
+                            if limiter is not None:
+                                limiter.on_success()
+                            network = time.perf_counter() - start
+                            start = time.perf_counter()
+                            payload = decode_json(raw)
+                            record['decode'] = time.perf_counter() - start
+                            _timings.add(len(raw), network, record['decode'])
+                            _cache_store(url, params, payload)
+                            return payload
+                        status, text = response.status, await response.text()
+                        retry_after = _parse_retry_after(response.headers.get('Retry-After'))
+                except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+                    if attempt >= policy.max_retries:
+                        raise
+                    delay = policy.delay(attempt)
+                    await asyncio.sleep(delay)
+                    record['wait'] += delay
+                    attempt += 1
+                    record['retries'] = attempt
+                    continue
+
+                if status not in policy.retry_statuses:
+                    print('Chimata errata: ', text)
+                    return -1
+
+                if limiter is not None and status in policy.throttle_statuses:
+                    limiter.on_throttle(retry_after)
+                if attempt >= policy.max_retries:
+                    raise WyscoutAPIError(url, status, text)
+                delay = policy.delay(attempt, retry_after)
+                await asyncio.sleep(delay)
+                record['wait'] += delay
+                attempt += 1
+                record['retries'] = attempt
+
+
+async def async_call_api(url, params=None, client=None):
+    """
+    Async version of call_api.
 
-    players_stats = pd.json_normalize(players_stats)
-    
-    return players_stats
+    Parameters:
+    - url (str): The url to download.
+    - params (dict, optional): Query string parameters.
+    - client (AsyncWyscoutClient, optional): An open client. If not given a temporary one is opened for this call.
+
+    Returns:
+    - The decoded json, or -1 if the call fails.
+    """
+    if client is None:
+        async with AsyncWyscoutClient() as client:
+            return await client.get_json(url, params=params)
+    return await client.get_json(url, params=params)
 
 
-def download_match_details(seasonId, matches_list=[], useSides=False, details=[], version='v3', to_df=False, with_matchId_keys=False, n_jobs=5):
-    
-    def get_match_details_dict(matchId, useSides, details, v):
-        return {matchId: get_match_details(matchId, useSides=useSides, details=details, version=v)}
+async def _async_download(requests_by_key, client, desc, with_keys=False, transform=None, max_in_flight=DEFAULT_MAX_IN_FLIGHT):
+    """
+    Runs every (url, params) request in requests_by_key on the event loop and collects the results
+    in completion order, like the threaded downloaders do.
 
+    Parameters:
+    - requests_by_key (dict): key -> (url, params). The key is used for the {key: result} entries.
+    - client (AsyncWyscoutClient or None): An open client. If None a temporary one is opened.
+    - desc (str): Description of the tqdm progress bar.
+    - with_keys (bool, optional): If True each result is wrapped as {key: result}.
+    - transform (callable, optional): Applied to each decoded json (e.g. to extract a field).
+    - max_in_flight (int, optional): Concurrency of the temporary client.
 
-    if not matches_list:
-        matches_list = get_matches_list_by_season(seasonId=seasonId)['matches']
-        matches_list = [int(m['matchId']) for m in matches_list]
+    Returns:
+    - list: The results, failures are printed and skipped.
+    """
+    if client is None:
+        async with AsyncWyscoutClient(max_in_flight=max_in_flight) as client:
+            return await _async_download(requests_by_key, client, desc, with_keys=with_keys, transform=transform)
 
-    matches_details = []
+    async def fetch(key, url, params):
+        result = await client.get_json(url, params=params)
+        if transform is not None:
+            result = transform(result)
+        return key, result
 
-    with ThreadPoolExecutor(max_workers=n_jobs) as executor:
-        if with_matchId_keys:
-            futures = [executor.submit(get_match_details_dict, matchId, useSides, details, version) for matchId in matches_list]
-        else:
-            futures = [executor.submit(get_match_details, matchId, useSides, details, version) for matchId in matches_list]
+    tasks = [asyncio.ensure_future(fetch(key, url, params)) for key, (url, params) in requests_by_key.items()]
 
-        with tqdm(total=len(futures), desc=f'Downloading matches details season: {seasonId}') as pbar:
-            for future in as_completed(futures):
-                try:
-                    matches_details.append(future.result())
-                except Exception as e:
-                    print(f"Error fetching match details: {e}")  # Gestione degli errori
-                pbar.update(1)
+    results = []
+    with tqdm(total=len(tasks), desc=desc) as pbar:
+        for task in asyncio.as_completed(tasks):
+            try:
+                key, result = await task
+                results.append({key: result} if with_keys else result)
+            except Exception as e:
+                print(f"Error fetching {desc}: {type(e).__name__}\n{e}")  # Gestione degli errori
+            pbar.update(1)
+
+    return results
+
+
+async def _async_season_matches(seasonId, client):
+    url, params = _matches_list_by_season_request(seasonId)
+    matches = (await async_call_api(url, params=params, client=client))['matches']
+    mark_matches_final(matches)
+    return [int(m['matchId']) for m in matches]
+
+
+async def async_download_advanced_stats(compId, seasonId, player_list=[], details=['player'], version='v3', client=None, max_in_flight=DEFAULT_MAX_IN_FLIGHT):
+    """
+    Async version of download_advanced_stats. Returns the same DataFrame.
+    """
+    if not player_list:
+        player_list = await asyncio.to_thread(get_players_list_by_season, seasonId)
+        player_list = [int(p['wyId']) for p in player_list]
+
+    requests_by_key = {playerId: _advanced_stats_season_request(playerId, compId, seasonId, details=details, version=version) for playerId in player_list}
+    players_stats = await _async_download(requests_by_key, client, f'Downloading advanced stats for players comp: {compId}, season: {seasonId}',
+                                          max_in_flight=max_in_flight)
+
+    return flatten('player_season_stats', players_stats)
+
+
+async def async_download_match_details(seasonId, matches_list=[], useSides=False, details=[], version='v3', to_df=False, with_matchId_keys=False, client=None, max_in_flight=DEFAULT_MAX_IN_FLIGHT):
+    """
+    Async version of download_match_details. Returns the same list (or DataFrame if to_df).
+    """
+    if not matches_list:
+        matches_list = await _async_season_matches(seasonId, client)
+
+    requests_by_key = {matchId: _match_details_request(matchId, useSides=useSides, details=details, version=version) for matchId in matches_list}
+    matches_details = await _async_download(requests_by_key, client, f'Downloading matches details season: {seasonId}',
+                                            with_keys=with_matchId_keys, max_in_flight=max_in_flight)
 
     if to_df:
-        matches_details = pd.json_normalize(matches_details)
-        
+        payloads = [next(iter(d.values())) for d in matches_details] if with_matchId_keys else matches_details
+        matches_details = flatten('match_details', payloads)
+
     return matches_details
 
-def download_match_formations(seasonId, matches_list=[], version='v3', with_matchId_keys=False, n_jobs=3):
 
-    def get_match_formations_dict(matchId, args):
-        v = args
-        return {matchId: get_match_formations(matchId, version=v)}
+async def async_download_match_formations(seasonId, matches_list=[], version='v3', with_matchId_keys=False, client=None, max_in_flight=DEFAULT_MAX_IN_FLIGHT):
+    """
+    Async version of download_match_formations.
+    """
+    if not matches_list:
+        matches_list = await _async_season_matches(seasonId, client)
+
+    requests_by_key = {matchId: _match_formations_request(matchId, version=version) for matchId in matches_list}
+    return await _async_download(requests_by_key, client, f'Downloading matches formations for season: {seasonId}',
+                                 with_keys=with_matchId_keys, max_in_flight=max_in_flight)
 
 
+async def async_download_match_advance_stats(seasonId, matches_list=[], with_matchId_keys=False, version='v3', client=None, max_in_flight=DEFAULT_MAX_IN_FLIGHT):
+    """
+    Async version of download_match_advance_stats.
+    """
     if not matches_list:
-        matches_list = get_matches_list_by_season(seasonId=seasonId)['matches']
-        matches_list = [int(m['matchId']) for m in matches_list]
+        matches_list = await _async_season_matches(seasonId, client)
 
-    matches_formations = []
+    requests_by_key = {matchId: _match_advance_stats_request(matchId, version=version) for matchId in matches_list}
+    return await _async_download(requests_by_key, client, f'Downloading matches advanced stats for season: {seasonId}',
+                                 with_keys=with_matchId_keys, max_in_flight=max_in_flight)
 
-    with ThreadPoolExecutor(max_workers=n_jobs) as executor:
-        if with_matchId_keys:
-            futures = [executor.submit(get_match_formations_dict, matchId, version) for matchId in matches_list]
-        else:
-            futures = [executor.submit(get_match_formations, matchId, version) for matchId in matches_list]
 
-        with tqdm(total=len(futures), desc=f'Downloading matches formations for season: {seasonId}') as pbar:
-            for future in as_completed(futures):
-                try:
-                    matches_formations.append(future.result())
-                except Exception as e:
-                    print(f"Error fetching match formations: {e}")  # Gestione degli errori
-                pbar.update(1)
+async def async_download_players_match_advance_stats(players, matchId, version='v3', client=None, max_in_flight=DEFAULT_MAX_IN_FLIGHT):
+    """
+    Async version of download_players_match_advance_stats. Returns the same list: the players are
+    fetched with one call to the match-level endpoint (see plan_players_match_advance_stats), with
+    per-player calls only for the players it misses, and -1 for the players whose download failed.
+    """
+    if client is None:
+        async with AsyncWyscoutClient(max_in_flight=max_in_flight) as client:
+            return await async_download_players_match_advance_stats(players, matchId, version=version, client=client)
+
+    plan = plan_players_match_advance_stats([(player['wyId'], matchId) for player in players])
+    if not plan:
+        return []
+    use_bulk, playerIds = plan[int(matchId)]
+
+    stats = {}
+    if use_bulk:
+        url, params = _all_players_match_advanced_stats_request(matchId, version=version)
+        try:
+            response_json = await client.get_json(url, params=params)
+        except Exception as e:
+            print(f"Error fetching match {matchId} players advanced stats: {type(e).__name__}\n{e}")  # Gestione degli errori
+            response_json = -1
+        if isinstance(response_json, dict):
+            wanted = set(playerIds)
+            for player_stats in response_json.get('players', []):
+                if player_stats.get('playerId') in wanted:
+                    stats[player_stats['playerId']] = player_stats
+
+    # Fallback for the players the match-level endpoint didn't return (or if it failed)
+    requests_by_key = {playerId: _players_match_advanced_stats_request(playerId, matchId, version=version)
+                       for playerId in playerIds if playerId not in stats}
+    if requests_by_key:
+        for result in await _async_download(requests_by_key, client, f'Downloading players match advanced stats {matchId}', with_keys=True):
+            stats.update(result)
+
+    return [stats.get(playerId, -1) for playerId in playerIds]
+
+
+async def async_download_all_players_match_advance_stats(seasonId, matches_list=[], version='v3', with_matchId_keys=False, client=None, max_in_flight=DEFAULT_MAX_IN_FLIGHT):
+    """
+    Async version of download_all_players_match_advance_stats.
+    """
+    if not matches_list:
+        matches_list = await _async_season_matches(seasonId, client)
 
-    return matches_formations
+    requests_by_key = {matchId: _all_players_match_advanced_stats_request(matchId, version=version) for matchId in matches_list}
+    return await _async_download(requests_by_key, client, f'Downloading all players match adavance stats for season: {seasonId}',
+                                 with_keys=with_matchId_keys, transform=lambda r: r['players'], max_in_flight=max_in_flight)
 
-def download_match_advance_stats(seasonId, matches_list=[], with_matchId_keys=False, version='v3', n_jobs=5):
-    
+
+async def async_download_all_players_match_physical_data(seasonId, matches_list=[], version='v4', with_matchId_keys=False, client=None, max_in_flight=DEFAULT_MAX_IN_FLIGHT):
+    """
+    Async version of download_all_players_match_physical_data.
+    """
     if not matches_list:
-        matches_list = get_matches_list_by_season(seasonId=seasonId)['matches']
-        matches_list = [int(m['matchId']) for m in matches_list]
-    
-    matches_adv_stats = []
+        matches_list = await _async_season_matches(seasonId, client)
 
-    def get_match_advanced_stats_dict(matchId, args):
-        return get_match_advance_stats(matchId, args)
+    requests_by_key = {matchId: _all_players_match_physical_data_request(matchId, version=version) for matchId in matches_list}
+    return await _async_download(requests_by_key, client, f'Downloading physical data for season: {seasonId}',
+                                 with_keys=with_matchId_keys, max_in_flight=max_in_flight)
 
-    with ThreadPoolExecutor(max_workers=n_jobs) as executor:
-        # Creare un elenco di futures
-        if with_matchId_keys:
-            futures = [executor.submit(get_match_advanced_stats_dict, matchId, version) for matchId in matches_list]
-        else:
-            futures = [executor.submit(get_match_advance_stats, matchId, version) for matchId in matches_list]
 
-        with tqdm(total=len(futures), desc=f'Downloading matches advanced stats for season: {seasonId}') as pbar:
-            for future in as_completed(futures):
-                try:
-                    matches_adv_stats.append(future.result())
-                except Exception as e:
-                    print(f"Error fetching match advanced stats: {e}")  # Gestione degli errori
-                pbar.update(1)
+async def async_download_team_details(seasonId, team_list=[], version='v3', client=None, max_in_flight=DEFAULT_MAX_IN_FLIGHT):
+    """
+    Async version of download_team_details.
+    """
+    if not team_list:
+        url, params = _teams_list_by_season_request(seasonId)
+        team_list = [t['wyId'] for t in (await async_call_api(url, params=params, client=client))['teams']]
+
+    requests_by_key = {teamId: _team_details_request(teamId, version=version) for teamId in team_list}
+    return await _async_download(requests_by_key, client, f'Downloading matches details season: {seasonId}', max_in_flight=max_in_flight)
+
+
+#MARK: Parquet export
+# kind -> partition columns, dictionary-encoded (categorical) columns and, for the kinds whose
+# payload can wrap its records, the key of the list of records (e.g. the match-level player stats).
+# Per-match kinds are partitioned down to the match, so re-downloading a match overwrites its file.
+PARQUET_KINDS = {
+    'matches': {'partitions': ['competitionId', 'seasonId'],
+                'categorical': ['status', 'gameweek', 'winner', 'label', 'venue']},
+    'player_season_stats': {'partitions': ['competitionId', 'seasonId'],
+                            'categorical': ['positions', 'player.role.code2', 'player.foot', 'player.currentTeamId']},
+    'player_match_stats': {'partitions': ['competitionId', 'seasonId', 'matchId'],
+                           'categorical': ['positions'], 'records': 'players'},
+    'physical_data': {'partitions': ['competitionId', 'seasonId', 'matchId'],
+                      'categorical': ['period', 'phase', 'position']},
+    'formations': {'partitions': ['competitionId', 'seasonId', 'matchId'],
+                   'categorical': ['scheme', 'period']},
+    'events': {'partitions': ['competitionId', 'seasonId', 'matchId'],
+               'categorical': ['type.primary', 'matchPeriod', 'team.name', 'opponentTeam.name',
+                               'player.name', 'player.position', 'pass.recipient.name']},
+}
+
+# Columns always stored as int64, whatever the payload, so every partition has the same schema
+PARQUET_ID_COLUMNS = ('competitionId', 'seasonId', 'matchId', 'playerId', 'teamId', 'wyId', 'roundId', 'id',
+                      'player.id', 'team.id', 'opponentTeam.id', 'possession.id')
+
+# Categorical columns holding integers: dictionary-encoded as int64, so a file where pandas made
+# them float (because of a gap) has the same dictionary values as the others
+PARQUET_INT_CATEGORICAL_COLUMNS = ('gameweek', 'winner', 'player.currentTeamId')
+
+
+def _payload_records(kind, payload):
+    """
+    Turns one API payload into a list of flat-able records for the given kind.
+    """
+    if isinstance(payload, int) and payload == -1:
+        return []
+    if kind == 'events':
+        return _match_events_list(payload)
+    if isinstance(payload, list):
+        return payload
+    if isinstance(payload, dict):
+        if payload and all(str(k).isdigit() for k in payload):
+            # Payloads keyed by teamId (e.g. formations): one record per team
+            return [dict(v, teamId=int(k)) if isinstance(v, dict) else {'teamId': int(k), 'value': v} for k, v in payload.items()]
+        # Only the declared key is unwrapped: the list values of a single record (e.g. the positions
+        # of a player's stats) are columns, not records
+        records_key = PARQUET_KINDS.get(kind, {}).get('records')
+        if records_key is not None and isinstance(payload.get(records_key), list):
+            return payload[records_key]
+        return [payload]
+    return []
+
+
+def _arrow_table(kind, df):
+    """
+    Converts a flattened DataFrame to a pyarrow Table with the stable schema of the kind:
+    id columns as int64, categorical columns dictionary-encoded (integer ones as int64, see
+    PARQUET_INT_CATEGORICAL_COLUMNS), bool columns as bool (with or
+    without gaps), other numeric columns as float64, nested lists/dicts serialized to json strings.
+    """
+    import pyarrow as pa
+
+    categorical = set(PARQUET_KINDS[kind]['categorical'])
+    arrays, names = [], []
+    for column in df.columns:
+        values = df[column]
+        if values.isna().all():
+            # Its type can't be known here, the column is filled with nulls when the dataset is read
+            continue
+        if column in PARQUET_ID_COLUMNS:
+            array = pa.array(pd.to_numeric(values, errors='coerce').astype('Int64'), type=pa.int64())
+        elif column in categorical and column in PARQUET_INT_CATEGORICAL_COLUMNS:
+            array = pa.array(pd.to_numeric(values, errors='coerce').astype('Int64'), type=pa.int64()).dictionary_encode()
+        elif values.map(lambda v: isinstance(v, (list, dict))).any():
+            array = pa.array(values.map(lambda v: None if v is None or v is pd.NA or (isinstance(v, float) and v != v)
+                                        else json.dumps(v) if isinstance(v, (list, dict)) else str(v)), type=pa.string())
+        elif column not in categorical and (pd.api.types.is_bool_dtype(values)
+                                            or values.dropna().map(lambda v: isinstance(v, (bool, np.bool_))).all()):
+            # Checked before the numeric branch: a complete bool column is numeric to pandas,
+            # one with gaps is object, and both must be stored as bool in every file
+            array = pa.array([None if v is None or v is pd.NA or (isinstance(v, float) and v != v) else bool(v) for v in values],
+                             type=pa.bool_())
+        elif column in categorical or not pd.api.types.is_numeric_dtype(values):
+            array = pa.array(values.map(lambda v: None if v is None or (isinstance(v, float) and v != v) else str(v)), type=pa.string())
+            if column in categorical:
+                array = array.dictionary_encode()
+        else:
+            array = pa.array(values.astype('float64'), type=pa.float64())
+        arrays.append(array)
+        names.append(column)
 
-    return matches_adv_stats
+    return pa.Table.from_arrays(arrays, names=names)
 
-def download_players_match_advance_stats(players, matchId, version='v3', n_jobs = 5):
 
-    matches_adv_stats = []
-    # Use Pool to parallelize the processing
-    with Pool(n_jobs) as pool:
-        # Use partial to pass additional arguments to the get_stats function
-        args = [matchId, version]
-        partial_get_player_matches_adv_stats = partial(get_player_match_advance_stats_parallel, args=args)
-        
-        with tqdm(total=len(players), desc=f'Downloading matches details {matchId}') as pbar:
-            # Use imap_unordered to parallelize function execution
-            for _ in pool.imap_unordered(partial_get_player_matches_adv_stats, players):
-                matches_adv_stats.append(_)
-                pbar.update(1)
+def _partitioning(kind):
+    import pyarrow as pa
+    import pyarrow.dataset as ds
 
-    
-    return matches_adv_stats
+    return ds.partitioning(pa.schema([(column, pa.int64()) for column in PARQUET_KINDS[kind]['partitions']]), flavor='hive')
 
 
-def download_all_players_match_advance_stats(seasonId, matches_list=[], version='v3', with_matchId_keys=False, n_jobs=3):
+def _partition_dir(root, kind, values):
+    path = osp.join(root, kind)
+    for column in PARQUET_KINDS[kind]['partitions']:
+        path = osp.join(path, f'{column}={values[column]}')
+    return path
 
-    def get_all_players_match_advance_stats_dict(matchId, args):
-        v = args
-        return {matchId: get_all_players_match_advanced_stats(matchId, version=v)}
 
+def write_parquet(kind, data, root, competitionId, seasonId):
+    """
+    Writes downloaded data to a hive-partitioned Parquet dataset (requires pyarrow).
 
-    if not matches_list:
-        matches_list = get_matches_list_by_season(seasonId=seasonId)['matches']
-        matches_list = [int(m['matchId']) for m in matches_list]
+    Layout: root/kind/competitionId=.../seasonId=.../[matchId=.../]part-0.parquet
 
-    matches_adv_stats = []
+    Parameters:
+    - kind (str): One of PARQUET_KINDS ('matches', 'player_season_stats', 'player_match_stats',
+      'physical_data', 'formations', 'events').
+    - data: For the per-match kinds, (matchId, payload) pairs as yielded by the iter_* functions,
+      a {matchId: payload} dict or the with_matchId_keys=True output of the download_* functions.
+      For 'matches' and 'player_season_stats', the list of payloads (or the same keyed forms).
+      Data can be a generator: each match is written as soon as it is consumed.
+    - root (str): Root directory of the datasets.
+    - competitionId (int): Competition of the data.
+    - seasonId (int): Season of the data.
 
-    with ThreadPoolExecutor(max_workers=n_jobs) as executor:
-        if with_matchId_keys:
-            futures = [executor.submit(get_all_players_match_advanced_stats, matchId, version) for matchId in matches_list]
+    Returns:
+    - list: The written files.
+    """
+    import pyarrow.parquet as pq
+
+    if kind not in PARQUET_KINDS:
+        raise ValueError(f'Unknown parquet kind {kind!r}, expected one of {list(PARQUET_KINDS)}')
+    per_match = 'matchId' in PARQUET_KINDS[kind]['partitions']
+
+    def items():
+        for item in (data.items() if isinstance(data, dict) else data):
+            if isinstance(item, tuple):
+                yield item
+            elif isinstance(item, dict) and len(item) == 1 and str(next(iter(item))).isdigit() and per_match:
+                yield next(iter(item.items()))
+            else:
+                yield None, item
+
+    def write(records, partition_values):
+        # The partition columns live in the directory names only
+        df = pd.json_normalize(records).drop(columns=list(partition_values), errors='ignore')
+        directory = _partition_dir(root, kind, partition_values)
+        os.makedirs(directory, exist_ok=True)
+        file = osp.join(directory, 'part-0.parquet')
+        pq.write_table(_arrow_table(kind, df), file, compression='zstd')
+        return file
+
+    written = []
+    season_records = []
+    for key, payload in items():
+        records = _payload_records(kind, payload)
+        if per_match:
+            if key is None:
+                raise ValueError(f'{kind} data must be keyed by matchId')
+            if records:
+                written.append(write(records, {'competitionId': competitionId, 'seasonId': seasonId, 'matchId': int(key)}))
         else:
-            futures = [executor.submit(get_all_players_match_advanced_stats, matchId, version) for matchId in matches_list]
+            season_records += records
 
-        with tqdm(total=len(futures), desc=f'Downloading all players match adavance stats for season: {seasonId}') as pbar:
-            for future in as_completed(futures):
-                try:
-                    matches_adv_stats.append(future.result())
-                except Exception as e:
-                    print(f"Error fetching match formations: {e}")  # Gestione degli errori
-                pbar.update(1)
+    if season_records:
+        written.append(write(season_records, {'competitionId': competitionId, 'seasonId': seasonId}))
 
-    return matches_adv_stats
+    return written
+
+
+def read_parquet(kind, root, columns=None, filters=None):
+    """
+    Reads a dataset written by write_parquet, with column projection and predicate pushdown.
+
+        read_parquet('events', root, columns=['matchId', 'player.id', 'type.primary'],
+                     filters=[('seasonId', '=', 188994), ('type.primary', '=', 'shot')])
+
+    Parameters:
+    - kind (str): The dataset kind.
+    - root (str): Root directory of the datasets.
+    - columns (list, optional): Columns to read (default is all).
+    - filters (list, optional): pyarrow filters, (column, op, value) tuples in AND.
 
+    Returns:
+    - DataFrame: The matching rows, categorical columns as pandas categoricals.
+    """
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+
+    path, partitioning = osp.join(root, kind), _partitioning(kind)
+    dataset = ds.dataset(path, format='parquet', partitioning=partitioning)
+    # Files may miss the columns that were all null in their match, read them with the union of the schemas
+    schema = pa.unify_schemas([fragment.physical_schema for fragment in dataset.get_fragments()] + [partitioning.schema])
+    dataset = ds.dataset(path, schema=schema, format='parquet', partitioning=partitioning)
+
+    expression = None
+    for column, op, value in (filters or []):
+        field = ds.field(column)
+        condition = {'=': field == value, '==': field == value, '!=': field != value, '<': field < value,
+                     '<=': field <= value, '>': field > value, '>=': field >= value, 'in': field.isin(value)}[op]
+        expression = condition if expression is None else expression & condition
+    return dataset.to_table(columns=columns, filter=expression).to_pandas()
+
+
+#MARK: Incremental sync
+# kind -> (streaming downloader, needs the match to be final)
+SYNC_KINDS = {
+    'details': (iter_match_details, False),
+    'advanced_stats': (iter_match_advance_stats, True),
+    'players_advanced_stats': (iter_all_players_match_advance_stats, True),
+    'formations': (iter_match_formations, True),
+    'physical_data': (iter_all_players_match_physical_data, True),
+    'events': (iter_match_events, True),
+}
+
+
+class SeasonManifest:
+    """
+    Local json manifest of what was already fetched for a season: for each kind of data and each
+    match, the status and date the match had when it was downloaded.
 
+    Parameters:
+    - path (str): The manifest file, created on first save.
+    - seasonId (int): The season it refers to.
+    """
 
-def download_all_players_match_physical_data(seasonId, matches_list=[], version='v4', with_matchId_keys=False, n_jobs=3):
+    def __init__(self, path, seasonId):
+        self.path = osp.expanduser(path)
+        self.seasonId = seasonId
+        self.kinds = {}
+
+        if osp.exists(self.path):
+            with open(self.path) as f:
+                manifest = json.load(f)
+            if manifest.get('seasonId') != seasonId:
+                raise ValueError(f'{self.path} is the manifest of season {manifest.get("seasonId")}, not {seasonId}')
+            self.kinds = manifest['kinds']
+
+    @staticmethod
+    def _state(match):
+        return {'status': match.get('status'), 'dateutc': match.get('dateutc')}
+
+    def stale(self, kind, matches, finished_only=False):
+        """
+        Returns the ids of the matches that are new or whose status/date changed since they were fetched.
+        """
+        fetched = self.kinds.get(kind, {})
+        stale = []
+        for match in matches:
+            if finished_only and match.get('status') not in FINISHED_MATCH_STATUSES:
+                continue
+            entry = fetched.get(str(match['matchId']))
+            if entry is None or {k: entry.get(k) for k in ('status', 'dateutc')} != self._state(match):
+                stale.append(int(match['matchId']))
+        return stale
+
+    def mark(self, kind, match):
+        self.kinds.setdefault(kind, {})[str(match['matchId'])] = dict(self._state(match), fetched_at=time.time())
+
+    def save(self):
+        directory = osp.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump({'seasonId': self.seasonId, 'kinds': self.kinds}, f)
+        os.replace(tmp, self.path)
+
+
+def sync_season(seasonId, manifest_path, kinds=tuple(SYNC_KINDS), sink=None, n_jobs=3, projection=None):
+    """
+    Incremental download of a season: diffs the current season matches list against the local
+    manifest and, for each kind of data, downloads only the matches that are new or changed
+    (status or date) since the last run. Match-level stats, formations, physical data and events
+    are fetched only once a match is final.
 
-    def get_all_players_match_physical_data_dict(matchId, args):
-        v = args
-        return {matchId: get_all_players_match_physical_data(matchId, version=v)}
+        def save(kind, matchId, payload):
+            write_parquet('events', [(matchId, payload)], root, compId, seasonId)  # or any storage
 
+        sync_season(seasonId, 'manifests/188994.json', kinds=['events'], sink=save)
 
-    if not matches_list:
-        matches_list = get_matches_list_by_season(seasonId=seasonId)['matches']
-        matches_list = [int(m['matchId']) for m in matches_list]
+    Parameters:
+    - seasonId (int): The season to sync.
+    - manifest_path (str): The manifest file of the season.
+    - kinds (iterable, optional): Kinds of data to sync, keys of SYNC_KINDS (default is all).
+    - sink (callable, optional): Called as sink(kind, matchId, payload) for every downloaded match.
+      If not given the payloads are returned.
+    - n_jobs (int, optional): Up to 2 * n_jobs matches are downloaded ahead, per kind (default is 3).
+    - projection (Projection, optional): Fields to keep for each kind of data.
 
-    matches_physical_data = []
+    Returns:
+    - dict: kind -> {matchId: payload} of the downloaded matches (empty dicts if a sink is given).
+    """
+    manifest = SeasonManifest(manifest_path, seasonId)
+    matches = get_matches_list_by_season(seasonId=seasonId)['matches']
+    matches_by_id = {int(m['matchId']): m for m in matches}
+
+    results = {}
+    try:
+        for kind in kinds:
+            iter_fn, finished_only = SYNC_KINDS[kind]
+            results[kind] = {}
+
+            matches_list = manifest.stale(kind, matches, finished_only=finished_only)
+            print(f'Sync {kind} season {seasonId}: {len(matches_list)} new or changed matches')
+            if not matches_list:
+                continue
+
+            for matchId, payload in iter_fn(seasonId, matches_list=matches_list, n_jobs=n_jobs, projection=projection):
+                if isinstance(payload, int) and payload == -1:
+                    continue
+                if sink is not None:
+                    sink(kind, matchId, payload)
+                else:
+                    results[kind][matchId] = payload
+                manifest.mark(kind, matches_by_id[matchId])
+            manifest.save()
+    finally:
+        manifest.save()
+
+    return results
+
+
+#MARK: Season pull
+# kind -> (ids it runs on, getter(id, **params), Projection kind, Parquet kind, default priority, finished matches only).
+# A lower priority runs first.
+PULL_KINDS = {
+    'details': ('matches', lambda matchId, **params: get_match_details(matchId, **params), 'match_details', 'matches', 0, False),
+    'team_details': ('teams', lambda teamId, **params: get_team_details(teamId), 'team_details', None, 0, False),
+    'advanced_stats': ('matches', lambda matchId, **params: get_match_advance_stats(matchId), 'match_advanced_stats', None, 1, True),
+    'players_advanced_stats': ('matches', lambda matchId, **params: get_all_players_match_advanced_stats(matchId), 'player_match_stats', 'player_match_stats', 1, True),
+    'formations': ('matches', lambda matchId, **params: get_match_formations(matchId), 'formations', 'formations', 2, True),
+    'physical_data': ('matches', lambda matchId, **params: get_all_players_match_physical_data(matchId), 'physical_data', 'physical_data', 2, True),
+    'events': ('matches', lambda matchId, **params: get_match_events(matchId, **params), 'events', 'events', 3, True),
+}
+
+
+def _pull_sources(seasonId, sources):
+    # The season lists are fetched once, at the same time, whatever the number of kinds that need them
+    fetch = {'matches': lambda: get_matches_list_by_season(seasonId=seasonId)['matches'],
+             'teams': lambda: get_teams_list_by_season(seasonId=seasonId)['teams']}
+    futures = {source: get_io_executor().submit(fetch[source]) for source in sources}
+    return {source: future.result() for source, future in futures.items()}
+
+
+def pull_season(seasonId, kinds=tuple(PULL_KINDS), priorities=None, sink=None, root=None, competitionId=None, n_jobs=None, journal=None, projection=None):
+    """
+    Downloads a season snapshot of several kinds of data as one job, instead of running the
+    download_* functions one after another (each with its own list fetch and a drain at the end).
 
-    with ThreadPoolExecutor(max_workers=n_jobs) as executor:
-        if with_matchId_keys:
-            futures = [executor.submit(get_all_players_match_physical_data_dict, matchId, version) for matchId in matches_list]
-        else:
-            futures = [executor.submit(get_all_players_match_physical_data, matchId, version) for matchId in matches_list]
+    The season lists are fetched once, then every (kind, id) request goes into one queue ordered by
+    priority (and by match within a priority, so the kinds of a match complete together) and runs
+    on the shared IOExecutor, within its max_workers budget. Every request still goes through
+    the shared rate limiter, so the whole pull stays within one concurrency and rate budget.
 
-        with tqdm(total=len(futures), desc=f'Downloading physical data for season: {seasonId}') as pbar:
-            for future in as_completed(futures):
-                try:
-                    matches_physical_data.append(future.result())
-                except Exception as e:
-                    print(f"Error fetching match physical data: {type(e).__name__}\n{e}")  # Gestione degli errori
-                pbar.update(1)
+        pull_season(seasonId, kinds=['details', 'players_advanced_stats', 'physical_data'],
+                    priorities={'physical_data': 0}, root='data/')
 
-    return matches_physical_data
+    Parameters:
+    - seasonId (int): The season to download.
+    - kinds (iterable, optional): Kinds of data to download, keys of PULL_KINDS (default is all).
+      Match-level stats, formations, physical data and events are downloaded for the played matches only.
+    - priorities (dict, optional): kind -> priority, overriding the defaults of PULL_KINDS (lower runs first).
+    - sink (callable, optional): Called as sink(kind, id, payload) for every download as it completes.
+      If given the payloads are not kept in memory (and root is ignored).
+    - root (str, optional): If given, once the pull is complete the kinds with a Parquet layout are
+      written together under root (see write_parquet).
+    - competitionId (int, optional): Competition of the season, for the Parquet partitions
+      (default is read from the matches list).
+    - n_jobs (int, optional): Up to 2 * n_jobs requests are submitted ahead (default is the max_workers
+      of the IOExecutor, whose budget bounds the requests running at the same time).
+    - journal (str or DownloadJournal, optional): Checkpoint of the pull, see resume_download
+      (with a sink, pass it again: resume_download(journal, sink=sink)).
+    - projection (Projection, optional): Fields to keep for each kind of data.
 
+    Returns:
+    - dict: kind -> {id: payload} (empty dicts if a sink is given).
+    """
+    # The sink can't be stored in the journal, pass it again to resume_download
+    journal = _open_journal(journal, 'pull_season', {k: v for k, v in locals().items() if k != 'sink'})
+
+    kinds = list(kinds)
+    unknown = [kind for kind in kinds if kind not in PULL_KINDS]
+    if unknown:
+        raise ValueError(f'Unknown kinds {unknown}, expected some of {list(PULL_KINDS)}')
+    priorities = dict({kind: PULL_KINDS[kind][4] for kind in kinds}, **(priorities or {}))
+    projection = _as_projection(projection)
+
+    sources = _pull_sources(seasonId, {PULL_KINDS[kind][0] for kind in kinds})
+    ids = {}
+    if 'matches' in sources:
+        ids['matches'] = [int(m['matchId']) for m in sources['matches']]
+        ids['finished'] = [int(m['matchId']) for m in sources['matches'] if m.get('status') in FINISHED_MATCH_STATUSES]
+    if 'teams' in sources:
+        ids['teams'] = [int(t['wyId']) for t in sources['teams']]
+
+    tasks = []
+    for kind in kinds:
+        source, _, _, _, _, finished_only = PULL_KINDS[kind]
+        for position, key in enumerate(ids['finished' if finished_only else source]):
+            tasks.append((priorities[kind], position, kinds.index(kind), f'{kind}:{key}'))
+    tasks = [task for *_, task in sorted(tasks)]
+
+    runners = {}
+    for kind in kinds:
+        _, getter, projection_kind, _, _, _ = PULL_KINDS[kind]
+        params = (projection and projection.params(projection_kind)) or {}
+        runners[kind] = _projected(lambda key, getter=getter, params=params: getter(key, **params), projection, projection_kind)
+
+    def run(task):
+        kind, key = task.split(':')
+        return runners[kind](int(key))
+
+    results = {kind: {} for kind in kinds}
+    for task, payload in _iter_download(run, tasks, n_jobs or get_io_executor().max_workers,
+                                        f'Pulling season {seasonId}: {", ".join(kinds)}', 'season data', journal=journal):
+        if isinstance(payload, int) and payload == -1:
+            continue
+        kind, key = task.split(':')
+        if sink is not None:
+            sink(kind, int(key), payload)
+        else:
+            results[kind][int(key)] = payload
 
+    if root is not None and sink is None:
+        if competitionId is None:
+            competitionId = sources['matches'][0]['competitionId'] if sources.get('matches') else get_season_details(seasonId)['competitionId']
+        for kind in kinds:
+            parquet_kind = PULL_KINDS[kind][3]
+            if parquet_kind is not None and results[kind]:
+                data = list(results[kind].values()) if parquet_kind == 'matches' else results[kind]
+                write_parquet(parquet_kind, data, root, competitionId, seasonId)
 
+    return results
 
 
+#MARK: Event warehouse
+class EventWarehouse:
+    """
+    On-disk, indexed store (SQLite) of the events of many matches, for cross-match queries such as
+    "all shots by player X this season" or "progressive passes of team Y in the last 10 matches"
+    that run locally, without any API call once the season is loaded.
 
-def download_team_details(seasonId, team_list=[], version='v3', n_jobs=3):
-    if not team_list:
-        team_list = get_teams_list_by_season(seasonId=seasonId)['teams']
-        team_list = [t['wyId'] for t in team_list]
+    The events are stored one row per event with the EventStore columns, the match date and the
+    compressed original event; there are secondary indexes on playerId, teamId, type, secondary
+    type (e.g. 'progressive_pass') and match date.
 
-    team_details = []
-    
-    with ThreadPoolExecutor(max_workers=n_jobs) as executor:
-        futures = [executor.submit(get_team_details, teamId, version) for teamId in team_list]
+        warehouse = EventWarehouse('events_188994.sqlite')
+        warehouse.load_season(188994)
+        shots = warehouse.query(playerId=playerId, type='shot')
+        passes = warehouse.query(teamId=teamId, secondary='progressive_pass',
+                                 matchIds=warehouse.last_matches(teamId, 10))
 
-        with tqdm(total=len(futures), desc=f'Downloading matches details season: {seasonId}') as pbar:
-            for future in as_completed(futures):
-                team_details.append(future.result())
-                pbar.update(1)
+    Parameters:
+    - path (str): The database file (':memory:' for a temporary warehouse).
+    """
 
-    return team_details
+    def __init__(self, path):
+        self.path = path if path == ':memory:' else osp.expanduser(path)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.executescript('''
+            CREATE TABLE IF NOT EXISTS matches (
+                matchId INTEGER PRIMARY KEY, seasonId INTEGER, date TEXT, events INTEGER, loaded_at REAL);
+            CREATE TABLE IF NOT EXISTS events (
+                matchId INTEGER, eventId INTEGER, type TEXT, playerId INTEGER, teamId INTEGER, period TEXT,
+                minute REAL, second REAL, x REAL, y REAL, date TEXT, event BLOB);
+            CREATE TABLE IF NOT EXISTS event_secondary (event INTEGER, tag TEXT);
+            CREATE INDEX IF NOT EXISTS events_match ON events (matchId);
+            CREATE INDEX IF NOT EXISTS events_player ON events (playerId, date);
+            CREATE INDEX IF NOT EXISTS events_team ON events (teamId, date);
+            CREATE INDEX IF NOT EXISTS events_type ON events (type, date);
+            CREATE INDEX IF NOT EXISTS events_date ON events (date);
+            CREATE INDEX IF NOT EXISTS event_secondary_tag ON event_secondary (tag, event);
+            CREATE INDEX IF NOT EXISTS event_secondary_event ON event_secondary (event);
+        ''')
+
+    def close(self):
+        self._db.close()
+
+    def loaded_matches(self):
+        with self._lock:
+            return {row[0] for row in self._db.execute('SELECT matchId FROM matches')}
+
+    def add_match(self, matchId, payload, date=None, seasonId=None):
+        """
+        Stores (or replaces) the events of a match, from the get_match_events output.
+        """
+        store = EventStore.from_payload(payload, matchId=matchId)
+        frame = store.frame.astype(object).where(store.frame.notna(), None)
+
+        with self._lock, self._db:
+            self._delete_match(matchId)
+            self._db.execute('INSERT INTO matches VALUES (?, ?, ?, ?, ?)', (matchId, seasonId, date, len(store), time.time()))
+            for event, row in zip(store.events, frame.itertuples(index=False)):
+                cursor = self._db.execute('INSERT INTO events VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                                          (matchId, event.get('id'), row.type, row.playerId, row.teamId, row.period,
+                                           row.minute, row.second, row.x, row.y, date,
+                                           zlib.compress(json.dumps(event, separators=(',', ':')).encode())))
+                secondary = (event.get('type') or {}).get('secondary') or []
+                if secondary:
+                    self._db.executemany('INSERT INTO event_secondary VALUES (?, ?)', [(cursor.lastrowid, tag) for tag in secondary])
+
+    def _delete_match(self, matchId):
+        self._db.execute('DELETE FROM event_secondary WHERE event IN (SELECT rowid FROM events WHERE matchId = ?)', (matchId,))
+        self._db.execute('DELETE FROM events WHERE matchId = ?', (matchId,))
+        self._db.execute('DELETE FROM matches WHERE matchId = ?', (matchId,))
+
+    def load_season(self, seasonId, version='v3', n_jobs=3, reload=False):
+        """
+        Downloads and stores the events of every final match of the season not loaded yet.
+
+        Returns:
+        - int: The number of matches loaded.
+        """
+        matches = get_matches_list_by_season(seasonId=seasonId)['matches']
+        loaded = set() if reload else self.loaded_matches()
+        dates = {int(m['matchId']): m.get('dateutc') for m in matches}
+        matches_list = [int(m['matchId']) for m in matches
+                        if int(m['matchId']) not in loaded and m.get('status') in FINISHED_MATCH_STATUSES]
+        if not matches_list:
+            return 0
+
+        n = 0
+        for matchId, payload in iter_match_events(seasonId, matches_list=matches_list, version=version, n_jobs=n_jobs):
+            if isinstance(payload, int) and payload == -1:
+                continue
+            self.add_match(matchId, payload, date=dates[matchId], seasonId=seasonId)
+            n += 1
+        return n
+
+    def last_matches(self, teamId, n=10, before=None):
+        """
+        Returns the ids of the last n loaded matches of a team (optionally before a date), most recent first.
+        """
+        sql = 'SELECT DISTINCT matchId, date FROM events WHERE teamId = ?'
+        params = [teamId]
+        if before is not None:
+            sql += ' AND date < ?'
+            params.append(before)
+        sql += ' ORDER BY date DESC LIMIT ?'
+        params.append(n)
+        with self._lock:
+            return [row[0] for row in self._db.execute(sql, params)]
+
+    def query(self, playerId=None, teamId=None, type=None, secondary=None, period=None, matchIds=None,
+              date_from=None, date_to=None, events=False):
+        """
+        Returns the events matching every given criterion, using the indexes.
+        playerId, teamId, type, secondary, period and matchIds accept a value or a list of values;
+        date_from (included) and date_to (excluded) are compared with the match dateutc.
+
+        Parameters:
+        - events (bool, optional): If True returns the original event dicts instead of the columns.
+
+        Returns:
+        - DataFrame (matchId, eventId, type, playerId, teamId, period, minute, second, x, y, date),
+          or a list of event dicts if events=True.
+        """
+        where, params = [], []
+        for column, value in (('e.playerId', playerId), ('e.teamId', teamId), ('e.type', type),
+                              ('e.period', period), ('e.matchId', matchIds)):
+            if value is None:
+                continue
+            values = list(value) if isinstance(value, (list, tuple, set)) else [value]
+            where.append(f'{column} IN ({",".join("?" * len(values))})')
+            params += values
+        if secondary is not None:
+            tags = list(secondary) if isinstance(secondary, (list, tuple, set)) else [secondary]
+            where.append(f'e.rowid IN (SELECT event FROM event_secondary WHERE tag IN ({",".join("?" * len(tags))}))')
+            params += tags
+        if date_from is not None:
+            where.append('e.date >= ?')
+            params.append(date_from)
+        if date_to is not None:
+            where.append('e.date < ?')
+            params.append(date_to)
+
+        columns = 'e.event' if events else 'e.matchId, e.eventId, e.type, e.playerId, e.teamId, e.period, e.minute, e.second, e.x, e.y, e.date'
+        sql = f'SELECT {columns} FROM events e'
+        if where:
+            sql += ' WHERE ' + ' AND '.join(where)
+        sql += ' ORDER BY e.date, e.matchId, e.rowid'
+
+        with self._lock:
+            if events:
+                return [json.loads(zlib.decompress(row[0])) for row in self._db.execute(sql, params)]
+            return pd.read_sql_query(sql, self._db, params=params)
 
 
 # def download_all_players_match_physical_data(seasonId, team_list=[], version='v3', with_team_keys=False, n_jobs=5):